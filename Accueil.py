@@ -1,26 +1,38 @@
 ﻿from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
 
 import streamlit as st
 
+from catalog_index import page_slice
+from money import format_cents
+from order_state import ORDER_STATE_KEY, get_order_state, update_order
+from pdf_cache import cached_order_pdf, pdf_cache_stats
+from timings import TIMINGS, export_json, export_prometheus, hit_rate
 from utils import (
-    build_order,
-    format_euro,
-    generate_order_pdf,
+    catalog_reloads,
     get_contact_email,
+    get_catalog_index,
     get_default_receiver,
+    get_order_store,
+    get_pricing,
+    has_member_code,
     has_admin_password,
     is_valid_admin_password,
+    is_valid_member_code,
     load_products,
     make_safe_filename,
-    send_email,
+    next_distribution_day,
+    record_order,
     validate_client_name,
 )
 
 PROJECT_ROOT = Path(__file__).resolve().parent
 PRODUCTS_FILE = PROJECT_ROOT / "products.xlsx"
+PAGE_SIZE = 25
+ALL_CATEGORIES = "Toutes les catégories"
 
 st.set_page_config(
     page_title="Au Champ du Puits | Commande",
@@ -32,6 +44,128 @@ if "editor_nonce" not in st.session_state:
     st.session_state.editor_nonce = 0
 if "admin_unlocked" not in st.session_state:
     st.session_state.admin_unlocked = False
+if "mail_jobs" not in st.session_state:
+    st.session_state.mail_jobs = []
+if "catalog_version" not in st.session_state:
+    st.session_state.catalog_version = None
+if "browser_page" not in st.session_state:
+    st.session_state.browser_page = 1
+if "browser_view" not in st.session_state:
+    st.session_state.browser_view = None
+if "view_nonce" not in st.session_state:
+    st.session_state.view_nonce = 0
+
+MAIL_STATUS_LABELS = {
+    "queued": "en attente",
+    "sending": "envoi en cours",
+    "retrying": "nouvelle tentative prévue",
+    "sent": "envoyé",
+    "failed": "échec",
+}
+
+STAGE_LABELS = {
+    "load_products": "Catalogue",
+    "update_order": "Commande (édition)",
+    "build_order": "Commande (complète)",
+    "pdf_download": "PDF (avec cache)",
+    "pdf_render": "PDF (génération)",
+    "smtp_send": "Envoi SMTP",
+    "send_email": "E-mail direct",
+    "order_store_write": "Carnet de commandes",
+    "price_list_render": "Catalogue PDF",
+}
+
+
+@st.fragment(run_every="10s")
+def performance_panel() -> None:
+    # Imported here: it loads fpdf, which only administrators need on this page.
+    from pdf_fonts import render_stats
+    from price_list import PRICE_LIST_CACHE
+
+    stages = TIMINGS.snapshot()
+    cache_stats = pdf_cache_stats()
+    price_list_stats = PRICE_LIST_CACHE.stats()
+    font_stats = render_stats()
+    caches = {
+        "pdf": {"hits": cache_stats["hits"], "misses": cache_stats["misses"]},
+        "price_list": {"hits": price_list_stats["hits"], "misses": price_list_stats["misses"]},
+        "font_subsets": {"hits": font_stats["subsets"]["hits"], "misses": font_stats["subsets"]["misses"]},
+        "font_metrics": {"hits": font_stats["metrics"]["hits"], "misses": font_stats["metrics"]["misses"]},
+    }
+    if "shared_hits" in cache_stats:
+        caches["pdf_shared"] = {"hits": cache_stats["shared_hits"], "misses": cache_stats["shared_misses"]}
+
+    if stages:
+        st.dataframe(
+            [
+                {
+                    "Étape": STAGE_LABELS.get(stage, stage),
+                    "Appels": int(values["count"]),
+                    "p50 (ms)": round(values["p50_ms"], 1),
+                    "p95 (ms)": round(values["p95_ms"], 1),
+                    "p99 (ms)": round(values["p99_ms"], 1),
+                    "Max (ms)": round(values["max_ms"], 1),
+                    "Erreurs": int(values["errors"]),
+                }
+                for stage, values in stages.items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+    else:
+        st.caption("Aucune mesure pour le moment.")
+
+    rates = []
+    for name, stats in caches.items():
+        rate = hit_rate(stats["hits"], stats["misses"])
+        rates.append(f"{name}: {'-' if rate is None else f'{rate:.0%}'} ({stats['hits']}/{stats['hits'] + stats['misses']})")
+    st.caption("Taux de succès des caches: " + ", ".join(rates) + ".")
+
+    st.caption(
+        f"Cache PDF: {cache_stats['entries']}/{cache_stats['max_entries']} documents en mémoire."
+    )
+    session_order = st.session_state.get(ORDER_STATE_KEY)
+    if session_order is not None:
+        st.caption(
+            f"Commande de cette session: {len(session_order)} produit(s) choisi(s), "
+            f"{session_order.memory_bytes() / 1024:.1f} Ko en mémoire."
+        )
+    if "shared_entries" in cache_stats:
+        st.caption(
+            f"Cache partagé: {cache_stats['shared_entries']} documents, "
+            f"{cache_stats['shared_bytes'] / 1024:.0f} Ko / {cache_stats['shared_max_bytes'] / 1048576:.0f} Mo."
+        )
+    reloads = catalog_reloads(PRODUCTS_FILE)
+    if reloads:
+        last_reload = reloads[-1]
+        st.caption(
+            f"Catalogue chargé le {datetime.fromtimestamp(last_reload.loaded_at):%d/%m/%Y à %H:%M:%S} "
+            f"en {last_reload.duration_ms:.0f} ms: {last_reload.rows} produits "
+            f"(+{len(last_reload.added)}, -{len(last_reload.removed)}, ~{len(last_reload.changed)})."
+        )
+    last_render = font_stats["last"]
+    if last_render is not None:
+        st.caption(
+            f"Dernier PDF: {last_render['bytes'] / 1024:.1f} Ko en {last_render['ms']:.0f} ms "
+            f"({last_render['glyphs']} glyphes embarqués)."
+        )
+
+    export_col_1, export_col_2 = st.columns(2)
+    export_col_1.download_button(
+        "Mesures (JSON)",
+        data=export_json(stages, caches),
+        file_name="mesures.json",
+        mime="application/json",
+        use_container_width=True,
+    )
+    export_col_2.download_button(
+        "Mesures (Prometheus)",
+        data=export_prometheus(stages, caches),
+        file_name="mesures.prom",
+        mime="text/plain",
+        use_container_width=True,
+    )
+
 
 st.markdown(
     """
@@ -161,44 +295,145 @@ except Exception:
     st.error("Impossible de charger la liste des produits pour le moment.")
     st.stop()
 
-for warning in warnings:
+pricing = get_pricing(products_df, PRODUCTS_FILE)
+for warning in [*warnings, *pricing.warnings]:
     st.warning(warning)
 
-editor_key = f"order_editor_{st.session_state.editor_nonce}"
+catalog_version = str(products_df.attrs.get("catalog_version", ""))
+if st.session_state.catalog_version != catalog_version:
+    previous_order = st.session_state.get(ORDER_STATE_KEY)
+    if st.session_state.catalog_version is not None and previous_order is not None and previous_order.has_choices():
+        # Choices are keyed by catalog position, which may now point at other products.
+        st.session_state.editor_nonce += 1
+        st.info("Le catalogue a été mis à jour: votre sélection a été réinitialisée.")
+    st.session_state.catalog_version = catalog_version
+
+order_key = f"order_{st.session_state.editor_nonce}"
 
-edited_df = st.data_editor(
-    products_df,
-    key=editor_key,
-    hide_index=True,
+
+def render_price_list() -> bytes:
+    # Imported on click: the catalog PDF needs fpdf and Pillow, the order page does not.
+    from price_list import cached_price_list
+
+    return cached_price_list(products_df)
+
+
+catalog_col, member_col = st.columns([1, 2])
+catalog_col.download_button(
+    label="Télécharger le catalogue (PDF)",
+    data=render_price_list,
+    file_name="Catalogue_Champ_du_Puits.pdf",
+    mime="application/pdf",
     use_container_width=True,
-    row_height=92,
-    disabled=["name", "price_label", "category", "image_path", "unit_price", "units"],
-    column_order=["select", "image_path", "name", "price_label", "quantity", "category"],
-    column_config={
-        "select": st.column_config.CheckboxColumn(
-            label="Commander",
-            help="Cochez pour ajouter le produit au bon de commande.",
-        ),
-        "image_path": st.column_config.ImageColumn(
-            label="Photo",
-            width="small",
-            help="Photo non contractuelle",
-        ),
-        "name": st.column_config.TextColumn(label="Produit", width="large"),
-        "price_label": st.column_config.TextColumn(label="Prix unitaire"),
-        "quantity": st.column_config.NumberColumn(
-            label="Quantité",
-            min_value=0.0,
-            step=0.1,
-            format="%.1f",
-        ),
-        "category": st.column_config.TextColumn(label="Catégorie"),
-        "units": None,
-        "unit_price": None,
-    },
 )
 
-order_df, total_amount = build_order(edited_df)
+is_member = False
+if pricing.has_member_prices and has_member_code():
+    member_code = member_col.text_input(
+        "Code adhérent (optionnel)",
+        type="password",
+        key="member_code",
+        label_visibility="collapsed",
+        placeholder="Code adhérent (optionnel)",
+    )
+    is_member = is_valid_member_code(member_code)
+    if is_member:
+        member_col.caption("Tarifs adhérent appliqués.")
+    elif member_code:
+        member_col.caption("Code adhérent incorrect.")
+
+
+def go_to_page(page: int) -> None:
+    st.session_state.browser_page = page
+
+
+catalog_index = get_catalog_index(products_df)
+filter_col_1, filter_col_2 = st.columns([2, 1])
+search_query = filter_col_1.text_input(
+    "Rechercher un produit",
+    key="browser_query",
+    placeholder="Exemple: miel lavande, reblochon",
+    on_change=go_to_page,
+    args=(1,),
+)
+category_filter = filter_col_2.selectbox(
+    "Catégorie",
+    [ALL_CATEGORIES, *catalog_index.categories],
+    key="browser_category",
+    on_change=go_to_page,
+    args=(1,),
+)
+matches = catalog_index.search(search_query, None if category_filter == ALL_CATEGORIES else category_filter)
+page_positions, page, page_count = page_slice(matches, st.session_state.browser_page, PAGE_SIZE)
+st.session_state.browser_page = page
+
+# Each page gets its own editor: edits are keyed by row within the page.
+view = (search_query, category_filter, page)
+if st.session_state.browser_view != view:
+    # An edit committed together with the page change still belongs to the page being left.
+    left_editor = f"order_editor_{st.session_state.editor_nonce}_{st.session_state.view_nonce}"
+    update_order(st.session_state, order_key, left_editor, products_df, pricing, member=is_member)
+    st.session_state.browser_view = view
+    st.session_state.view_nonce += 1
+editor_key = f"order_editor_{st.session_state.editor_nonce}_{st.session_state.view_nonce}"
+page_df = get_order_state(st.session_state, order_key, products_df).page_frame(products_df, page_positions, editor_key)
+
+if not len(matches):
+    st.info("Aucun produit ne correspond à votre recherche.")
+else:
+    st.data_editor(
+        page_df,
+        key=editor_key,
+        hide_index=True,
+        use_container_width=True,
+        row_height=92,
+        disabled=["name", "price_label", "category", "image_path", "unit_price", "units"],
+        column_order=["select", "image_path", "name", "price_label", "quantity", "category"],
+        column_config={
+            "select": st.column_config.CheckboxColumn(
+                label="Commander",
+                help="Cochez pour ajouter le produit au bon de commande.",
+            ),
+            "image_path": st.column_config.ImageColumn(
+                label="Photo",
+                width="small",
+                help="Photo non contractuelle",
+            ),
+            "name": st.column_config.TextColumn(label="Produit", width="large"),
+            "price_label": st.column_config.TextColumn(label="Prix unitaire"),
+            "quantity": st.column_config.NumberColumn(
+                label="Quantité",
+                min_value=0.0,
+                step=0.1,
+                format="%.1f",
+            ),
+            "category": st.column_config.TextColumn(label="Catégorie"),
+            "units": None,
+            "unit_price": None,
+            "unit_cents": None,
+        },
+    )
+
+    nav_col_1, nav_col_2, nav_col_3 = st.columns([1, 2, 1])
+    nav_col_1.button(
+        "◀ Précédent",
+        disabled=page <= 1,
+        on_click=go_to_page,
+        args=(page - 1,),
+        use_container_width=True,
+    )
+    nav_col_2.caption(f"{len(matches)} produit(s), page {page} sur {page_count}")
+    nav_col_3.button(
+        "Suivant ▶",
+        disabled=page >= page_count,
+        on_click=go_to_page,
+        args=(page + 1,),
+        use_container_width=True,
+    )
+
+order_df, total_cents = update_order(
+    st.session_state, order_key, editor_key, products_df, pricing, page_positions, member=is_member
+)
 
 if order_df.empty:
     st.info("Sélectionnez au moins un produit avec une quantité supérieure à 0 pour générer un bon de commande.")
@@ -207,7 +442,7 @@ else:
 
     m1, m2, m3 = st.columns(3)
     m1.metric("Produits", str(order_df.shape[0]))
-    m2.metric("Montant total", format_euro(total_amount))
+    m2.metric("Montant total", format_cents(total_cents))
     m3.metric("Mise à jour", datetime.now().strftime("%H:%M"))
 
     preview_df = order_df[["name", "price_label", "quantity_label", "line_total_label"]].rename(
@@ -236,6 +471,12 @@ else:
             placeholder="Indications de retrait, contraintes horaires, etc.",
             height=90,
         )
+        distribution_day = st.date_input(
+            "Jour de retrait",
+            value=next_distribution_day(),
+            min_value=datetime.now().date(),
+            format="DD/MM/YYYY",
+        )
 
         client_name = client_name_input.strip()
         is_name_valid, name_message = validate_client_name(client_name)
@@ -243,12 +484,26 @@ else:
         if client_name and not is_name_valid:
             st.warning(name_message)
 
-        pdf_bytes = None
-        if is_name_valid:
-            try:
-                pdf_bytes = generate_order_pdf(order_df, client_name, note)
-            except Exception:
-                st.error("La génération du PDF a échoué. Réessayez après avoir vérifié les données.")
+        # One order per session order: downloading it again, even after changes, replaces it in the book.
+        order_uid = get_order_state(st.session_state, order_key, products_df).order_uid
+
+        def render_order_pdf() -> bytes:
+            pdf_bytes = cached_order_pdf(
+                order_df,
+                client_name,
+                note,
+                catalog_version=catalog_version,
+            )
+            record_order(
+                order_uid,
+                order_df,
+                client_name,
+                distribution_day,
+                note,
+                created_at=datetime.now().replace(microsecond=0),
+                catalog_version=catalog_version,
+            )
+            return pdf_bytes
 
         safe_client_name = make_safe_filename(client_name or "client")
         pdf_filename = f"Commande_{safe_client_name}_{datetime.now():%Y%m%d}.pdf"
@@ -261,11 +516,11 @@ else:
 
         action_col_2.download_button(
             label="Télécharger le bon de commande",
-            data=pdf_bytes if pdf_bytes is not None else b"",
+            data=render_order_pdf if is_name_valid else b"",
             file_name=pdf_filename,
             mime="application/pdf",
             type="primary",
-            disabled=pdf_bytes is None,
+            disabled=not is_name_valid,
             use_container_width=True,
         )
 
@@ -286,18 +541,24 @@ else:
                     else:
                         st.error("Mot de passe invalide.")
             else:
+                # Mail and pick lists are only loaded once an administrator is signed in.
+                from order_mail import get_mail_job, queue_email
+                from picklists import aggregate_pick_lists, generate_pick_list_pdf
+
                 st.success("Mode administration actif.")
 
                 default_receiver = get_default_receiver() or get_contact_email()
                 receiver = st.text_input("Destinataire", value=default_receiver)
 
-                if st.button("Envoyer le PDF par e-mail", use_container_width=True, disabled=pdf_bytes is None):
-                    if pdf_bytes is None:
-                        st.error("Le PDF n'est pas prêt. Vérifiez le nom client et la commande.")
+                if st.button("Envoyer le PDF par e-mail", use_container_width=True, disabled=not is_name_valid):
+                    try:
+                        pdf_bytes = render_order_pdf()
+                    except Exception:
+                        st.error("La génération du PDF a échoué. Réessayez après avoir vérifié les données.")
                     else:
                         subject = f"Commande de la part de {client_name}"
                         body = "Commande générée depuis l'application Streamlit."
-                        success, message = send_email(
+                        success, result = queue_email(
                             receiver=receiver,
                             subject=subject,
                             body=body,
@@ -305,9 +566,93 @@ else:
                             attachment_name=pdf_filename,
                         )
                         if success:
-                            st.success(message)
+                            st.session_state.mail_jobs.append(result)
+                            st.success(f"E-mail pour {receiver.strip()} ajouté à la file d'envoi.")
                         else:
-                            st.error(message)
+                            st.error(result)
+
+                if st.session_state.mail_jobs:
+                    st.markdown("##### Envois récents")
+                    for job_id in reversed(st.session_state.mail_jobs[-10:]):
+                        job = get_mail_job(job_id)
+                        if job is None:
+                            continue
+                        label = MAIL_STATUS_LABELS.get(job.status, job.status)
+                        detail = f" ({job.error}, tentative {job.attempts})" if job.error else ""
+                        st.caption(f"{job.receiver}: {label}{detail}")
+                    st.button("Actualiser les statuts", use_container_width=False)
+
+                st.markdown("##### Carnet de commandes")
+                today = datetime.now().date()
+                period = st.date_input(
+                    "Jours de distribution",
+                    value=(today - timedelta(days=13), today),
+                    format="DD/MM/YYYY",
+                )
+                client_filter = st.text_input("Client", value="", placeholder="Nom exact du client")
+                try:
+                    store = get_order_store()
+                    if client_filter.strip():
+                        book_df = store.orders_for_client(client_filter)[
+                            ["client_name", "created_at", "distribution_day", "total", "note"]
+                        ].rename(
+                            columns={
+                                "client_name": "Client",
+                                "created_at": "Date",
+                                "distribution_day": "Distribution",
+                                "total": "Total (€)",
+                                "note": "Remarque",
+                            }
+                        )
+                    else:
+                        start, end = (period[0], period[-1]) if period else (None, None)
+                        book_df = store.quantity_by_product_day(start, end).rename(
+                            columns={
+                                "distribution_day": "Distribution",
+                                "category": "Catégorie",
+                                "product": "Produit",
+                                "units": "Unité",
+                                "quantity": "Quantité",
+                                "orders": "Commandes",
+                                "amount": "Montant (€)",
+                            }
+                        )
+                except Exception:
+                    st.error("Le carnet de commandes est indisponible pour le moment.")
+                else:
+                    if book_df.empty:
+                        st.caption("Aucune commande enregistrée sur cette période.")
+                    else:
+                        st.dataframe(book_df, hide_index=True, use_container_width=True)
+
+                st.markdown("##### Listes de préparation")
+                pick_day = st.date_input("Jour de préparation", value=today, format="DD/MM/YYYY")
+                try:
+                    pick_lists = aggregate_pick_lists(
+                        get_order_store().iter_day_lines(pick_day),
+                        pick_day.isoformat(),
+                        with_clients=True,
+                    )
+                except Exception:
+                    st.error("Les listes de préparation sont indisponibles pour le moment.")
+                else:
+                    if pick_lists.totals.empty:
+                        st.caption("Aucune commande à préparer ce jour-là.")
+                    else:
+                        st.caption(f"{pick_lists.orders} commande(s) à préparer.")
+                        pick_columns = st.columns(min(len(pick_lists.categories), 3))
+                        for index, category in enumerate(pick_lists.categories):
+                            pick_columns[index % len(pick_columns)].download_button(
+                                label=category,
+                                data=partial(generate_pick_list_pdf, pick_lists, category),
+                                file_name=f"Preparation_{pick_day:%Y%m%d}_{make_safe_filename(category)}.pdf",
+                                mime="application/pdf",
+                                key=f"pick_list_{index}",
+                                use_container_width=True,
+                            )
+
+                st.markdown("##### Performances")
+                performance_panel()
 
 st.markdown("---")
 st.markdown("### Contact")
@@ -0,0 +1,117 @@
+﻿from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import (  # noqa: E402
+    FALLBACK_IMAGE,
+    PROJECT_ROOT,
+    _format_unit_cents,
+    _normalize_image_paths,
+)
+from money import to_cents  # noqa: E402
+
+
+IMAGE_POOL = [
+    "data/images/apiculture/miel_lavande_500.jpg",
+    "data/images/apiculture/caramiel_250.jpg",
+    "data/images/fromagerie/bleu.png",
+    "data/images/fromagerie/missing.png",
+    "https://example.org/images/raclette.png",
+    "",
+]
+UNITS_POOL = ["€", "€/Kg", ""]
+
+
+def _legacy_format_unit_price(unit_price: float, unit: str) -> str:
+    safe_unit = (unit or "").strip()
+    if safe_unit:
+        return f"{unit_price:.2f} {safe_unit}"
+    return f"{unit_price:.2f}"
+
+
+def _legacy_normalize_image_path(raw_path: Any) -> str:
+    if pd.isna(raw_path):
+        return FALLBACK_IMAGE.as_posix() if FALLBACK_IMAGE.exists() else ""
+
+    value = str(raw_path).strip()
+    if not value:
+        return FALLBACK_IMAGE.as_posix() if FALLBACK_IMAGE.exists() else ""
+
+    if value.startswith(("http://", "https://", "data:image/")):
+        return value
+
+    candidate = Path(value)
+    if not candidate.is_absolute():
+        candidate = (PROJECT_ROOT / candidate).resolve()
+
+    if candidate.exists() and candidate.is_file():
+        return candidate.as_posix()
+
+    return FALLBACK_IMAGE.as_posix() if FALLBACK_IMAGE.exists() else ""
+
+
+def _legacy(data: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    labels = data.apply(
+        lambda row: _legacy_format_unit_price(float(row["unit_price"]), str(row["units"])),
+        axis=1,
+    )
+    return labels, data["image_path"].apply(_legacy_normalize_image_path)
+
+
+def _vectorized(data: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    cents = pd.Series(to_cents(data["unit_price"]), index=data.index)
+    return _format_unit_cents(cents, data["units"]), _normalize_image_paths(data["image_path"])
+
+
+def synthetic_catalog(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "unit_price": rng.integers(50, 5000, size=rows) / 100,
+            "units": rng.choice(UNITS_POOL, size=rows),
+            "image_path": rng.choice(IMAGE_POOL, size=rows),
+        }
+    )
+
+
+def _best_of(func: Callable[[pd.DataFrame], Any], data: pd.DataFrame, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Row-wise vs vectorized catalog normalization.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>8} {'row-wise (ms)':>14} {'vectorized (ms)':>16} {'speedup':>8}")
+    for rows in args.rows:
+        data = synthetic_catalog(rows)
+        legacy_labels, legacy_images = _legacy(data)
+        labels, images = _vectorized(data)
+        if not (legacy_labels.equals(labels) and legacy_images.equals(images)):
+            print(f"Résultats divergents pour {rows} lignes", file=sys.stderr)
+            return 1
+
+        legacy_s = _best_of(_legacy, data, args.repeat)
+        vector_s = _best_of(_vectorized, data, args.repeat)
+        print(f"{rows:>8} {legacy_s * 1000:>14.1f} {vector_s * 1000:>16.1f} {legacy_s / vector_s:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
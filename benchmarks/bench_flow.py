@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import platform
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+# Keep catalog snapshots of synthetic workbooks out of the project cache.
+os.environ.setdefault("CDP_CACHE_DIR", tempfile.mkdtemp(prefix="cdp-bench-cache-"))
+
+from catalog import load_catalog, snapshot_path_for  # noqa: E402
+from mailer import FINAL_STATUSES, STATUS_SENT  # noqa: E402
+from order_mail import get_mail_job, queue_email, send_email  # noqa: E402
+from order_pdf import generate_order_pdf  # noqa: E402
+from utils import build_order, load_products, prepare_products  # noqa: E402
+
+
+CATEGORIES = ["Apiculture", "Fromagerie", "Maraîchage", "Boulangerie", "Volaille"]
+IMAGE_POOL = [
+    "data/images/apiculture/caramiel_250.jpg",
+    "data/images/apiculture/miel_lavande_500.jpg",
+    "data/images/fromagerie/bleu.png",
+    "data/images/fromagerie/raclette.png",
+    "data/images/maraichage/pain_epices.jpg",
+    "",
+]
+PERCENTILES = (50, 90, 95, 99)
+
+
+def write_synthetic_catalog(path: Path, rows: int, seed: int = 0) -> Path:
+    rng = np.random.default_rng(seed)
+    units = rng.choice(["€", "€/Kg"], size=rows)
+    frame = pd.DataFrame(
+        {
+            "name": [f"Produit {index:05d}" for index in range(rows)],
+            "price": rng.integers(150, 4500, size=rows) / 100,
+            "units": units,
+            "category": rng.choice(CATEGORIES, size=rows),
+            "image_path": rng.choice(IMAGE_POOL, size=rows),
+        }
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_excel(path, sheet_name="products", index=False)
+    return path
+
+
+def edited_products(products: pd.DataFrame, lines: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    edited = products.copy()
+    picked = rng.choice(len(edited), size=min(lines, len(edited)), replace=False)
+    edited.loc[edited.index[picked], "select"] = True
+    edited.loc[edited.index[picked], "quantity"] = rng.integers(1, 30, size=picked.size) / 10 + 1
+    return edited
+
+
+class _SmtpStubHandler(socketserver.StreamRequestHandler):
+    def _reply(self, text: str) -> None:
+        self.wfile.write(f"{text}\r\n".encode("ascii"))
+
+    def handle(self) -> None:
+        self._reply("220 stub ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"EHLO":
+                # One write per reply: split multi-line replies stall on delayed ACKs.
+                self._reply("250-stub\r\n250-AUTH PLAIN LOGIN\r\n250 SIZE 52428800")
+            elif command == b"AUTH":
+                self._reply("235 Authentication successful")
+            elif command == b"DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.messages += 1  # type: ignore[attr-defined]
+                self._reply("250 OK")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    """Plain-text SMTP sink on localhost that accepts and discards every message."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _SmtpStubHandler)
+        self.messages = 0
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self) -> "SmtpStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1) -> list[float]:
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(name: str, params: dict[str, Any], timings: list[float]) -> dict[str, Any]:
+    values = np.asarray(timings)
+    result: dict[str, Any] = {
+        "name": name,
+        "params": params,
+        "n": int(values.size),
+        "min_ms": float(values.min()),
+        "mean_ms": float(values.mean()),
+        "max_ms": float(values.max()),
+    }
+    for percentile in PERCENTILES:
+        result[f"p{percentile}_ms"] = float(np.percentile(values, percentile))
+    return result
+
+
+def _case_key(case: dict[str, Any]) -> str:
+    params = ",".join(f"{key}={value}" for key, value in sorted(case["params"].items()))
+    return f"{case['name']}[{params}]"
+
+
+def _environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    import streamlit
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "streamlit": streamlit.__version__,
+    }
+
+
+def bench_catalog(results: list[dict[str, Any]], workbook: Path, rows: int, repeat: int) -> pd.DataFrame:
+    snapshot = snapshot_path_for(workbook)
+
+    def cold() -> None:
+        snapshot.unlink(missing_ok=True)
+        load_catalog(workbook)
+
+    results.append(summarize("catalog.compile", {"rows": rows}, measure(cold, max(1, repeat // 4), warmup=0)))
+    results.append(summarize("catalog.snapshot", {"rows": rows}, measure(lambda: load_catalog(workbook), repeat)))
+
+    catalog, _ = load_catalog(workbook)
+    results.append(summarize("catalog.prepare", {"rows": rows}, measure(lambda: prepare_products(catalog), repeat)))
+    results.append(summarize("load_products", {"rows": rows}, measure(lambda: load_products(workbook), repeat * 5)))
+    products, _ = load_products(workbook)
+    return products
+
+
+def bench_orders(
+    results: list[dict[str, Any]], products: pd.DataFrame, rows: int, line_counts: list[int], repeat: int
+) -> None:
+    for lines in line_counts:
+        if lines > rows:
+            continue
+        edited = edited_products(products, lines)
+        results.append(
+            summarize("build_order", {"rows": rows, "lines": lines}, measure(lambda: build_order(edited), repeat))
+        )
+
+
+def bench_pdf(results: list[dict[str, Any]], products: pd.DataFrame, line_counts: list[int], repeat: int) -> bytes:
+    document = b""
+    for lines in line_counts:
+        order_df, _ = build_order(edited_products(products, lines))
+        timings = measure(lambda: generate_order_pdf(order_df, "Client Benchmark", "Remarque"), repeat)
+        document = generate_order_pdf(order_df, "Client Benchmark")
+        case = summarize("generate_order_pdf", {"lines": lines}, timings)
+        case["bytes"] = len(document)
+        results.append(case)
+    return document
+
+
+def bench_mail(results: list[dict[str, Any]], attachment: bytes, repeat: int, workdir: Path) -> None:
+    with SmtpStub() as stub:
+        # send_email and queue_email read the SMTP settings from the secrets of the working directory.
+        project = workdir / "mail"
+        (project / ".streamlit").mkdir(parents=True, exist_ok=True)
+        (project / ".streamlit" / "secrets.toml").write_text(
+            "[email]\n"
+            'address = "ferme@example.org"\n'
+            'passkey = "bench"\n'
+            'smtp_host = "127.0.0.1"\n'
+            f"smtp_port = {stub.port}\n"
+            "smtp_ssl = false\n",
+            encoding="utf-8",
+        )
+        previous_cwd = Path.cwd()
+        os.chdir(project)
+        try:
+
+            def send() -> None:
+                sent, message = send_email("client@example.org", "Commande", "Bonjour", attachment)
+                if not sent:
+                    raise RuntimeError(message)
+
+            def queue_until_sent() -> None:
+                queued, job_id = queue_email("client@example.org", "Commande", "Bonjour", attachment)
+                if not queued:
+                    raise RuntimeError(job_id)
+                while (job := get_mail_job(job_id)) is not None and job.status not in FINAL_STATUSES:
+                    time.sleep(0.0002)
+                if job is None or job.status != STATUS_SENT:
+                    raise RuntimeError(f"E-mail {job_id}: {job.error if job else 'introuvable'}")
+
+            results.append(summarize("send_email", {}, measure(send, repeat)))
+            results.append(summarize("queue_email.sent", {}, measure(queue_until_sent, repeat)))
+        finally:
+            os.chdir(previous_cwd)
+
+
+def bench_apptest(results: list[dict[str, Any]], repeat: int) -> None:
+    from streamlit.testing.v1 import AppTest
+
+    def run_page() -> None:
+        app = AppTest.from_file(str(ROOT / "Accueil.py"), default_timeout=60).run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+
+    started = time.perf_counter()
+    run_page()
+    results.append(summarize("apptest.first_run", {}, [(time.perf_counter() - started) * 1000]))
+    results.append(summarize("apptest.run", {}, measure(run_page, repeat, warmup=0)))
+
+
+def compare(previous: dict[str, Any], current: dict[str, Any], threshold: float) -> list[str]:
+    before = {_case_key(case): case for case in previous.get("results", [])}
+    regressions = []
+    print(f"\n{'cas':<58} {'p50 avant':>10} {'p50 après':>10} {'ratio':>7}")
+    for case in current["results"]:
+        key = _case_key(case)
+        old = before.get(key)
+        if old is None or old["p50_ms"] <= 0:
+            continue
+        ratio = case["p50_ms"] / old["p50_ms"]
+        flag = " <-" if ratio > threshold else ""
+        print(f"{key:<58} {old['p50_ms']:>10.2f} {case['p50_ms']:>10.2f} {ratio:>6.2f}x{flag}")
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai de bout en bout du parcours de commande.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1_000, 10_000, 50_000])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip", nargs="*", default=[], choices=["catalog", "orders", "pdf", "mail", "apptest"])
+    parser.add_argument("--output", default="bench_flow.json", help="Fichier JSON des résultats.")
+    parser.add_argument("--compare", default=None, help="Résultats précédents à comparer (JSON).")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Ratio de p50 signalé comme régression.")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore")
+    results: list[dict[str, Any]] = []
+    workdir = Path(tempfile.mkdtemp(prefix="cdp-bench-"))
+    products = None
+    pdf_products = None
+
+    for rows in sorted(args.rows):
+        workbook = write_synthetic_catalog(workdir / f"products_{rows}.xlsx", rows)
+        if "catalog" in args.skip:
+            products = prepare_products(load_catalog(workbook)[0])
+        else:
+            products = bench_catalog(results, workbook, rows, args.repeat)
+        if "orders" not in args.skip:
+            bench_orders(results, products, rows, args.lines, args.repeat)
+        if pdf_products is None and rows >= max(args.lines):
+            pdf_products = products
+        print(f"{rows} lignes de catalogue: ok", file=sys.stderr)
+
+    attachment = b""
+    if "pdf" not in args.skip and pdf_products is not None:
+        attachment = bench_pdf(results, pdf_products, args.lines, args.repeat)
+    if "mail" not in args.skip:
+        bench_mail(results, attachment or b"%PDF-1.4\n" * 2000, args.repeat, workdir)
+    if "apptest" not in args.skip:
+        bench_apptest(results, max(1, args.repeat // 4))
+
+    report = {"environment": _environment(), "results": results}
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"{'cas':<58} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for case in results:
+        print(f"{_case_key(case):<58} {case['p50_ms']:>9.2f} {case['p95_ms']:>9.2f} {case['p99_ms']:>9.2f}")
+    print(f"Résultats écrits dans {args.output}")
+
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text(encoding="utf-8")), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.2f}x", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
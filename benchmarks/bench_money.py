@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from money import format_cents_array, line_cents, parse_cents  # noqa: E402
+
+
+SUFFIXES = ["", " €", "€", " € / kg", " EUR", "€/Kg"]
+
+
+def random_prices(count: int, distinct: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    whole = rng.integers(0, 100_000, size=distinct).tolist()
+    fractions = rng.integers(0, 100, size=distinct).tolist()
+    suffixes = rng.choice(SUFFIXES, size=distinct).tolist()
+    texts = [f"{number},{fraction:02d}{suffix}" for number, fraction, suffix in zip(whole, fractions, suffixes)]
+    return pd.Series(np.array(texts, dtype=object)[rng.integers(0, distinct, size=count)], dtype=object)
+
+
+def _timed_ms(function, *args) -> float:
+    started = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Débit des montants en centimes: lecture des prix, totaux de ligne, libellés.")
+    parser.add_argument("--prices", type=int, default=100_000)
+    parser.add_argument("--distinct", type=int, default=5_000)
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    values = random_prices(args.prices, args.distinct, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    unit = rng.integers(0, 1_000_000, size=args.lines)
+    tenths = rng.integers(0, 10_000, size=args.lines)
+    totals = line_cents(unit, tenths)
+
+    print(f"{args.prices} prix ({args.distinct} distincts) lus en {_timed_ms(parse_cents, values):.1f} ms")
+    print(f"{args.lines} totaux de ligne en {_timed_ms(line_cents, unit, tenths):.1f} ms")
+    print(f"{args.lines} libellés en {_timed_ms(format_cents_array, totals):.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import argparse
+import gc
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import _format_unit_cents  # noqa: E402
+from order_state import IncrementalOrder  # noqa: E402
+from pricing import PricingTables, compile_pricing  # noqa: E402
+from utils import build_order, prepare_products  # noqa: E402
+
+
+CATEGORIES = ["Apiculture", "Fromagerie", "Maraîchage", "Boulangerie", "Volaille"]
+PAGE_SIZE = 25
+
+
+def synthetic_products(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    catalog = pd.DataFrame(
+        {
+            "image_path": [f"/app/static/thumbnails/{index:05d}.webp" for index in range(rows)],
+            "name": [f"Produit {index:05d}" for index in range(rows)],
+            "category": rng.choice(CATEGORIES, size=rows),
+            "unit_cents": rng.integers(150, 4500, size=rows),
+            "units": rng.choice(["€", "€/Kg"], size=rows),
+        }
+    )
+    catalog["unit_price"] = catalog["unit_cents"] / 100
+    catalog["price_label"] = _format_unit_cents(catalog["unit_cents"], catalog["units"])
+    products = prepare_products(catalog)
+    products.attrs["catalog_version"] = f"bench-{rows}-{seed}"
+    return products
+
+
+def _choices(rows: int, lines: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    positions = np.sort(rng.choice(rows, size=lines, replace=False))
+    return positions, rng.integers(1, 6, size=lines).astype(float)
+
+
+def dataframe_session(
+    products: pd.DataFrame, pricing: PricingTables, positions: np.ndarray, quantities: np.ndarray
+) -> tuple[Any, ...]:
+    # The previous model: the whole edited catalog held by the editor, plus the order built from it.
+    edited = products.copy()
+    edited.iloc[positions, edited.columns.get_loc("select")] = True
+    edited.iloc[positions, edited.columns.get_loc("quantity")] = quantities
+    return (edited, *build_order(edited, pricing))
+
+
+def compact_session(
+    products: pd.DataFrame, pricing: PricingTables, positions: np.ndarray, quantities: np.ndarray
+) -> IncrementalOrder:
+    order = IncrementalOrder("bench", products.attrs["catalog_version"])
+    for page, start in enumerate(range(0, len(positions), PAGE_SIZE)):
+        page_positions = positions[start : start + PAGE_SIZE]
+        edits = {row: {"select": True, "quantity": float(quantity)} for row, quantity in enumerate(quantities[start : start + PAGE_SIZE])}
+        order.apply(products, pricing, edits, f"editor_{page}", page_positions)
+    return order
+
+
+def _retained_bytes(build: Callable[[int], Any], sessions: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(session) for session in range(sessions)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return retained / sessions
+
+
+def _median_ms(func: Callable[[], Any], repeat: int) -> float:
+    timings = np.empty(repeat)
+    for run in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings[run] = (time.perf_counter() - started) * 1000
+    return float(np.median(timings))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Mémoire par session et durée d'une mise à jour de la commande: copie du catalogue contre tableaux compacts.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'produits':>8} {'lignes':>6} {'DataFrame (Ko)':>15} {'compact (Ko)':>13} {'déclaré (Ko)':>13} "
+        f"{'rapport':>8} {'DataFrame (ms)':>15} {'compact (ms)':>13}"
+    )
+    for rows in args.rows:
+        products = synthetic_products(rows)
+        pricing = compile_pricing(products)
+        for lines in args.lines:
+            if lines > rows:
+                continue
+            positions, quantities = _choices(rows, lines, seed=rows + lines)
+
+            frame_kb = _retained_bytes(lambda session: dataframe_session(products, pricing, positions, quantities), args.sessions) / 1024
+            compact_kb = _retained_bytes(lambda session: compact_session(products, pricing, positions, quantities), args.sessions) / 1024
+            order = compact_session(products, pricing, positions, quantities)
+            declared_kb = order.memory_bytes() / 1024
+
+            # One rerun after a quantity change on the current page.
+            edited = products.copy()
+            edited.iloc[positions, edited.columns.get_loc("select")] = True
+            edited.iloc[positions, edited.columns.get_loc("quantity")] = quantities
+            frame_ms = _median_ms(lambda: build_order(edited, pricing), args.repeat)
+
+            last_page = positions[(len(positions) - 1) // PAGE_SIZE * PAGE_SIZE :]
+            editor_key = "editor_rerun"
+            order.page_frame(products, last_page, editor_key)
+            toggles = iter(range(args.repeat * 2))
+
+            def rerun() -> None:
+                order.apply(products, pricing, {0: {"select": True, "quantity": float(next(toggles) % 5 + 1)}}, editor_key)
+                order.page_frame(products, last_page, editor_key)
+
+            compact_ms = _median_ms(rerun, args.repeat)
+            print(
+                f"{rows:>8} {lines:>6} {frame_kb:>15.1f} {compact_kb:>13.1f} {declared_kb:>13.1f} "
+                f"{frame_kb / compact_kb:>7.0f}x {frame_ms:>15.2f} {compact_ms:>13.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
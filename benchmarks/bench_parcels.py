@@ -0,0 +1,70 @@
+﻿from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import shapely
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from parcels import ParcelIndex, load_parcels  # noqa: E402
+
+
+def _per_call_us(func, points: np.ndarray) -> float:
+    start = time.perf_counter()
+    for lat, lon in points:
+        func(lat, lon)
+    return (time.perf_counter() - start) / len(points) * 1e6
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Parcel hit-testing: STRtree index vs full scan.")
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    gdf = load_parcels()
+    start = time.perf_counter()
+    index = ParcelIndex(gdf)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = np.random.default_rng(args.seed)
+    min_lon, min_lat, max_lon, max_lat = gdf.total_bounds
+    points = np.column_stack(
+        [rng.uniform(min_lat, max_lat, args.queries), rng.uniform(min_lon, max_lon, args.queries)]
+    )
+
+    geometries = gdf.geometry.values
+    ids = gdf["geo_parcel"].astype(str).to_numpy()
+
+    def full_scan(lat: float, lon: float) -> str | None:
+        hits = np.flatnonzero(shapely.intersects(geometries, shapely.Point(lon, lat)))
+        return str(ids[hits[0]]) if hits.size else None
+
+    scan_points = points[: max(1, args.queries // 10)]
+    mismatches = sum(
+        1
+        for lat, lon in scan_points
+        if (index.locate(lat, lon) is None) != (full_scan(lat, lon) is None)
+    )
+
+    span = 0.002
+    print(f"{len(index)} parcelles, index construit en {build_ms:.1f} ms")
+    print(f"locate (STRtree)   {_per_call_us(index.locate, points):8.1f} µs/requête")
+    print(f"locate (parcours)  {_per_call_us(full_scan, scan_points):8.1f} µs/requête")
+    print(f"nearest            {_per_call_us(index.nearest, points):8.1f} µs/requête")
+    print(
+        f"bbox ({span}°)      "
+        f"{_per_call_us(lambda lat, lon: index.in_bbox(lon, lat, lon + span, lat + span), points):8.1f} µs/requête"
+    )
+    if mismatches:
+        print(f"{mismatches} résultat(s) divergent(s) avec le parcours complet", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from order_pdf import _add_order_pages, write_order_pdf  # noqa: E402
+from pdf_fonts import CachedFontPDF  # noqa: E402
+from utils import FONT_PATH, format_euro  # noqa: E402
+
+
+CATEGORIES = ["Apiculture", "Fromagerie", "Maraîchage", "Boulangerie", "Volaille"]
+
+
+def synthetic_order(lines: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    price = rng.integers(150, 4500, size=lines) / 100
+    quantity = rng.integers(1, 30, size=lines)
+    line_total = np.round(price * quantity, 2)
+    return pd.DataFrame(
+        {
+            "name": [f"Produit {index:06d}" for index in range(lines)],
+            "category": rng.choice(CATEGORIES, size=lines),
+            "line_total": line_total,
+            "price_label": [format_euro(value) for value in price],
+            "quantity_label": quantity.astype(str),
+            "line_total_label": [format_euro(value) for value in line_total],
+        }
+    )
+
+
+def _in_memory(order_df: pd.DataFrame) -> int:
+    # The previous renderer: whole document in FPDF's buffer, then one latin-1 copy.
+    pdf = CachedFontPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=14)
+    font_family = "Helvetica"
+    if FONT_PATH.exists():
+        pdf.add_cached_font("FarmUnicode", FONT_PATH)
+        font_family = "FarmUnicode"
+    _add_order_pages(pdf, font_family, FONT_PATH.exists(), order_df, "Client Benchmark", "", None)  # type: ignore[arg-type]
+    return len(pdf.output(dest="S").encode("latin-1"))
+
+
+def _measure(func: Callable[[], int]) -> tuple[float, float, int]:
+    # Timed without tracemalloc, which slows allocation-heavy code down.
+    started = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1e6, size
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Mémoire et durée du rendu PDF en mémoire et en flux vers un fichier.")
+    parser.add_argument("--lines", type=int, nargs="+", default=[100, 1_000, 10_000, 50_000])
+    parser.add_argument("--memory-max", type=int, default=10_000, help="Au-delà, le rendu en mémoire n'est pas mesuré.")
+    args = parser.parse_args(argv)
+
+    print(f"{'lines':>8} {'pages':>6} {'Ko':>8} {'mémoire (ms)':>13} {'pic (Mo)':>9} {'flux (ms)':>10} {'pic (Mo)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        target = Path(tmp) / "commande.pdf"
+        for lines in args.lines:
+            order_df = synthetic_order(lines)
+
+            def streamed() -> int:
+                with target.open("wb") as sink:
+                    return write_order_pdf(order_df, "Client Benchmark", sink)
+
+            memory_ms = memory_mb = float("nan")
+            if lines <= args.memory_max:
+                memory_ms, memory_mb, _ = _measure(lambda: _in_memory(order_df))
+            stream_ms, stream_mb, size = _measure(streamed)
+            pages = target.read_bytes().count(b"/Type /Page\n")
+            print(
+                f"{lines:>8} {pages:>6} {size / 1024:>8.0f} {memory_ms:>13.0f} {memory_mb:>9.2f} {stream_ms:>10.0f} {stream_mb:>9.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from money import line_cents  # noqa: E402
+from order_store import LINE_COLUMNS, OrderStore  # noqa: E402
+from picklists import aggregate_pick_lists, generate_pick_list_pdf  # noqa: E402
+
+
+CATEGORIES = ["Apiculture", "Fromagerie", "Maraîchage", "Boulangerie", "Volaille"]
+UNITS_POOL = ["€", "€/Kg"]
+
+
+def synthetic_lines(orders: int, products: int = 120, lines_per_order: int = 8, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    product_ids = np.arange(products)
+    product_category = rng.choice(CATEGORIES, size=products)
+    product_units = rng.choice(UNITS_POOL, size=products)
+    product_cents = rng.integers(150, 3500, size=products)
+
+    # Each order picks distinct products, like build_order does.
+    picks = np.argsort(rng.random((orders, products)), axis=1)[:, :lines_per_order].ravel()
+    order_index = np.repeat(np.arange(orders), lines_per_order)
+    quantity = np.where(product_units[picks] == "€", rng.integers(1, 5, size=picks.size), rng.integers(2, 30, size=picks.size) / 10)
+    amounts = line_cents(product_cents[picks], np.rint(quantity * 10).astype(np.int64))
+    return pd.DataFrame(
+        {
+            "order_uid": pd.Series(order_index).map("order-{:06d}".format),
+            "client_name": pd.Series(order_index % max(orders // 3, 1)).map("Client {:05d}".format),
+            "category": product_category[picks],
+            "product": pd.Series(product_ids[picks]).map("Produit {:03d}".format),
+            "units": product_units[picks],
+            "quantity": quantity,
+            "line_cents": amounts,
+        }
+    )[LINE_COLUMNS]
+
+
+def _chunks(lines: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(lines), chunk_size):
+        yield lines.iloc[start : start + chunk_size]
+
+
+def _per_order_loop(lines: pd.DataFrame) -> dict[tuple[str, str, str], float]:
+    # What a script looping over each order's rows would do.
+    totals: dict[tuple[str, str, str], float] = {}
+    for _, order in lines.groupby("order_uid", sort=False):
+        for _, row in order.iterrows():
+            key = (row["category"], row["product"], row["units"])
+            totals[key] = totals.get(key, 0.0) + float(row["quantity"])
+    return totals
+
+
+def _fill_store(store: OrderStore, lines: pd.DataFrame, day: date) -> None:
+    created_at = datetime.combine(day, datetime.min.time())
+    for order_uid, order in lines.groupby("order_uid", sort=False):
+        order_df = order.rename(columns={"product": "name"}).assign(unit_cents=0)
+        store.record(str(order_uid), order_df, str(order["client_name"].iat[0]), day, created_at=created_at)
+    store.flush(timeout=None)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Agrégation des listes de préparation sur des commandes synthétiques.")
+    parser.add_argument("--orders", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--loop-max", type=int, default=10_000, help="Au-delà, la boucle par commande n'est pas mesurée.")
+    parser.add_argument("--store", action="store_true", help="Mesurer aussi la lecture depuis un carnet SQLite.")
+    parser.add_argument("--details", action="store_true", help="Inclure le détail par client.")
+    args = parser.parse_args(argv)
+
+    day = date.today() + timedelta(days=1)
+    print(f"{'orders':>8} {'lines':>8} {'loop (ms)':>10} {'grouped (ms)':>13} {'store (ms)':>11} {'pdf (ms)':>9}")
+    for orders in args.orders:
+        lines = synthetic_lines(orders)
+
+        loop_ms = float("nan")
+        if orders <= args.loop_max:
+            started = time.perf_counter()
+            expected = _per_order_loop(lines)
+            loop_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        pick_lists = aggregate_pick_lists(_chunks(lines, args.chunk_size), day.isoformat(), with_clients=args.details)
+        grouped_ms = (time.perf_counter() - started) * 1000
+
+        if orders <= args.loop_max:
+            got = pick_lists.totals.set_index(["category", "product", "units"])["quantity"]
+            if any(abs(got[key] - value) > 1e-6 for key, value in expected.items()) or len(got) != len(expected):
+                print(f"Résultats divergents pour {orders} commandes", file=sys.stderr)
+                return 1
+
+        store_ms = float("nan")
+        if args.store:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = OrderStore(Path(tmp) / "orders.sqlite3")
+                _fill_store(store, lines, day)
+                started = time.perf_counter()
+                aggregate_pick_lists(store.iter_day_lines(day, args.chunk_size), day.isoformat(), with_clients=args.details)
+                store_ms = (time.perf_counter() - started) * 1000
+                store.close()
+
+        started = time.perf_counter()
+        for category in pick_lists.categories:
+            generate_pick_list_pdf(pick_lists, category)
+        pdf_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{orders:>8} {len(lines):>8} {loop_ms:>10.1f} {grouped_ms:>13.1f} {store_ms:>11.1f} {pdf_ms:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
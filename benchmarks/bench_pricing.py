@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bench_order_memory import synthetic_products  # noqa: E402
+from pricing import BUNDLE, MEMBER, TIER, PricingTables, compile_pricing, price_lines  # noqa: E402
+from utils import priced_order  # noqa: E402
+
+
+def synthetic_rules(products: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rules = []
+    for name, price in zip(products["name"], products["unit_price"]):
+        draw = rng.random()
+        if draw < 0.2:
+            rules.append({"name": name, "rule": TIER, "min_quantity": 5, "price": round(price * 0.95, 2)})
+            rules.append({"name": name, "rule": TIER, "min_quantity": 10, "price": round(price * 0.9, 2)})
+        elif draw < 0.3:
+            rules.append({"name": name, "rule": "Adhérent", "price": round(price * 0.85, 2)})
+        elif draw < 0.35:
+            rules.append({"name": name, "rule": BUNDLE, "size": 3, "price": round(price * 2.5, 2)})
+    return pd.DataFrame(rules)
+
+
+def _reference_line(products: pd.DataFrame, rules: pd.DataFrame, position: int, quantity: float, member: bool) -> int:
+    # Line by line, straight from the rules sheet: what price_lines must agree with.
+    name, units, unit_price = products.iloc[position][["name", "units", "unit_price"]]
+    tenths = int(np.floor(quantity)) * 10 if units == "€" else int(round(quantity * 10))
+    unit = round(unit_price * 100)
+    bundle = None
+    for rule in rules[rules["name"] == name].itertuples(index=False):
+        kind = str(rule.rule).lower().replace("é", "e")
+        if kind == TIER and tenths >= round(rule.min_quantity * 10):
+            unit = min(unit, round(rule.price * 100))
+        elif kind == MEMBER and member:
+            unit = min(unit, round(rule.price * 100))
+        elif kind == BUNDLE:
+            bundle = (round(rule.size * 10), round(rule.price * 100))
+    line = (unit * tenths + 5) // 10
+    if bundle is not None:
+        count = tenths // bundle[0]
+        line = min(line, count * bundle[1] + (unit * (tenths - count * bundle[0]) + 5) // 10)
+    return line
+
+
+def check(products: pd.DataFrame, rules: pd.DataFrame, tables: PricingTables, orders: int, seed: int = 1) -> int:
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for _ in range(orders):
+        positions = np.sort(rng.choice(len(products), size=int(rng.integers(1, 40)), replace=False))
+        quantities = rng.integers(0, 150, size=len(positions)) / 10
+        member = bool(rng.random() < 0.5)
+        priced = price_lines(tables, positions, quantities, member)
+        expected = [_reference_line(products, rules, int(p), float(q), member) for p, q in zip(positions, quantities)]
+        mismatches += int((priced.line_cents != np.array(expected)).sum())
+    return mismatches
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compilation des règles de prix et durée du calcul d'une commande.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 500, 1_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--check-orders", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="p99 maximal autorisé pour une commande mise en forme.")
+    args = parser.parse_args(argv)
+
+    problems = []
+    for rows in args.rows:
+        products = synthetic_products(rows)
+        rules = synthetic_rules(products)
+        started = time.perf_counter()
+        tables = compile_pricing(products, rules)
+        compile_ms = (time.perf_counter() - started) * 1000
+        print(f"\n{rows} produits, {len(rules)} règles: compilées en {compile_ms:.0f} ms")
+
+        mismatches = check(products, rules, tables, args.check_orders)
+        if mismatches:
+            problems.append(f"{rows} produits: {mismatches} ligne(s) différentes du calcul ligne à ligne")
+
+        print(f"{'lignes':>6} {'prix p50 (µs)':>14} {'prix p99 (µs)':>14} {'commande p50 (ms)':>18} {'commande p99 (ms)':>18}")
+        rng = np.random.default_rng(rows)
+        for lines in args.lines:
+            if lines > rows:
+                continue
+            positions = np.sort(rng.choice(rows, size=lines, replace=False))
+            quantities = rng.integers(1, 150, size=lines) / 10
+            engine = np.empty(args.repeat)
+            frame = np.empty(args.repeat)
+            for run in range(args.repeat):
+                started = time.perf_counter()
+                price_lines(tables, positions, quantities, member=True)
+                engine[run] = (time.perf_counter() - started) * 1e6
+                started = time.perf_counter()
+                priced_order(products, tables, positions, quantities, member=True)
+                frame[run] = (time.perf_counter() - started) * 1000
+            (engine_p50, engine_p99), (frame_p50, frame_p99) = np.percentile(engine, [50, 99]), np.percentile(frame, [50, 99])
+            print(f"{lines:>6} {engine_p50:>14.0f} {engine_p99:>14.0f} {frame_p50:>18.2f} {frame_p99:>18.2f}")
+            if frame_p99 > args.budget_ms:
+                problems.append(f"{rows} produits, {lines} lignes: p99 {frame_p99:.1f} ms")
+
+    for problem in problems:
+        print(f"Problème: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog_index import CatalogIndex  # noqa: E402
+
+
+PRODUCTS = {
+    "Apiculture": ["Miel d'acacia", "Miel de lavande", "Miel de châtaignier", "Miel de forêt", "Pain d'épices", "Caramiel"],
+    "Fromagerie": ["Reblochon fermier", "Tomme de Savoie", "Raclette nature", "Bleu de Gex", "Kéfir", "Fromage frais"],
+    "Maraîchage": ["Pommes de terre", "Carottes nouvelles", "Poireaux", "Courge butternut", "Épinards", "Mâche"],
+    "Boulangerie": ["Pain de campagne", "Brioche", "Baguette tradition", "Pain complet", "Fougasse"],
+    "Volaille": ["Poulet fermier", "Œufs frais", "Pintade", "Canard gras", "Dinde de Noël"],
+}
+SUFFIXES = ["", "bio", "250 g", "500 g", "1 kg", "nature", "aux noix", "affiné", "sachet de 6"]
+QUERIES = [
+    "fromage",
+    "reblochon",
+    "miel lavande",
+    "miel de châtaignier",
+    "chataignier",
+    "oeufs",
+    "tome",
+    "reblochn",
+    "lavnde",
+    "pain complet bio",
+    "p",
+    "variété 1234",
+    "introuvable",
+]
+
+
+def synthetic_catalog(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    pairs = [(category, name) for category, names in PRODUCTS.items() for name in names]
+    picks = rng.integers(0, len(pairs), size=rows)
+    suffixes = rng.choice(SUFFIXES, size=rows)
+    return pd.DataFrame(
+        {
+            "name": [f"{pairs[pick][1]} {suffix} variété {index}".replace("  ", " ") for index, (pick, suffix) in enumerate(zip(picks, suffixes))],
+            "category": [pairs[pick][0] for pick in picks],
+        }
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Temps de construction et de réponse de l'index de recherche du catalogue.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--budget-us", type=float, default=1000.0, help="p99 maximal autorisé par requête (µs).")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for rows in args.rows:
+        catalog = synthetic_catalog(rows)
+        started = time.perf_counter()
+        index = CatalogIndex(catalog)
+        build_ms = (time.perf_counter() - started) * 1000
+        print(f"\n{rows} produits: index construit en {build_ms:.0f} ms ({len(index._vocabulary)} mots)")
+        print(f"{'requête':<24} {'résultats':>9} {'p50 (µs)':>9} {'p99 (µs)':>9} {'max (µs)':>9}  premier résultat")
+
+        for query in QUERIES:
+            timings = np.empty(args.repeat)
+            for run in range(args.repeat):
+                started = time.perf_counter()
+                result = index.search(query)
+                timings[run] = (time.perf_counter() - started) * 1e6
+            p50, p99 = np.percentile(timings, [50, 99])
+            first = catalog["name"].iat[int(result[0])] if len(result) else "-"
+            print(f"{query:<24} {len(result):>9} {p50:>9.0f} {p99:>9.0f} {timings.max():>9.0f}  {first}")
+            if p99 > args.budget_us:
+                over_budget.append(f"{rows} produits, « {query} »: p99 {p99:.0f} µs")
+
+    for problem in over_budget:
+        print(f"Budget dépassé: {problem}", file=sys.stderr)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
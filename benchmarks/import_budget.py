@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import argparse
+import ast
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+
+ROOT = Path(__file__).resolve().parents[1]
+BUDGET_FILE = Path(__file__).with_name("import_budget.json")
+# Already loaded by the Streamlit server before the page runs.
+BASELINE_MODULES = ["streamlit", "pandas", "numpy"]
+MARKER = "--- page imports ---"
+
+
+def page_imports(page: Path) -> list[str]:
+    tree = ast.parse(page.read_text(encoding="utf-8-sig"))
+    modules: list[str] = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0 and node.module != "__future__":
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def _import_run(modules: list[str]) -> dict[str, int]:
+    code = (
+        f"import {', '.join(BASELINE_MODULES)}, sys\n"
+        f"sys.stderr.write({MARKER!r} + '\\n'); sys.stderr.flush()\n"
+        f"import {', '.join(modules)}\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    _, _, page_part = result.stderr.partition(MARKER)
+    self_us: dict[str, int] = {}
+    for line in page_part.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line.split(":", 1)[1].split("|")
+        self_us[name.strip()] = int(own)
+    return self_us
+
+
+def profile(page: Path, runs: int) -> dict[str, Any]:
+    modules = page_imports(page)
+    samples = [_import_run(modules) for _ in range(runs)]
+    names = sorted(set().union(*samples))
+    per_module = {name: statistics.median(sample.get(name, 0) for sample in samples) / 1000 for name in names}
+
+    packages: dict[str, float] = {}
+    for name, ms in per_module.items():
+        top = name.split(".", 1)[0]
+        packages[top] = packages.get(top, 0.0) + ms
+
+    return {
+        "page": page.name,
+        "runs": runs,
+        "imports": modules,
+        "total_ms": statistics.median(sum(sample.values()) for sample in samples) / 1000,
+        "packages_ms": dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)),
+        "modules": names,
+    }
+
+
+def check_budget(report: dict[str, Any], budget: dict[str, Any]) -> list[str]:
+    problems = []
+    loaded = set(report["modules"])
+    for module in budget.get("forbidden", []):
+        offenders = sorted(name for name in loaded if name == module or name.startswith(f"{module}."))
+        if offenders:
+            problems.append(f"{module} est importé au démarrage de {report['page']}")
+    max_ms = budget.get("max_total_ms")
+    if max_ms is not None and report["total_ms"] > max_ms:
+        problems.append(f"imports de {report['page']}: {report['total_ms']:.1f} ms > budget de {max_ms} ms")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Profil des imports au démarrage d'une page et contrôle du budget.")
+    parser.add_argument("--page", default=str(ROOT / "Accueil.py"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", default=str(BUDGET_FILE))
+    parser.add_argument("--json", default=None, help="Écrire le rapport complet dans ce fichier.")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    report = profile(Path(args.page), args.runs)
+    print(f"{report['page']}: {report['total_ms']:.1f} ms d'imports au-delà de {', '.join(BASELINE_MODULES)} (médiane sur {args.runs})")
+    for package, ms in list(report["packages_ms"].items())[: args.top]:
+        print(f"  {package:<28} {ms:>8.1f} ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    budget = json.loads(Path(args.budget).read_text(encoding="utf-8"))
+    problems = check_budget(report, budget.get(report["page"], {}))
+    for problem in problems:
+        print(f"Budget dépassé: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
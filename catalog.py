@@ -0,0 +1,274 @@
+﻿from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from money import parse_cents
+from shared_cache import CACHE_ROOT, file_lock
+from thumbnails import missing_thumbnails, thumbnail_reference
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+FALLBACK_IMAGE = PROJECT_ROOT / "data" / "images" / "coming_soon.png"
+CATALOG_CACHE_DIR = CACHE_ROOT / "catalog"
+
+# Bump when the normalized columns or their meaning change so stale snapshots are rebuilt.
+SNAPSHOT_FORMAT_VERSION = 3
+
+REQUIRED_COLUMNS = {"name", "price", "units", "category", "image_path"}
+REPO_RAW_URL_PATTERN = r"^https://raw\.githubusercontent\.com/AlDenervaud/champdupuits/(?:refs/heads/)?[^/]+/(.+)$"
+CATALOG_COLUMNS = ["image_path", "name", "price_label", "category", "unit_price", "units", "unit_cents"]
+
+_META_VERSION = b"cdp.format_version"
+_META_SHA256 = b"cdp.source_sha256"
+_META_MTIME = b"cdp.source_mtime_ns"
+_META_SIZE = b"cdp.source_size"
+_META_WARNINGS = b"cdp.warnings"
+
+
+def _candidate_image_path(value: str) -> str:
+    if not os.path.isabs(value):
+        value = os.path.join(PROJECT_ROOT, value)
+    return os.path.normpath(value)
+
+
+def _scan_image_files(directories: set[str]) -> set[str]:
+    files: set[str] = set()
+    for directory in directories:
+        try:
+            with os.scandir(directory) as entries:
+                files.update(entry.path for entry in entries if entry.is_file())
+        except OSError:
+            continue
+    return files
+
+
+def _image_reference(path: str) -> str:
+    try:
+        return thumbnail_reference(path)
+    except OSError:
+        return Path(path).as_posix()
+
+
+def _normalize_image_paths(raw_paths: pd.Series) -> pd.Series:
+    fallback = _image_reference(FALLBACK_IMAGE.as_posix()) if FALLBACK_IMAGE.exists() else ""
+
+    values = raw_paths.astype("string").str.strip().fillna("")
+    # Raw GitHub links to this repository point at files we already ship.
+    repo_files = values.str.extract(REPO_RAW_URL_PATTERN, expand=False)
+    is_repo = repo_files.notna()
+    is_remote = values.str.startswith(("http://", "https://", "data:image/")) & ~is_repo
+    is_local = values.ne("") & ~is_remote
+
+    result = pd.Series(fallback, index=values.index, dtype=object)
+    result[is_remote | is_repo] = values[is_remote | is_repo].astype(object)
+
+    if is_local.any():
+        local_values = values.where(~is_repo, repo_files)
+        candidates = local_values[is_local].astype(object).map(_candidate_image_path)
+        # One scandir per distinct parent directory instead of resolve/exists/is_file per row.
+        known_files = _scan_image_files({os.path.dirname(path) for path in candidates.unique()})
+        found = candidates[candidates.isin(known_files)]
+        references = {path: _image_reference(path) for path in found.unique()}
+        result[found.index] = found.map(references)
+        # Repository links whose file is not in this checkout keep their URL.
+        missing_local = candidates.index.difference(found.index).difference(values.index[is_repo])
+        result[missing_local] = fallback
+
+    return result
+
+
+def _format_unit_cents(cents: pd.Series, units: pd.Series) -> pd.Series:
+    magnitude = cents.abs()
+    sign = pd.Series(np.where(cents < 0, "-", ""), index=cents.index)
+    amount = sign + (magnitude // 100).astype(str) + "." + (magnitude % 100).astype(str).str.zfill(2)
+
+    safe_units = units.fillna("").astype(str).str.strip()
+    return amount.where(safe_units.eq(""), amount + " " + safe_units)
+
+
+def read_products_sheet(path: str | Path) -> pd.DataFrame:
+    return pd.read_excel(path, sheet_name="products")
+
+
+def normalize_products(df: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    missing = REQUIRED_COLUMNS - set(df.columns)
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(sorted(missing))}")
+
+    warnings: list[str] = []
+    data = df.copy()
+
+    data["name"] = data["name"].fillna("").astype(str).str.strip()
+    data["category"] = data["category"].fillna("Autres").astype(str).str.strip()
+    data["units"] = data["units"].fillna("").astype(str).str.strip()
+    data["image_path"] = _normalize_image_paths(data["image_path"])
+
+    unit_cents = parse_cents(data["price"])
+    invalid_price_mask = unit_cents.isna()
+    if invalid_price_mask.any():
+        count = int(invalid_price_mask.sum())
+        warnings.append(
+            f"{count} produit(s) ont un prix invalide et ont été fixés à 0,00 € pour éviter les erreurs."
+        )
+
+    data["unit_cents"] = unit_cents.fillna(0).astype("int64")
+    data["unit_price"] = data["unit_cents"] / 100
+    data["price_label"] = _format_unit_cents(data["unit_cents"], data["units"])
+
+    return data[CATALOG_COLUMNS].reset_index(drop=True), warnings
+
+
+def snapshot_path_for(source: str | Path) -> Path:
+    source_path = Path(source)
+    return CATALOG_CACHE_DIR / f"{source_path.stem}.v{SNAPSHOT_FORMAT_VERSION}.arrow"
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_metadata(source: Path, sha256: str, warnings: list[str]) -> dict[bytes, bytes]:
+    stat = source.stat()
+    return {
+        _META_VERSION: str(SNAPSHOT_FORMAT_VERSION).encode(),
+        _META_SHA256: sha256.encode(),
+        _META_MTIME: str(stat.st_mtime_ns).encode(),
+        _META_SIZE: str(stat.st_size).encode(),
+        _META_WARNINGS: json.dumps(warnings, ensure_ascii=False).encode("utf-8"),
+    }
+
+
+def _write_snapshot(table: pa.Table, snapshot: Path) -> None:
+    snapshot.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{snapshot.name}.", dir=snapshot.parent)
+    os.close(fd)
+    try:
+        # Uncompressed so that readers can map the buffers straight from the page cache.
+        feather.write_feather(table, tmp_name, compression="uncompressed")
+        os.replace(tmp_name, snapshot)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _read_snapshot(snapshot: Path) -> pa.Table | None:
+    try:
+        return feather.read_table(snapshot.as_posix(), memory_map=True)
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def _snapshot_state(source: Path, table: pa.Table) -> str:
+    """Return ``"fresh"``, ``"touched"`` (same content, new stat) or ``"stale"``."""
+    meta = table.schema.metadata or {}
+    if meta.get(_META_VERSION) != str(SNAPSHOT_FORMAT_VERSION).encode():
+        return "stale"
+
+    stat = source.stat()
+    if meta.get(_META_MTIME) == str(stat.st_mtime_ns).encode() and meta.get(_META_SIZE) == str(stat.st_size).encode():
+        return "fresh"
+
+    if meta.get(_META_SHA256) == _file_sha256(source).encode():
+        return "touched"
+    return "stale"
+
+
+def _table_to_catalog(table: pa.Table) -> tuple[pd.DataFrame, list[str]]:
+    meta = table.schema.metadata or {}
+    warnings = json.loads(meta.get(_META_WARNINGS, b"[]").decode("utf-8"))
+    catalog = table.to_pandas()[CATALOG_COLUMNS]
+    catalog.attrs["catalog_version"] = meta.get(_META_SHA256, b"").decode()
+    return catalog, list(warnings)
+
+
+def compile_catalog(source: str | Path, snapshot: str | Path | None = None) -> tuple[pd.DataFrame, list[str]]:
+    source_path = Path(source)
+    if not source_path.exists():
+        raise FileNotFoundError(source_path)
+
+    sha256 = _file_sha256(source_path)
+    catalog, warnings = normalize_products(read_products_sheet(source_path))
+    catalog.attrs["catalog_version"] = sha256
+
+    table = pa.Table.from_pandas(catalog, preserve_index=False)
+    table = table.replace_schema_metadata(_source_metadata(source_path, sha256, warnings))
+    target = Path(snapshot) if snapshot is not None else snapshot_path_for(source_path)
+    try:
+        _write_snapshot(table, target)
+    except OSError:
+        # Read-only deployments still work, they just pay the parse on every cold start.
+        pass
+
+    return catalog, warnings
+
+
+def _compile_once(source_path: Path, target: Path) -> tuple[pd.DataFrame, list[str]]:
+    # Replicas sharing the cache directory wait for whichever one is already compiling,
+    # then reuse its snapshot unless it is still stale or missing thumbnails.
+    with file_lock(target.with_name(f"{target.name}.lock")):
+        table = _read_snapshot(target) if target.exists() else None
+        if table is not None and _snapshot_state(source_path, table) != "stale":
+            catalog, warnings = _table_to_catalog(table)
+            if not missing_thumbnails(catalog["image_path"].tolist()):
+                return catalog, warnings
+        return compile_catalog(source_path, target)
+
+
+def load_catalog(source: str | Path, snapshot: str | Path | None = None) -> tuple[pd.DataFrame, list[str]]:
+    source_path = Path(source)
+    if not source_path.exists():
+        raise FileNotFoundError(source_path)
+
+    target = Path(snapshot) if snapshot is not None else snapshot_path_for(source_path)
+    table = _read_snapshot(target) if target.exists() else None
+    if table is None:
+        return _compile_once(source_path, target)
+
+    state = _snapshot_state(source_path, table)
+    if state == "stale":
+        return _compile_once(source_path, target)
+
+    catalog, warnings = _table_to_catalog(table)
+    if missing_thumbnails(catalog["image_path"].tolist()):
+        return _compile_once(source_path, target)
+    if state == "touched":
+        meta = dict(table.schema.metadata or {})
+        meta.update(_source_metadata(source_path, meta[_META_SHA256].decode(), warnings))
+        try:
+            _write_snapshot(table.replace_schema_metadata(meta), target)
+        except OSError:
+            pass
+
+    return catalog, warnings
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile products.xlsx into a binary catalog snapshot.")
+    parser.add_argument("source", nargs="?", default=str(PROJECT_ROOT / "products.xlsx"))
+    parser.add_argument("--output", default=None, help="Snapshot path (default: .cache/catalog/).")
+    args = parser.parse_args(argv)
+
+    target = Path(args.output) if args.output else snapshot_path_for(args.source)
+    catalog, warnings = compile_catalog(args.source, target)
+    print(f"{len(catalog)} produit(s) compilé(s) vers {target}")
+    for warning in warnings:
+        print(f"Attention: {warning}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+DEFAULT_PAGE_SIZE = 25
+# Ignored in queries that have other words: "miel de lavande" finds "Miel lavande bio".
+STOPWORDS = frozenset({"a", "au", "aux", "d", "de", "des", "du", "en", "et", "l", "la", "le", "les"})
+# Shorter tokens, and tokens with digits, are only matched as a prefix, never with typos.
+FUZZY_MIN_LENGTH = 4
+FUZZY_MAX_CANDIDATES = 64
+
+_EMPTY = np.empty(0, dtype=np.int32)
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ß": "ss", "’": "'"})
+
+
+def fold(text: str) -> str:
+    """Lower-cases ``text`` and strips accents: "Châtaignier" -> "chataignier"."""
+    decomposed = unicodedata.normalize("NFKD", str(text).casefold().translate(_LIGATURES))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(fold(text))
+
+
+def _trigrams(token: str) -> set[str]:
+    padded = f" {token} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def _within_edits(left: str, right: str, max_edits: int) -> bool:
+    # Optimal string alignment distance (adjacent swaps count as one edit), stopped early past max_edits.
+    if abs(len(left) - len(right)) > max_edits:
+        return False
+    previous2: list[int] = []
+    previous = list(range(len(right) + 1))
+    for i, left_char in enumerate(left, 1):
+        current = [i] + [0] * len(right)
+        for j, right_char in enumerate(right, 1):
+            cost = left_char != right_char
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and left_char == right[j - 2] and left[i - 2] == right_char:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_edits:
+            return False
+        previous2, previous = previous, current
+    return previous[-1] <= max_edits
+
+
+def _csr(groups: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(group) for group in groups])
+    flat = np.fromiter((value for group in groups for value in group), dtype=np.int32, count=int(offsets[-1]))
+    return flat, offsets
+
+
+class CatalogIndex:
+    """Inverted index from ``name`` and ``category`` words to catalog positions.
+
+    Built once per catalog version. Words are accent-folded and stored in a
+    sorted vocabulary whose posting lists are laid out back to back, so all
+    the words sharing a prefix are one contiguous slice. A query word matches
+    as a prefix; when nothing does, vocabulary words within one or two edits
+    (found through a trigram index) are used instead. Every query word must
+    match; products matching each word in full come first, the others keep
+    catalog order after them.
+    """
+
+    def __init__(self, catalog: pd.DataFrame) -> None:
+        self.catalog_version = str(catalog.attrs.get("catalog_version", ""))
+        self.size = len(catalog)
+
+        categories = catalog["category"].fillna("").astype(str)
+        self._by_category = {
+            category: positions.astype(np.int32)
+            for category, positions in catalog.groupby(categories.to_numpy(), sort=False).indices.items()
+            if category
+        }
+        self.categories = list(self._by_category)
+
+        postings: dict[str, list[int]] = {}
+        folded_categories = {category: set(tokenize(category)) for category in self.categories}
+        for position, (name, category) in enumerate(zip(catalog["name"].astype(str), categories)):
+            for token in set(tokenize(name)) | folded_categories.get(category, set()):
+                postings.setdefault(token, []).append(position)
+
+        self._vocabulary = sorted(postings)
+        self._postings, self._offsets = _csr([postings[token] for token in self._vocabulary])
+
+        trigram_words: dict[str, list[int]] = {}
+        for word_id, token in enumerate(self._vocabulary):
+            if len(token) >= FUZZY_MIN_LENGTH - 1:
+                for trigram in _trigrams(token):
+                    trigram_words.setdefault(trigram, []).append(word_id)
+        self._trigram_ids = {trigram: index for index, trigram in enumerate(trigram_words)}
+        self._trigram_words, self._trigram_offsets = _csr(list(trigram_words.values()))
+
+    def _word_range(self, prefix: str) -> tuple[int, int]:
+        start = bisect_left(self._vocabulary, prefix)
+        return start, bisect_left(self._vocabulary, prefix + "\U0010ffff", lo=start)
+
+    def _similar_words(self, token: str) -> list[int]:
+        max_edits = 1 if len(token) <= 6 else 2
+        trigram_ids = [self._trigram_ids[trigram] for trigram in _trigrams(token) if trigram in self._trigram_ids]
+        if not trigram_ids:
+            return []
+        word_ids = np.concatenate(
+            [self._trigram_words[self._trigram_offsets[index] : self._trigram_offsets[index + 1]] for index in trigram_ids]
+        )
+        candidates, shared = np.unique(word_ids, return_counts=True)
+        # Each edit changes at most three trigrams.
+        needed = max(1, len(_trigrams(token)) - 3 * max_edits)
+        keep = shared >= needed
+        ranked = candidates[keep][np.argsort(-shared[keep], kind="stable")]
+        return [
+            int(word_id)
+            for word_id in ranked[:FUZZY_MAX_CANDIDATES]
+            if _within_edits(token, self._vocabulary[word_id], max_edits)
+        ]
+
+    def _mark(self, mask: np.ndarray, start: int, end: int) -> None:
+        mask[self._postings[self._offsets[start] : self._offsets[end]]] = True
+
+    def search(self, query: str = "", category: str | None = None) -> np.ndarray:
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if any(token not in STOPWORDS for token in tokens):
+            tokens = [token for token in tokens if token not in STOPWORDS]
+
+        if not tokens:
+            if category:
+                return self._by_category.get(category, _EMPTY)
+            return np.arange(self.size, dtype=np.int32)
+
+        matched = np.zeros(self.size, dtype=bool)
+        if category:
+            matched[self._by_category.get(category, _EMPTY)] = True
+        else:
+            matched[:] = True
+        exact = matched.copy()
+
+        for token in tokens:
+            token_matches = np.zeros(self.size, dtype=bool)
+            token_exact = np.zeros(self.size, dtype=bool)
+            start, end = self._word_range(token)
+            if start < end:
+                self._mark(token_matches, start, end)
+                if self._vocabulary[start] == token:
+                    self._mark(token_exact, start, start + 1)
+            elif len(token) >= FUZZY_MIN_LENGTH and token.isalpha():
+                for word_id in self._similar_words(token):
+                    self._mark(token_matches, word_id, word_id + 1)
+            matched &= token_matches
+            exact &= token_exact
+            if not matched.any():
+                return _EMPTY
+
+        first = np.flatnonzero(exact).astype(np.int32)
+        if len(first) == 0:
+            return np.flatnonzero(matched).astype(np.int32)
+        matched[first] = False
+        return np.concatenate([first, np.flatnonzero(matched).astype(np.int32)])
+
+
+def page_slice(positions: np.ndarray, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> tuple[np.ndarray, int, int]:
+    """Returns the positions shown on ``page`` (clamped to the valid range), the page and the page count."""
+    page_count = max(1, -(-len(positions) // page_size))
+    page = min(max(1, int(page)), page_count)
+    start = (page - 1) * page_size
+    return positions[start : start + page_size], page, page_count
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Callable
+
+import pandas as pd
+
+from catalog import load_catalog
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 2.0
+DIFF_COLUMNS = ["unit_price", "units", "category", "image_path"]
+
+Prepare = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+@dataclass(frozen=True)
+class CatalogSwap:
+    version: str
+    loaded_at: float
+    duration_ms: float
+    rows: int
+    added: tuple[str, ...]
+    removed: tuple[str, ...]
+    changed: tuple[str, ...]
+
+
+def diff_catalogs(previous: pd.DataFrame | None, current: pd.DataFrame) -> tuple[list[str], list[str], list[str]]:
+    if previous is None:
+        return current["name"].tolist(), [], []
+
+    before = previous.drop_duplicates("name").set_index("name")
+    after = current.drop_duplicates("name").set_index("name")
+    added = after.index.difference(before.index).tolist()
+    removed = before.index.difference(after.index).tolist()
+
+    common = before.index.intersection(after.index)
+    columns = [column for column in DIFF_COLUMNS if column in before.columns and column in after.columns]
+    left = before.loc[common, columns].astype(str)
+    right = after.loc[common, columns].astype(str)
+    changed = common[(left != right).any(axis=1).to_numpy()].tolist()
+    return added, removed, changed
+
+
+class CatalogWatcher:
+    """Keeps the normalized catalog in memory and reloads it when the workbook changes.
+
+    A daemon thread polls the workbook's mtime and size; reloads happen on that
+    thread and the new catalog replaces the old one with a single reference
+    assignment, so readers see either the old or the new version, never a mix.
+    """
+
+    def __init__(
+        self,
+        source: str | Path,
+        prepare: Prepare | None = None,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        history: int = 20,
+    ) -> None:
+        self.source = Path(source)
+        self.prepare = prepare
+        self.interval = interval
+        self.swaps: deque[CatalogSwap] = deque(maxlen=history)
+        self._current: tuple[pd.DataFrame, list[str]] | None = None
+        self._raw: pd.DataFrame | None = None
+        self._signature: tuple[int, int] | None = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _stat_signature(self) -> tuple[int, int]:
+        stat = os.stat(self.source)
+        return stat.st_mtime_ns, stat.st_size
+
+    def current(self) -> tuple[pd.DataFrame, list[str]]:
+        snapshot = self._current
+        if snapshot is None:
+            self.reload()
+            snapshot = self._current
+            self.start()
+        assert snapshot is not None
+        return snapshot
+
+    def reload(self) -> CatalogSwap | None:
+        with self._reload_lock:
+            signature = self._stat_signature()
+            if self._current is not None and signature == self._signature:
+                return None
+
+            started = time.perf_counter()
+            catalog, warnings = load_catalog(self.source)
+            prepared = self.prepare(catalog) if self.prepare is not None else catalog
+            duration_ms = (time.perf_counter() - started) * 1000
+
+            added, removed, changed = diff_catalogs(self._raw, catalog)
+            swap = CatalogSwap(
+                version=str(catalog.attrs.get("catalog_version", "")),
+                loaded_at=time.time(),
+                duration_ms=duration_ms,
+                rows=len(catalog),
+                added=tuple(added),
+                removed=tuple(removed),
+                changed=tuple(changed),
+            )
+
+            self._raw = catalog
+            self._signature = signature
+            self._current = (prepared, list(warnings))
+            self.swaps.append(swap)
+
+        logger.info(
+            "Catalogue %s chargé en %.1f ms: %d produits (+%d, -%d, ~%d)",
+            swap.version[:12],
+            swap.duration_ms,
+            swap.rows,
+            len(swap.added),
+            len(swap.removed),
+            len(swap.changed),
+        )
+        return swap
+
+    def check_now(self) -> CatalogSwap | None:
+        try:
+            return self.reload()
+        except Exception:
+            # Keep serving the last good catalog while the workbook is being edited or copied.
+            logger.exception("Rechargement du catalogue %s impossible", self.source)
+            return None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check_now()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"catalog-watcher:{self.source.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
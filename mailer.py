@@ -0,0 +1,252 @@
+﻿from __future__ import annotations
+
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+import heapq
+import itertools
+import smtplib
+import ssl
+import threading
+import time
+import uuid
+
+from timings import timed_stage
+
+
+STATUS_QUEUED = "queued"
+STATUS_SENDING = "sending"
+STATUS_RETRYING = "retrying"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+FINAL_STATUSES = {STATUS_SENT, STATUS_FAILED}
+
+
+class MailQueueFull(RuntimeError):
+    pass
+
+
+@dataclass
+class MailJob:
+    job_id: str
+    # Dropped once the job is final so the history keeps no attachments.
+    message: EmailMessage | None = field(repr=False)
+    receiver: str
+    status: str = STATUS_QUEUED
+    attempts: int = 0
+    error: str = ""
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+
+class SmtpConnection:
+    """One authenticated SMTP session reused across messages.
+
+    The session is probed with NOOP after ``keepalive`` seconds of inactivity,
+    reopened when the server dropped it, and closed after ``idle_timeout``.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        credentials: tuple[str, str] | None,
+        use_ssl: bool = True,
+        timeout: float = 20.0,
+        keepalive: float = 60.0,
+        idle_timeout: float = 300.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.credentials = credentials
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.connects = 0
+        self._server: smtplib.SMTP | None = None
+        self._last_used = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self._server is not None
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            server: smtplib.SMTP = smtplib.SMTP_SSL(
+                self.host,
+                self.port,
+                context=ssl.create_default_context(),
+                timeout=self.timeout,
+            )
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.credentials is not None:
+                server.login(*self.credentials)
+        except BaseException:
+            server.close()
+            raise
+        self.connects += 1
+        return server
+
+    def _ensure(self) -> smtplib.SMTP:
+        if self._server is not None and time.monotonic() - self._last_used > self.keepalive:
+            try:
+                status, _ = self._server.noop()
+            except (smtplib.SMTPException, OSError):
+                status = -1
+            if status != 250:
+                self.close()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    @timed_stage("smtp_send")
+    def send(self, message: EmailMessage) -> None:
+        server = self._ensure()
+        try:
+            server.send_message(message)
+        except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused, OSError):
+            self.close()
+            raise
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self) -> None:
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self) -> None:
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+class MailDispatcher:
+    """Bounded in-memory outbox drained by a background thread with retry and backoff."""
+
+    def __init__(
+        self,
+        connection: SmtpConnection,
+        max_queue: int = 100,
+        max_attempts: int = 4,
+        backoff: float = 2.0,
+        history: int = 200,
+    ) -> None:
+        self.connection = connection
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.history = history
+        self._jobs: dict[str, MailJob] = {}
+        self._ready: list[tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, name="mail-dispatcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, message: EmailMessage) -> str:
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Mail dispatcher is stopped")
+            if len(self._ready) >= self.max_queue:
+                raise MailQueueFull(f"{len(self._ready)} e-mails already waiting")
+
+            job = MailJob(job_id=uuid.uuid4().hex[:12], message=message, receiver=str(message["To"] or ""))
+            self._jobs[job.job_id] = job
+            heapq.heappush(self._ready, (time.monotonic(), next(self._sequence), job.job_id))
+            self._prune_history()
+            self._cond.notify()
+            return job.job_id
+
+    def status(self, job_id: str) -> MailJob | None:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._ready)
+
+    def wait(self, job_id: str, timeout: float | None = None) -> MailJob | None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job.status in FINAL_STATUSES:
+                    return job
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return job
+                self._cond.wait(remaining)
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        self.connection.close()
+
+    def _prune_history(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status in FINAL_STATUSES]
+        overflow = len(self._jobs) - self.history
+        for job in sorted(finished, key=lambda item: item.updated_at)[: max(overflow, 0)]:
+            del self._jobs[job.job_id]
+
+    def _set_status(self, job: MailJob, status: str, error: str = "") -> None:
+        with self._cond:
+            job.status = status
+            job.error = error
+            job.updated_at = time.time()
+            if status in FINAL_STATUSES:
+                job.message = None
+            self._cond.notify_all()
+
+    def _next_job(self) -> MailJob | None:
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                if self._ready and self._ready[0][0] <= now:
+                    _, _, job_id = heapq.heappop(self._ready)
+                    return self._jobs.get(job_id)
+
+                timeout = self.connection.keepalive
+                if self._ready:
+                    timeout = min(timeout, self._ready[0][0] - now)
+                self._cond.wait(timeout)
+                if not self._ready:
+                    return None
+            return None
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                if self._stopping:
+                    return
+                self.connection.close_if_idle()
+                continue
+            if job.message is None:
+                continue
+
+            job.attempts += 1
+            self._set_status(job, STATUS_SENDING)
+            try:
+                self.connection.send(job.message)
+            except (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused) as exc:
+                self.connection.close()
+                self._set_status(job, STATUS_FAILED, type(exc).__name__)
+            except (smtplib.SMTPException, OSError) as exc:
+                if job.attempts >= self.max_attempts:
+                    self._set_status(job, STATUS_FAILED, type(exc).__name__)
+                    continue
+                delay = self.backoff * 2 ** (job.attempts - 1)
+                self._set_status(job, STATUS_RETRYING, type(exc).__name__)
+                with self._cond:
+                    heapq.heappush(self._ready, (time.monotonic() + delay, next(self._sequence), job.job_id))
+                    self._cond.notify()
+            else:
+                self._set_status(job, STATUS_SENT)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+# Amounts are int64 cents from parsing to totals; euros as floats only remain in legacy columns.
+PRICE_PATTERN = r"([-+]?\d*\.?\d+)"
+
+
+def parse_cents(values: pd.Series) -> pd.Series:
+    """Parses prices such as "2,50 €" or 15.15 into cents without float arithmetic.
+
+    The first number of each cell is read digit by digit: "0,125" is 13
+    cents, half a cent rounded away from zero. Cells without a number give <NA>.
+    Each distinct value is parsed once.
+    """
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+    cents = pd.Series(pd.NA, index=values.index, dtype="Int64")
+    present = codes >= 0
+    if present.any():
+        cents[present] = _parse_distinct(pd.Series(uniques, dtype=object)).array.take(codes[present])
+    return cents
+
+
+def _parse_distinct(values: pd.Series) -> pd.Series:
+    number = values.astype(str).str.replace(",", ".", regex=False).str.extract(PRICE_PATTERN)[0]
+    found = number.notna()
+    cents = pd.Series(pd.NA, index=values.index, dtype="Int64")
+    if not found.any():
+        return cents
+
+    number = number[found]
+    parts = number.str.lstrip("+-").str.partition(".")
+    fraction = parts[2].str.ljust(3, "0")
+    whole = parts[0].replace("", "0").astype(np.int64)
+    magnitude = whole * 100 + fraction.str[:2].astype(np.int64) + (fraction.str[2] >= "5").astype(np.int64)
+    cents[found] = magnitude.where(~number.str.startswith("-"), -magnitude)
+    return cents
+
+
+def to_cents(values: Any) -> np.ndarray:
+    """Euro amounts held as floats (legacy columns) to cents, half a cent away from zero; NaN is 0."""
+    euros = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    return (np.sign(euros) * np.floor(np.abs(euros) * 100 + 0.5)).astype(np.int64)
+
+
+def line_cents(unit_cents: np.ndarray, quantity_tenths: np.ndarray) -> np.ndarray:
+    """Unit price times a quantity in tenths, in cents, half a cent rounded up."""
+    return (np.asarray(unit_cents, dtype=np.int64) * np.asarray(quantity_tenths, dtype=np.int64) + 5) // 10
+
+
+def cents_text(cents: int) -> str:
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(int(cents)), 100)
+    return f"{sign}{whole}.{fraction:02d}"
+
+
+def format_cents(cents: int) -> str:
+    return f"{cents_text(cents)} €"
+
+
+def format_cents_array(cents: np.ndarray) -> np.ndarray:
+    """``format_cents`` over a whole column at once."""
+    cents = np.asarray(cents, dtype=np.int64)
+    magnitude = np.abs(cents)
+    amounts = np.char.add(np.where(cents < 0, "-", ""), (magnitude // 100).astype(str))
+    amounts = np.char.add(np.char.add(amounts, "."), np.char.zfill((magnitude % 100).astype(str), 2))
+    return np.char.add(amounts, " €").astype(object)
+
+
+def frame_cents(frame: pd.DataFrame, cents_column: str, euros_column: str) -> np.ndarray:
+    """The cents column of ``frame``, or cents from its euros column for frames built before it existed."""
+    if cents_column in frame.columns:
+        return frame[cents_column].to_numpy(dtype=np.int64)
+    return to_cents(frame[euros_column].to_numpy(dtype=np.float64))
@@ -1,8 +1,12 @@
-import geopandas as gpd
 import streamlit as st
 import folium
 from streamlit_folium import st_folium
-import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from parcel_tiles import ParcelTileLayer, ensure_parcel_tiles
+from parcels import get_parcel_index
 
 
 # Streamlit app configuration
@@ -12,19 +16,10 @@ st.title("Carte du parcellaire")
 # shapefile = st.file_uploader("Upload a Shapefile (multiple files: .shp, .shx, .dbf, etc.)", type=["zip"])
 shapefile = True
 
-shapefile_path = r"https://github.com/AlDenervaud/champdupuits/raw/refs/heads/main/data/parcelles_v4.zip"
+# Local copy of https://github.com/AlDenervaud/champdupuits/raw/refs/heads/main/data/parcelles_v4.zip,
+# reprojected once and cached as GeoParquet (see parcels.py)
 
-# Define a style function based on "exploite" attribute
-def style_function(feature):
-    exploite_value = feature['properties']['exploite']
-    return {
-        'fillColor': 'green' if exploite_value == 'oui' else 'red',  # Fill color
-        'color': 'black',                                            # Stroke color (edge)
-        'weight': 0.5,                                               # Stroke thickness
-        'fillOpacity': 0.7 if exploite_value == 'oui' else 0.4,      # Fill opacity
-        'opacity': 0.8 if exploite_value == 'oui' else 0.6,          # Stroke opacity
-        'dashArray': '5, 5' if exploite_value == 'non' else '1',     # Optional: Dash pattern for edges
-    }
+# Parcel styling (green = exploitée, red = non) lives in parcel_tiles.ParcelTileLayer
         
 if shapefile:
     try:
@@ -32,30 +27,15 @@ if shapefile:
         #with open("uploaded_shapefile.zip", "wb") as f:
         #    f.write(shapefile.read())
         #gdf = gpd.read_file("zip://uploaded_shapefile.zip")
-        gdf = gpd.read_file(shapefile_path)
-        
-        # Ensure correct CRS (change to your target CRS if known)
-        target_crs = "EPSG:4326"  # WGS 84
-        if gdf.crs != target_crs:
-            gdf = gdf.to_crs(target_crs)
-        
-        # Convert the geopandas dataframe to GeoJSON format
-        geojson_data = json.loads(gdf.to_json())
+        # Simplified per-zoom tiles, rebuilt only when data/parcelles_v4.zip changes
+        manifest = ensure_parcel_tiles()
+        (south, west), (north, east) = manifest["bounds"]
         
         # Initial map display
-        m = folium.Map(location=[gdf.geometry.centroid.y.mean(), gdf.geometry.centroid.x.mean()], zoom_start=13)
+        m = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=13)
 
-        # Add GeoJson layer with the custom style function
-        folium.GeoJson(
-            geojson_data,
-            name="Styled GeoJSON",
-            style_function=style_function,
-            tooltip=folium.GeoJsonTooltip(
-                fields=["geo_parcel", "exploite"],                # Specify the column to display
-                aliases=["Parcelle: ", "Exploitée: "],                 # Label before the value (optional)
-                style="font-size: 24px;",
-            )
-        ).add_to(m)
+        # Only the tiles covering the visible area are fetched by the browser
+        ParcelTileLayer(manifest).add_to(m)
         
         # Add JavaScript to capture the click event on polygons and send back the properties
         m.get_root().html.add_child(
@@ -83,15 +63,14 @@ if shapefile:
                        
         map_display = st_folium(m, width=800, height=500)
         
-        # Capture the clicked feature data from the map using the `last_clicked` field in `map_display`
-        if map_display and 'last_object_clicked_tooltip' in map_display:
-            clicked_data = map_display['last_object_clicked_tooltip']
+        # Resolve the clicked point server-side with the parcel spatial index
+        if map_display and map_display.get('last_clicked'):
+            clicked = map_display['last_clicked']
             st.markdown("#### Sélection")
-            try:
-                clicked_data = clicked_data.replace(" ", "").split("\n")
-                feature_name = [i for i in clicked_data if i != ""][1]
+            feature_name = get_parcel_index().locate(clicked['lat'], clicked['lng'])
+            if feature_name:
                 st.success(feature_name)
-            except Exception as e:
+            else:
                 st.warning("Aucune parcelle sélectionée")
 
     except Exception as e:
@@ -0,0 +1,120 @@
+﻿from __future__ import annotations
+
+from email.message import EmailMessage
+import smtplib
+from typing import Mapping
+
+import streamlit as st
+
+from mailer import MailDispatcher, MailJob, MailQueueFull, SmtpConnection
+from timings import timed_stage
+from utils import get_email_credentials, get_secret
+
+
+def _get_smtp_endpoint() -> tuple[str, int, bool]:
+    email_config = get_secret(("email",), default={})
+    if not isinstance(email_config, Mapping):
+        return "smtp.gmail.com", 465, True
+
+    host = str(email_config.get("smtp_host", "") or "smtp.gmail.com").strip()
+    try:
+        port = int(email_config.get("smtp_port", 465))
+    except (TypeError, ValueError):
+        port = 465
+    # `smtp_ssl = false` is for a local relay that only speaks plain SMTP.
+    use_ssl = email_config.get("smtp_ssl", True) is not False
+    return host, port, use_ssl
+
+
+def _build_email_message(
+    sender_address: str,
+    receiver: str,
+    subject: str,
+    body: str,
+    attachment_bytes: bytes | None,
+    attachment_name: str,
+) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = (subject or "Commande Champ du Puits").strip()
+    msg["From"] = sender_address
+    msg["To"] = receiver
+    msg.set_content((body or "Commande générée depuis l'application.").strip())
+
+    if attachment_bytes:
+        msg.add_attachment(
+            attachment_bytes,
+            maintype="application",
+            subtype="pdf",
+            filename=attachment_name,
+        )
+    return msg
+
+
+@timed_stage("send_email")
+def send_email(
+    receiver: str,
+    subject: str,
+    body: str,
+    attachment_bytes: bytes | None = None,
+    attachment_name: str = "commande.pdf",
+) -> tuple[bool, str]:
+    credentials = get_email_credentials()
+    if credentials is None:
+        return False, "Configuration e-mail absente: vérifiez `email.address` et `email.passkey` dans les secrets."
+
+    sender_address, sender_passkey = credentials
+    receiver_clean = (receiver or "").strip()
+    if not receiver_clean:
+        return False, "Adresse destinataire manquante."
+
+    msg = _build_email_message(sender_address, receiver_clean, subject, body, attachment_bytes, attachment_name)
+    host, port, use_ssl = _get_smtp_endpoint()
+    connection = SmtpConnection(host, port, (sender_address, sender_passkey), use_ssl=use_ssl)
+
+    try:
+        connection.send(msg)
+    except smtplib.SMTPAuthenticationError:
+        return False, "Échec d'authentification SMTP. Vérifiez l'adresse et la passkey de l'expéditeur."
+    except (smtplib.SMTPException, OSError):
+        return False, "Échec d'envoi de l'e-mail. Vérifiez la connectivité réseau et la configuration SMTP."
+    finally:
+        connection.close()
+
+    return True, f"E-mail envoyé à {receiver_clean}."
+
+
+@st.cache_resource(show_spinner=False)
+def _get_mail_dispatcher(host: str, port: int, use_ssl: bool, sender_address: str, sender_passkey: str) -> MailDispatcher:
+    connection = SmtpConnection(host, port, (sender_address, sender_passkey), use_ssl=use_ssl)
+    return MailDispatcher(connection)
+
+
+def queue_email(
+    receiver: str,
+    subject: str,
+    body: str,
+    attachment_bytes: bytes | None = None,
+    attachment_name: str = "commande.pdf",
+) -> tuple[bool, str]:
+    credentials = get_email_credentials()
+    if credentials is None:
+        return False, "Configuration e-mail absente: vérifiez `email.address` et `email.passkey` dans les secrets."
+
+    sender_address, sender_passkey = credentials
+    receiver_clean = (receiver or "").strip()
+    if not receiver_clean:
+        return False, "Adresse destinataire manquante."
+
+    msg = _build_email_message(sender_address, receiver_clean, subject, body, attachment_bytes, attachment_name)
+    dispatcher = _get_mail_dispatcher(*_get_smtp_endpoint(), sender_address, sender_passkey)
+    try:
+        return True, dispatcher.submit(msg)
+    except MailQueueFull:
+        return False, "Trop d'e-mails en attente d'envoi. Réessayez dans quelques instants."
+
+
+def get_mail_job(job_id: str) -> MailJob | None:
+    credentials = get_email_credentials()
+    if credentials is None:
+        return None
+    return _get_mail_dispatcher(*_get_smtp_endpoint(), *credentials).status(job_id)
@@ -0,0 +1,163 @@
+﻿from __future__ import annotations
+
+from datetime import datetime
+import io
+import time
+from typing import Any, BinaryIO, Sequence
+
+import pandas as pd
+
+from money import format_cents, frame_cents
+from pdf_fonts import record_render, used_glyph_count
+from pdf_stream import StreamingPDF
+from timings import timed_stage
+from utils import FONT_PATH
+
+
+def safe_pdf_text(value: Any, unicode_ready: bool) -> str:
+    text = str(value if value is not None else "")
+    if unicode_ready:
+        return text
+    return text.encode("latin-1", errors="ignore").decode("latin-1")
+
+
+ROW_LABEL_COLUMNS = ["name", "price_label", "quantity_label", "line_total_label"]
+
+
+def new_order_pdf(sink: BinaryIO | None = None) -> tuple[StreamingPDF, str, bool]:
+    pdf = StreamingPDF(sink if sink is not None else io.BytesIO(), format="A4")
+    pdf.set_auto_page_break(auto=True, margin=14)
+
+    unicode_ready = FONT_PATH.exists()
+    font_family = "Helvetica"
+    if unicode_ready:
+        pdf.add_cached_font("FarmUnicode", FONT_PATH)
+        font_family = "FarmUnicode"
+
+    return pdf, font_family, unicode_ready
+
+
+def pdf_bytes(pdf: StreamingPDF) -> bytes:
+    # Only for PDFs opened on the default in-memory sink.
+    pdf.finish()
+    return pdf.sink.getvalue()
+
+
+def _add_order_pages(
+    pdf: StreamingPDF,
+    font_family: str,
+    unicode_ready: bool,
+    order_df: pd.DataFrame,
+    client_name: str,
+    note: str,
+    generated_at: datetime | None,
+) -> None:
+    pdf.add_page()
+    pdf.set_margins(12, 12, 12)
+
+    now = (generated_at or datetime.now()).strftime("%d/%m/%Y %H:%M")
+
+    pdf.set_font(font_family, size=18)
+    pdf.cell(0, 10, safe_pdf_text("Bon de commande", unicode_ready), ln=True, align="C")
+    pdf.set_font(font_family, size=12)
+    pdf.cell(0, 7, safe_pdf_text("GAEC Au Champ du Puits", unicode_ready), ln=True, align="C")
+    pdf.ln(6)
+    pdf.cell(0, 7, safe_pdf_text(f"Client: {client_name}", unicode_ready), ln=True)
+    pdf.cell(0, 7, safe_pdf_text(f"Date: {now}", unicode_ready), ln=True)
+    pdf.ln(5)
+
+    w_product, w_price, w_qty, w_total = 84, 32, 28, 34
+    row_h = 8
+
+    pdf.set_fill_color(226, 232, 221)
+    pdf.set_font(font_family, size=11)
+    pdf.cell(w_product, row_h, safe_pdf_text("Produit", unicode_ready), border=1, align="C", fill=True)
+    pdf.cell(w_price, row_h, safe_pdf_text("Prix unitaire", unicode_ready), border=1, align="C", fill=True)
+    pdf.cell(w_qty, row_h, safe_pdf_text("Quantité", unicode_ready), border=1, align="C", fill=True)
+    pdf.cell(w_total, row_h, safe_pdf_text("Total", unicode_ready), border=1, align="C", fill=True)
+    pdf.ln(row_h)
+
+    # One grouping pass over positions; categories keep their order of first appearance.
+    names, price_labels, quantity_labels, line_total_labels = (order_df[column].to_numpy() for column in ROW_LABEL_COLUMNS)
+    for category, positions in order_df.groupby("category", sort=False).indices.items():
+        pdf.set_fill_color(247, 245, 238)
+        pdf.cell(
+            w_product + w_price + w_qty + w_total,
+            row_h,
+            safe_pdf_text(category, unicode_ready),
+            border=1,
+            align="L",
+            fill=True,
+            ln=True,
+        )
+
+        pdf.set_fill_color(255, 255, 255)
+        for row in positions:
+            pdf.cell(w_product, row_h, safe_pdf_text(names[row], unicode_ready), border=1)
+            pdf.cell(w_price, row_h, safe_pdf_text(price_labels[row], unicode_ready), border=1, align="C")
+            pdf.cell(w_qty, row_h, safe_pdf_text(quantity_labels[row], unicode_ready), border=1, align="C")
+            pdf.cell(w_total, row_h, safe_pdf_text(line_total_labels[row], unicode_ready), border=1, align="C")
+            pdf.ln(row_h)
+
+    grand_total = int(frame_cents(order_df, "line_cents", "line_total").sum())
+    pdf.set_font(font_family, size=12)
+    pdf.cell(w_product + w_price + w_qty, row_h, safe_pdf_text("Total commande", unicode_ready), border=1)
+    pdf.cell(w_total, row_h, safe_pdf_text(format_cents(grand_total), unicode_ready), border=1, align="C", ln=True)
+
+    clean_note = (note or "").strip()
+    if clean_note:
+        pdf.ln(4)
+        pdf.set_font(font_family, size=11)
+        pdf.cell(0, 6, safe_pdf_text("Remarque:", unicode_ready), ln=True)
+        pdf.multi_cell(0, 6, safe_pdf_text(clean_note, unicode_ready))
+
+
+@timed_stage("pdf_render")
+def write_order_pdf(
+    order_df: pd.DataFrame,
+    client_name: str,
+    sink: BinaryIO,
+    note: str = "",
+    generated_at: datetime | None = None,
+) -> int:
+    """Renders the order into ``sink`` page by page and returns the number of bytes written."""
+    if order_df.empty:
+        raise ValueError("Order is empty")
+
+    started = time.perf_counter()
+    pdf, font_family, unicode_ready = new_order_pdf(sink)
+    _add_order_pages(pdf, font_family, unicode_ready, order_df, client_name, note, generated_at)
+
+    size = pdf.finish()
+    record_render(size, time.perf_counter() - started, used_glyph_count(pdf))
+    return size
+
+
+def generate_order_pdf(
+    order_df: pd.DataFrame,
+    client_name: str,
+    note: str = "",
+    generated_at: datetime | None = None,
+) -> bytes:
+    sink = io.BytesIO()
+    write_order_pdf(order_df, client_name, sink, note, generated_at)
+    return sink.getvalue()
+
+
+@timed_stage("pdf_render")
+def generate_orders_pdf(
+    orders: Sequence[tuple[pd.DataFrame, str, str]],
+    generated_at: datetime | None = None,
+) -> bytes:
+    non_empty = [order for order in orders if not order[0].empty]
+    if not non_empty:
+        raise ValueError("No order to render")
+
+    started = time.perf_counter()
+    pdf, font_family, unicode_ready = new_order_pdf()
+    for order_df, client_name, note in non_empty:
+        _add_order_pages(pdf, font_family, unicode_ready, order_df, client_name, note, generated_at)
+
+    document = pdf_bytes(pdf)
+    record_render(len(document), time.perf_counter() - started, used_glyph_count(pdf))
+    return document
@@ -0,0 +1,222 @@
+﻿from __future__ import annotations
+
+import sys
+import uuid
+from typing import Any, Mapping, MutableMapping
+
+import numpy as np
+import pandas as pd
+
+from pricing import PricingTables
+from timings import timed_stage
+from utils import priced_order
+
+
+ORDER_STATE_KEY = "order_state"
+
+
+class OrderLines:
+    """Chosen catalog rows as parallel NumPy arrays sorted by catalog position.
+
+    Rows refer to the shared catalog by position: names, prices and labels are
+    only looked up when the order is priced. A row stays here while it differs
+    from the catalog defaults (ticked or with a quantity).
+    """
+
+    __slots__ = ("positions", "selected", "quantities")
+
+    def __init__(self) -> None:
+        self.positions = np.empty(0, dtype=np.int32)
+        self.selected = np.empty(0, dtype=bool)
+        self.quantities = np.empty(0, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _slot(self, position: int) -> tuple[int, bool]:
+        slot = int(np.searchsorted(self.positions, position))
+        return slot, slot < len(self.positions) and int(self.positions[slot]) == position
+
+    def get(self, position: int) -> tuple[bool, float] | None:
+        slot, found = self._slot(position)
+        if not found:
+            return None
+        return bool(self.selected[slot]), float(self.quantities[slot])
+
+    def set(self, position: int, selected: bool, quantity: float) -> None:
+        slot, found = self._slot(position)
+        if found:
+            self.selected[slot] = selected
+            self.quantities[slot] = quantity
+            return
+        self.positions = np.insert(self.positions, slot, position)
+        self.selected = np.insert(self.selected, slot, selected)
+        self.quantities = np.insert(self.quantities, slot, quantity)
+
+    def remove(self, position: int) -> None:
+        slot, found = self._slot(position)
+        if found:
+            for name in self.__slots__:
+                setattr(self, name, np.delete(getattr(self, name), slot))
+
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, name)) for name in self.__slots__)
+
+
+class IncrementalOrder:
+    """Session order patched from the per-page data editor deltas and priced in one pass."""
+
+    __slots__ = (
+        "order_key",
+        "order_uid",
+        "catalog_version",
+        "lines",
+        "_editor_key",
+        "_page_positions",
+        "_base_selected",
+        "_base_quantities",
+        "_applied",
+    )
+
+    def __init__(self, order_key: str, catalog_version: str) -> None:
+        self.order_key = order_key
+        # Downloading the order again replaces it in the order book.
+        self.order_uid = uuid.uuid4().hex
+        self.catalog_version = catalog_version
+        self.lines = OrderLines()
+        self._editor_key: str | None = None
+        self._page_positions = np.empty(0, dtype=np.int32)
+        self._base_selected = np.empty(0, dtype=bool)
+        self._base_quantities = np.empty(0, dtype=np.float64)
+        self._applied: dict[int, dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def has_choices(self) -> bool:
+        return len(self.lines.positions) > 0
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by this order in session state."""
+        arrays = (self._page_positions, self._base_selected, self._base_quantities)
+        applied = sys.getsizeof(self._applied) + sum(
+            sys.getsizeof(edits) + sum(sys.getsizeof(value) for value in edits.values())
+            for edits in self._applied.values()
+        )
+        return (
+            sys.getsizeof(self)
+            + self.lines.memory_bytes()
+            + sum(sys.getsizeof(array) for array in arrays)
+            + applied
+        )
+
+    def page_frame(self, catalog: pd.DataFrame, positions: np.ndarray, editor_key: str) -> pd.DataFrame:
+        """Rows of ``catalog`` at ``positions`` with the current choices filled in.
+
+        The choices are snapshotted once per editor key, so the editor keeps
+        receiving the same data while its edits are being applied.
+        """
+        if editor_key != self._editor_key:
+            positions = np.asarray(positions, dtype=np.int32)
+            chosen = [self.lines.get(int(position)) for position in positions]
+            self._editor_key = editor_key
+            self._page_positions = positions
+            self._base_selected = np.array([bool(choice and choice[0]) for choice in chosen], dtype=bool)
+            self._base_quantities = np.array([choice[1] if choice else 0.0 for choice in chosen], dtype=np.float64)
+            self._applied = {}
+
+        page = catalog.iloc[self._page_positions].reset_index(drop=True)
+        if self._base_selected.any() or self._base_quantities.any():
+            page["select"] = self._base_selected
+            page["quantity"] = self._base_quantities
+        return page
+
+    def apply(
+        self,
+        catalog: pd.DataFrame,
+        pricing: PricingTables,
+        edited_rows: Mapping[Any, Mapping[str, Any]],
+        editor_key: str,
+        positions: np.ndarray | None = None,
+        member: bool = False,
+    ) -> tuple[pd.DataFrame, int]:
+        if editor_key != self._editor_key:
+            if positions is None:
+                return self.frame(catalog, pricing, member)
+            self.page_frame(catalog, positions, editor_key)
+
+        # Editor rows are page rows; choices are kept by catalog position.
+        current = {
+            int(row): dict(edits)
+            for row, edits in (edited_rows or {}).items()
+            if 0 <= int(row) < len(self._page_positions)
+        }
+        for row in current.keys() | self._applied.keys():
+            edits = current.get(row) or {}
+            if edits == (self._applied.get(row) or {}):
+                continue
+            position = int(self._page_positions[row])
+            if not 0 <= position < len(catalog):
+                continue
+            selected = bool(edits.get("select", self._base_selected[row]))
+            quantity = _to_quantity(edits.get("quantity", self._base_quantities[row]))
+            if selected or quantity:
+                self.lines.set(position, selected, quantity)
+            else:
+                self.lines.remove(position)
+
+        self._applied = current
+        return self.frame(catalog, pricing, member)
+
+    def frame(self, catalog: pd.DataFrame, pricing: PricingTables, member: bool = False) -> tuple[pd.DataFrame, int]:
+        """Prices the ticked rows in one pass and materializes them for display and the PDF."""
+        selected = self.lines.selected
+        return priced_order(catalog, pricing, self.lines.positions[selected], self.lines.quantities[selected], member)
+
+
+def _to_quantity(value: Any) -> float:
+    try:
+        quantity = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if np.isnan(quantity) else max(quantity, 0.0)
+
+
+def get_order_state(
+    session_state: MutableMapping[str, Any],
+    order_key: str,
+    catalog: pd.DataFrame,
+) -> IncrementalOrder:
+    catalog_version = str(catalog.attrs.get("catalog_version", len(catalog)))
+    state = session_state.get(ORDER_STATE_KEY)
+    if (
+        not isinstance(state, IncrementalOrder)
+        or state.order_key != order_key
+        or state.catalog_version != catalog_version
+    ):
+        state = IncrementalOrder(order_key, catalog_version)
+        session_state[ORDER_STATE_KEY] = state
+    return state
+
+
+@timed_stage("update_order")
+def update_order(
+    session_state: MutableMapping[str, Any],
+    order_key: str,
+    editor_key: str,
+    catalog: pd.DataFrame,
+    pricing: PricingTables,
+    positions: np.ndarray | None = None,
+    member: bool = False,
+) -> tuple[pd.DataFrame, int]:
+    """Applies the edits of ``editor_key`` and returns the whole order, priced.
+
+    ``positions`` are the catalog positions shown by the editor. Without
+    them only the editor whose page is already known is applied, which is
+    how the last edits of a page are kept when the user leaves it.
+    """
+    editor_state = session_state.get(editor_key) or {}
+    edited_rows = editor_state.get("edited_rows", {}) if isinstance(editor_state, Mapping) else {}
+    return get_order_state(session_state, order_key, catalog).apply(
+        catalog, pricing, edited_rows, editor_key, positions, member
+    )
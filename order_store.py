@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+import logging
+import os
+from pathlib import Path
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Iterator, NamedTuple
+
+import pandas as pd
+
+from money import frame_cents
+from timings import timed_stage
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+ORDER_DB_PATH = Path(os.environ.get("CDP_ORDER_DB") or PROJECT_ROOT / "data" / "orders.sqlite3")
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_uid TEXT PRIMARY KEY,
+    client_name TEXT NOT NULL,
+    client_key TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    distribution_day TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    catalog_version TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_orders_client ON orders (client_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_day ON orders (distribution_day);
+
+CREATE TABLE IF NOT EXISTS order_lines (
+    order_uid TEXT NOT NULL REFERENCES orders (order_uid) ON DELETE CASCADE,
+    distribution_day TEXT NOT NULL,
+    product TEXT NOT NULL,
+    category TEXT NOT NULL,
+    units TEXT NOT NULL,
+    unit_cents INTEGER NOT NULL,
+    quantity REAL NOT NULL,
+    line_cents INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lines_order ON order_lines (order_uid);
+CREATE INDEX IF NOT EXISTS idx_lines_day_product ON order_lines (distribution_day, product, quantity, line_cents);
+CREATE INDEX IF NOT EXISTS idx_lines_product ON order_lines (product);
+"""
+
+LINE_COLUMNS = ["order_uid", "client_name", "category", "product", "units", "quantity", "line_cents"]
+
+OrderRow = tuple[str, str, str, str, str, str, int, str]
+LineRow = tuple[str, str, str, str, str, int, float, int]
+
+
+class PendingOrder(NamedTuple):
+    order_uid: str
+    order_df: pd.DataFrame
+    client_name: str
+    note: str
+    created_at: str
+    distribution_day: str
+    catalog_version: str
+
+    def rows(self) -> tuple[OrderRow, list[LineRow]]:
+        unit_cents = frame_cents(self.order_df, "unit_cents", "unit_price").tolist()
+        line_cents = frame_cents(self.order_df, "line_cents", "line_total").tolist()
+        order_row: OrderRow = (
+            self.order_uid,
+            self.client_name.strip(),
+            client_key(self.client_name),
+            self.note.strip(),
+            self.created_at,
+            self.distribution_day,
+            sum(line_cents),
+            self.catalog_version,
+        )
+        lines = self.order_df[["name", "category", "units", "quantity"]]
+        line_rows: list[LineRow] = [
+            (self.order_uid, self.distribution_day, str(name), str(category), str(units), unit, float(quantity), line)
+            for (name, category, units, quantity), unit, line in zip(
+                lines.itertuples(index=False, name=None), unit_cents, line_cents
+            )
+        ]
+        return order_row, line_rows
+
+
+def client_key(client_name: str) -> str:
+    return " ".join(client_name.split()).casefold()
+
+
+def _connect(path: Path, read_only: bool = False) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False)
+    connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    connection.execute("PRAGMA foreign_keys = ON")
+    if read_only:
+        connection.execute("PRAGMA query_only = ON")
+    else:
+        # WAL lets readers in every session run alongside the single writer.
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+class OrderStore:
+    """SQLite order book written by one background thread in batches.
+
+    ``record`` only enqueues the order, so page reruns never wait on a write
+    lock; the writer drains the queue in a single transaction per batch.
+    Recording an ``order_uid`` again replaces that order and its lines.
+    Reads use one connection per thread and are not blocked by the writer.
+    """
+
+    def __init__(self, path: str | Path = ORDER_DB_PATH, batch_size: int = 200, flush_interval: float = 0.05) -> None:
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self._queue: queue.Queue[PendingOrder | None] = queue.Queue()
+        self._local = threading.local()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = _connect(self.path)
+        self._writer.executescript(SCHEMA)
+        self._worker = threading.Thread(target=self._run, name="order-store", daemon=True)
+        self._worker.start()
+
+    def record(
+        self,
+        order_uid: str,
+        order_df: pd.DataFrame,
+        client_name: str,
+        distribution_day: date,
+        note: str = "",
+        created_at: datetime | None = None,
+        catalog_version: str = "",
+    ) -> str:
+        moment = created_at or datetime.now()
+        # Rows are built on the writer thread; the caller only pays for the enqueue.
+        self._queue.put(
+            PendingOrder(
+                order_uid,
+                order_df,
+                client_name,
+                note,
+                moment.isoformat(timespec="seconds"),
+                distribution_day.isoformat(),
+                catalog_version,
+            )
+        )
+        return order_uid
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        self._queue.put(None)
+        self._worker.join(timeout)
+        self._writer.close()
+
+    def _drain(self) -> tuple[list[PendingOrder], bool]:
+        batch = []
+        item = self._queue.get()
+        if item is None:
+            self._queue.task_done()
+            return batch, True
+        batch.append(item)
+        # Give concurrent sessions a moment to pile up so they share one commit.
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.task_done()
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    @timed_stage("order_store_write")
+    def _write_batch(self, batch: list[PendingOrder]) -> int:
+        rows = []
+        for pending in batch:
+            try:
+                rows.append(pending.rows())
+            except (KeyError, TypeError, ValueError):
+                logger.exception("Commande %s illisible, ignorée", pending.order_uid)
+        if not rows:
+            return 0
+
+        # The last version of an order in the batch wins, and replaces the stored one.
+        latest = {order_row[0]: (order_row, line_rows) for order_row, line_rows in rows}
+        uids = [(uid,) for uid in latest]
+        orders: list[OrderRow] = [order_row for order_row, _ in latest.values()]
+        lines: list[LineRow] = [line for _, line_rows in latest.values() for line in line_rows]
+        self._writer.execute("BEGIN IMMEDIATE")
+        try:
+            self._writer.executemany("DELETE FROM order_lines WHERE order_uid = ?", uids)
+            self._writer.executemany("DELETE FROM orders WHERE order_uid = ?", uids)
+            self._writer.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)", orders)
+            self._writer.executemany("INSERT INTO order_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?)", lines)
+            self._writer.execute("COMMIT")
+        except BaseException:
+            self._writer.execute("ROLLBACK")
+            raise
+        return len(orders)
+
+    def _run(self) -> None:
+        while True:
+            batch, stopping = self._drain()
+            if batch:
+                try:
+                    self.written += self._write_batch(batch)
+                    self.batches += 1
+                except sqlite3.Error:
+                    logger.exception("Enregistrement de %d commande(s) impossible", len(batch))
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            if stopping:
+                return
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _connect(self.path, read_only=True)
+            self._local.connection = connection
+        return connection
+
+    def query(self, sql: str, params: tuple[Any, ...] = ()) -> pd.DataFrame:
+        cursor = self._reader().execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    def quantity_by_product_day(self, start: date | None = None, end: date | None = None) -> pd.DataFrame:
+        return self.query(
+            """
+            SELECT distribution_day, category, product, units,
+                   SUM(quantity) AS quantity, COUNT(DISTINCT order_uid) AS orders, SUM(line_cents) / 100.0 AS amount
+            FROM order_lines
+            WHERE distribution_day BETWEEN ? AND ?
+            GROUP BY distribution_day, category, product, units
+            ORDER BY distribution_day DESC, category, product
+            """,
+            ((start or date.min).isoformat(), (end or date.max).isoformat()),
+        )
+
+    def iter_day_lines(self, day: date, chunk_size: int = 50_000) -> Iterator[pd.DataFrame]:
+        cursor = self._reader().execute(
+            """
+            SELECT l.order_uid, o.client_name, l.category, l.product, l.units, l.quantity, l.line_cents
+            FROM order_lines AS l JOIN orders AS o ON o.order_uid = l.order_uid
+            WHERE l.distribution_day = ?
+            """,
+            (day.isoformat(),),
+        )
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield pd.DataFrame(rows, columns=LINE_COLUMNS)
+
+    def orders_for_client(self, client_name: str, limit: int = 50) -> pd.DataFrame:
+        return self.query(
+            """
+            SELECT order_uid, client_name, created_at, distribution_day, total_cents / 100.0 AS total, note
+            FROM orders
+            WHERE client_key = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (client_key(client_name), limit),
+        )
+
+    def orders_for_product(self, product: str, limit: int = 200) -> pd.DataFrame:
+        return self.query(
+            """
+            SELECT o.client_name, o.distribution_day, l.quantity, l.units, l.line_cents / 100.0 AS line_total
+            FROM order_lines AS l JOIN orders AS o ON o.order_uid = l.order_uid
+            WHERE l.product = ?
+            ORDER BY o.distribution_day DESC, o.client_name
+            LIMIT ?
+            """,
+            (product, limit),
+        )
+
+    def recent_orders(self, limit: int = 20) -> pd.DataFrame:
+        return self.query(
+            """
+            SELECT order_uid, client_name, created_at, distribution_day, total_cents / 100.0 AS total
+            FROM orders
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {"written": self.written, "batches": self.batches, "pending": self.pending()}
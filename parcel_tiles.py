@@ -0,0 +1,225 @@
+﻿from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Any, Iterable
+
+from branca.element import MacroElement
+import geopandas as gpd
+from jinja2 import Template
+import numpy as np
+import shapely
+
+from parcels import PARCELS_ZIP, PROJECT_ROOT, load_parcels, parcels_version
+
+
+# Served by Streamlit's static file server (server.enableStaticServing).
+TILES_DIR = PROJECT_ROOT / "static" / "parcel_tiles"
+TILES_URL = "/app/static/parcel_tiles"
+DEFAULT_ZOOMS = range(12, 18)
+MANIFEST_NAME = "manifest.json"
+TILE_PROPERTIES = ["geo_parcel", "exploite"]
+
+
+def _pixel_degrees(zoom: int) -> float:
+    return 360.0 / (256 * 2**zoom)
+
+
+def _tile_indices(lon: np.ndarray, lat: np.ndarray, zoom: int) -> tuple[np.ndarray, np.ndarray]:
+    scale = 2**zoom
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = np.floor((lon + 180.0) / 360.0 * scale).astype(int)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * scale).astype(int)
+    return np.clip(x, 0, scale - 1), np.clip(y, 0, scale - 1)
+
+
+def simplify_for_zoom(geometries: np.ndarray, zoom: int) -> np.ndarray:
+    pixel = _pixel_degrees(zoom)
+    # Coverage simplification moves shared edges together, so neighbouring
+    # parcels never open gaps or overlap once simplified.
+    simplified = shapely.coverage_simplify(geometries, tolerance=pixel * 0.5)
+    decimals = max(0, math.ceil(-math.log10(pixel / 10)))
+    return shapely.transform(simplified, lambda coords: np.round(coords, decimals))
+
+
+def _write_json(path: Path, payload: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+
+def build_parcel_tiles(
+    gdf: gpd.GeoDataFrame | None = None,
+    output_dir: str | Path = TILES_DIR,
+    zooms: Iterable[int] = DEFAULT_ZOOMS,
+    source_version: str = "",
+) -> dict[str, Any]:
+    parcels = gdf if gdf is not None else load_parcels()
+    zoom_levels = sorted(set(zooms))
+    target = Path(output_dir)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{target.name}.", dir=target.parent))
+
+    geometries = parcels.geometry.values
+    properties = parcels[TILE_PROPERTIES].astype(str).to_dict("records")
+
+    tile_count = 0
+    try:
+        for zoom in zoom_levels:
+            simplified = simplify_for_zoom(geometries, zoom)
+            # A parcel is written to every tile its bounding box touches, so it shows up
+            # as soon as any of them is visible; the client keeps one copy per id.
+            kept = np.flatnonzero(~(shapely.is_missing(simplified) | shapely.is_empty(simplified)))
+            bounds = shapely.bounds(simplified[kept])
+            first_x, first_y = _tile_indices(bounds[:, 0], bounds[:, 3], zoom)
+            last_x, last_y = _tile_indices(bounds[:, 2], bounds[:, 1], zoom)
+            tiles: dict[tuple[int, int], list[dict[str, Any]]] = {}
+            for row, index in enumerate(kept.tolist()):
+                feature = {
+                    "type": "Feature",
+                    "id": properties[index]["geo_parcel"],
+                    "properties": properties[index],
+                    "geometry": shapely.geometry.mapping(simplified[index]),
+                }
+                for x in range(int(first_x[row]), int(last_x[row]) + 1):
+                    for y in range(int(first_y[row]), int(last_y[row]) + 1):
+                        tiles.setdefault((x, y), []).append(feature)
+            for (x, y), features in tiles.items():
+                _write_json(staging / str(zoom) / str(x) / f"{y}.json", {"type": "FeatureCollection", "features": features})
+            tile_count += len(tiles)
+
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in parcels.total_bounds)
+        manifest = {
+            "source_version": source_version,
+            "min_zoom": zoom_levels[0],
+            "max_zoom": zoom_levels[-1],
+            "bounds": [[min_lat, min_lon], [max_lat, max_lon]],
+            "tiles": tile_count,
+        }
+        _write_json(staging / MANIFEST_NAME, manifest)
+
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(output_dir: str | Path = TILES_DIR) -> dict[str, Any] | None:
+    try:
+        return json.loads((Path(output_dir) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_parcel_tiles(source: str | Path = PARCELS_ZIP, output_dir: str | Path = TILES_DIR) -> dict[str, Any]:
+    version = parcels_version(source)
+    manifest = read_manifest(output_dir)
+    if manifest is not None and manifest.get("source_version") == version:
+        return manifest
+    return build_parcel_tiles(load_parcels(source), output_dir, source_version=version)
+
+
+class ParcelTileLayer(MacroElement):
+    """Leaflet layer that only fetches the parcel tiles covering the visible map."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function(map) {
+            var features = L.geoJSON(null, {
+                style: function(feature) {
+                    var used = feature.properties.exploite === "oui";
+                    return {
+                        fillColor: used ? "green" : "red",
+                        color: "black",
+                        weight: 0.5,
+                        fillOpacity: used ? 0.7 : 0.4,
+                        opacity: used ? 0.8 : 0.6,
+                        dashArray: feature.properties.exploite === "non" ? "5, 5" : "1"
+                    };
+                },
+                onEachFeature: function(feature, layer) {
+                    layer.bindTooltip(
+                        "Parcelle: " + feature.properties.geo_parcel
+                        + "<br>Exploitée: " + feature.properties.exploite,
+                        {sticky: true}
+                    );
+                }
+            }).addTo(map);
+
+            var loaded = {};
+            var loadedZoom = null;
+            var Tiles = L.GridLayer.extend({
+                createTile: function(coords, done) {
+                    var tile = document.createElement("div");
+                    if (loadedZoom !== coords.z) {
+                        features.clearLayers();
+                        loaded = {};
+                        loadedZoom = coords.z;
+                    }
+                    var url = {{ this.url|tojson }} + "/" + coords.z + "/" + coords.x + "/" + coords.y + ".json";
+                    fetch(url)
+                        .then(function(response) { return response.ok ? response.json() : null; })
+                        .then(function(data) {
+                            if (data && coords.z === loadedZoom) {
+                                data.features.forEach(function(feature) {
+                                    if (!loaded[feature.id]) {
+                                        loaded[feature.id] = true;
+                                        features.addData(feature);
+                                    }
+                                });
+                            }
+                            done(null, tile);
+                        })
+                        .catch(function() { done(null, tile); });
+                    return tile;
+                }
+            });
+
+            new Tiles({
+                minNativeZoom: {{ this.min_zoom }},
+                maxNativeZoom: {{ this.max_zoom }},
+                keepBuffer: 1,
+                bounds: L.latLngBounds({{ this.bounds|tojson }}).pad(0.05)
+            }).addTo(map);
+            return features;
+        })({{ this._parent.get_name() }});
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, manifest: dict[str, Any], url: str = TILES_URL) -> None:
+        super().__init__()
+        self._name = "ParcelTileLayer"
+        self.url = url.rstrip("/")
+        self.min_zoom = int(manifest["min_zoom"])
+        self.max_zoom = int(manifest["max_zoom"])
+        self.bounds = manifest["bounds"]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Génère les tuiles GeoJSON simplifiées du parcellaire.")
+    parser.add_argument("--source", default=str(PARCELS_ZIP))
+    parser.add_argument("--output-dir", default=str(TILES_DIR))
+    parser.add_argument("--min-zoom", type=int, default=DEFAULT_ZOOMS.start)
+    parser.add_argument("--max-zoom", type=int, default=DEFAULT_ZOOMS.stop - 1)
+    args = parser.parse_args(argv)
+
+    manifest = build_parcel_tiles(
+        load_parcels(args.source),
+        args.output_dir,
+        range(args.min_zoom, args.max_zoom + 1),
+        source_version=parcels_version(args.source),
+    )
+    print(f"{manifest['tiles']} tuile(s) écrite(s) dans {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
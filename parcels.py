@@ -0,0 +1,118 @@
+﻿from __future__ import annotations
+
+from functools import lru_cache
+import hashlib
+import os
+from pathlib import Path
+import tempfile
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from shared_cache import CACHE_ROOT
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+PARCELS_ZIP = PROJECT_ROOT / "data" / "parcelles_v4.zip"
+PARCELS_CACHE_DIR = CACHE_ROOT / "parcels"
+TARGET_CRS = "EPSG:4326"
+
+
+def _zip_sha256(path: Path) -> str:
+    with path.open("rb") as handle:
+        return hashlib.file_digest(handle, "sha256").hexdigest()
+
+
+def parcels_version(source: str | Path = PARCELS_ZIP) -> str:
+    return _zip_sha256(Path(source))
+
+
+def parcels_cache_path(source: Path, sha256: str) -> Path:
+    return PARCELS_CACHE_DIR / f"{source.stem}.{sha256[:16]}.parquet"
+
+
+def build_parcels_cache(source: str | Path = PARCELS_ZIP, target: str | Path | None = None) -> gpd.GeoDataFrame:
+    source_path = Path(source)
+    gdf = gpd.read_file(f"zip://{source_path.as_posix()}")
+    if gdf.crs is None or gdf.crs.to_string() != TARGET_CRS:
+        gdf = gdf.to_crs(TARGET_CRS)
+
+    cache_path = Path(target) if target is not None else parcels_cache_path(source_path, _zip_sha256(source_path))
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{cache_path.name}.", dir=cache_path.parent)
+        os.close(fd)
+        try:
+            gdf.to_parquet(tmp_name, index=False)
+            os.replace(tmp_name, cache_path)
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+    except OSError:
+        pass
+    return gdf
+
+
+@lru_cache(maxsize=4)
+def _load_parcels(source: str, mtime_ns: int, size: int) -> gpd.GeoDataFrame:
+    source_path = Path(source)
+    cache_path = parcels_cache_path(source_path, _zip_sha256(source_path))
+    if cache_path.exists():
+        try:
+            return gpd.read_parquet(cache_path, memory_map=True)
+        except (OSError, ValueError):
+            pass
+    return build_parcels_cache(source_path, cache_path)
+
+
+def load_parcels(source: str | Path = PARCELS_ZIP) -> gpd.GeoDataFrame:
+    source_path = Path(source).resolve()
+    if not source_path.exists():
+        raise FileNotFoundError(source_path)
+    stat = source_path.stat()
+    # Shared by every session of the process; callers must not mutate it in place.
+    return _load_parcels(source_path.as_posix(), stat.st_mtime_ns, stat.st_size)
+
+
+class ParcelIndex:
+    """STRtree over the parcel polygons for click hit-testing, bbox and nearest queries."""
+
+    def __init__(self, gdf: gpd.GeoDataFrame, id_column: str = "geo_parcel") -> None:
+        self.geometries = np.asarray(gdf.geometry.values)
+        self.ids = gdf[id_column].astype(str).to_numpy()
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def locate(self, lat: float, lon: float) -> str | None:
+        hits = self.tree.query(shapely.Point(lon, lat), predicate="intersects")
+        if hits.size == 0:
+            return None
+        if hits.size > 1:
+            # A point on a shared edge touches both parcels; keep the smallest one.
+            hits = hits[np.argsort(shapely.area(self.geometries[hits]), kind="stable")]
+        return str(self.ids[hits[0]])
+
+    def nearest(self, lat: float, lon: float, max_distance: float | None = None) -> str | None:
+        hits = self.tree.query_nearest(shapely.Point(lon, lat), max_distance=max_distance)
+        if hits.size == 0:
+            return None
+        return str(self.ids[hits[0]])
+
+    def in_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> list[str]:
+        hits = self.tree.query(shapely.box(min_lon, min_lat, max_lon, max_lat), predicate="intersects")
+        return self.ids[np.sort(hits)].tolist()
+
+
+@lru_cache(maxsize=4)
+def _parcel_index(source: str, mtime_ns: int, size: int) -> ParcelIndex:
+    return ParcelIndex(_load_parcels(source, mtime_ns, size))
+
+
+def get_parcel_index(source: str | Path = PARCELS_ZIP) -> ParcelIndex:
+    source_path = Path(source).resolve()
+    if not source_path.exists():
+        raise FileNotFoundError(source_path)
+    stat = source_path.stat()
+    return _parcel_index(source_path.as_posix(), stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,204 @@
+﻿from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import time
+from typing import Any, Iterable, Sequence
+
+import pandas as pd
+
+from catalog import PROJECT_ROOT, load_catalog
+from order_pdf import generate_orders_pdf, write_order_pdf
+from pdf_fonts import load_font_metrics
+from pricing import PricingTables, compile_pricing, read_pricing_sheet
+from utils import FONT_PATH, build_order, make_safe_filename
+
+
+@dataclass(frozen=True)
+class BatchOrder:
+    client_name: str
+    order_df: pd.DataFrame
+    note: str = ""
+
+
+@dataclass
+class BatchReport:
+    rendered: list[Path] = field(default_factory=list)
+    failures: list[tuple[str, str]] = field(default_factory=list)
+    merged: Path | None = None
+    workers: int = 1
+    seconds: float = 0.0
+
+    @property
+    def orders_per_second(self) -> float:
+        return len(self.rendered) / self.seconds if self.seconds > 0 else 0.0
+
+
+def _init_worker() -> None:
+    # Parse the font once per worker; every document rendered afterwards reuses it.
+    if FONT_PATH.exists():
+        load_font_metrics(FONT_PATH)
+
+
+def _order_filename(index: int, order: BatchOrder) -> str:
+    return f"{index:04d}_Commande_{make_safe_filename(order.client_name)}.pdf"
+
+
+def _render_one(index: int, order: BatchOrder, output_dir: str, generated_at: datetime) -> str:
+    target = Path(output_dir) / _order_filename(index, order)
+    try:
+        with target.open("wb") as sink:
+            write_order_pdf(order.order_df, order.client_name, sink, order.note, generated_at)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    return target.as_posix()
+
+
+def _render_chunk(
+    chunk: Sequence[tuple[int, BatchOrder]],
+    output_dir: str,
+    generated_at: datetime,
+) -> list[tuple[str, str | None]]:
+    results: list[tuple[str, str | None]] = []
+    for index, order in chunk:
+        try:
+            results.append((_render_one(index, order, output_dir, generated_at), None))
+        except Exception as exc:
+            results.append((order.client_name, str(exc)))
+    return results
+
+
+def _render_merged(orders: Sequence[BatchOrder], merged_path: str, generated_at: datetime) -> str:
+    document = generate_orders_pdf(
+        [(order.order_df, order.client_name, order.note) for order in orders],
+        generated_at,
+    )
+    Path(merged_path).write_bytes(document)
+    return merged_path
+
+
+def render_orders(
+    orders: Iterable[BatchOrder],
+    output_dir: str | Path,
+    merged_path: str | Path | None = None,
+    workers: int | None = None,
+    generated_at: datetime | None = None,
+) -> BatchReport:
+    pending = [order for order in orders if not order.order_df.empty]
+    worker_count = max(1, min(workers or os.cpu_count() or 1, len(pending) or 1))
+    stamp = generated_at or datetime.now()
+    target_dir = Path(output_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    report = BatchReport(workers=worker_count)
+    started = time.perf_counter()
+
+    numbered = list(enumerate(pending, start=1))
+    if worker_count == 1:
+        _init_worker()
+        outcomes = _render_chunk(numbered, target_dir.as_posix(), stamp)
+        if merged_path is not None and pending:
+            report.merged = Path(_render_merged(pending, os.fspath(merged_path), stamp))
+    else:
+        # A few chunks per worker keeps the pool busy without paying IPC per order.
+        chunk_size = max(1, len(numbered) // (worker_count * 4))
+        chunks = [numbered[start:start + chunk_size] for start in range(0, len(numbered), chunk_size)]
+        outcomes = []
+        with ProcessPoolExecutor(max_workers=worker_count, initializer=_init_worker) as executor:
+            merged_future = None
+            if merged_path is not None and pending:
+                # Started first: it is the single longest task of the batch.
+                merged_future = executor.submit(_render_merged, pending, os.fspath(merged_path), stamp)
+
+            futures = [executor.submit(_render_chunk, chunk, target_dir.as_posix(), stamp) for chunk in chunks]
+            for future in as_completed(futures):
+                outcomes.extend(future.result())
+
+            if merged_future is not None:
+                report.merged = Path(merged_future.result())
+
+    for value, error in outcomes:
+        if error is None:
+            report.rendered.append(Path(value))
+        else:
+            report.failures.append((value, error))
+
+    report.rendered.sort()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def order_from_items(
+    catalog: pd.DataFrame,
+    items: Iterable[dict[str, Any]],
+    pricing: PricingTables | None = None,
+    member: bool = False,
+) -> pd.DataFrame:
+    quantities: dict[str, float] = {}
+    for item in items:
+        name = str(item.get("name", "")).strip()
+        if name:
+            quantities[name] = quantities.get(name, 0.0) + float(item.get("quantity", 0) or 0)
+
+    unknown = set(quantities) - set(catalog["name"])
+    if unknown:
+        raise ValueError(f"Produits inconnus: {', '.join(sorted(unknown))}")
+
+    data = catalog.copy()
+    data["quantity"] = data["name"].map(quantities).fillna(0.0)
+    data["select"] = data["quantity"] > 0
+    order_df, _ = build_order(data, pricing, member)
+    return order_df
+
+
+def load_batch_orders(
+    orders_path: str | Path,
+    catalog: pd.DataFrame,
+    pricing: PricingTables | None = None,
+) -> list[BatchOrder]:
+    raw_orders = json.loads(Path(orders_path).read_text(encoding="utf-8"))
+    return [
+        BatchOrder(
+            client_name=str(raw.get("client_name", "")).strip() or "client",
+            order_df=order_from_items(catalog, raw.get("items", []), pricing, bool(raw.get("member", False))),
+            note=str(raw.get("note", "") or ""),
+        )
+        for raw in raw_orders
+    ]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Génère en lot les bons de commande PDF.")
+    parser.add_argument("orders", help='Fichier JSON: [{"client_name", "note", "member", "items": [{"name", "quantity"}]}]')
+    parser.add_argument("--output-dir", default="commandes")
+    parser.add_argument("--merged", default=None, help="Chemin d'un PDF unique regroupant toutes les commandes.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--catalog", default=str(PROJECT_ROOT / "products.xlsx"))
+    args = parser.parse_args(argv)
+
+    catalog, _ = load_catalog(args.catalog)
+    pricing = compile_pricing(catalog, read_pricing_sheet(args.catalog))
+    for warning in pricing.warnings:
+        print(warning)
+    orders = load_batch_orders(args.orders, catalog, pricing)
+    report = render_orders(orders, args.output_dir, args.merged, args.workers)
+
+    print(
+        f"{len(report.rendered)} commande(s) en {report.seconds:.2f} s "
+        f"({report.orders_per_second:.1f} commandes/s, {report.workers} processus)"
+    )
+    if report.merged is not None:
+        print(f"PDF regroupé: {report.merged}")
+    for client_name, error in report.failures:
+        print(f"Échec pour {client_name}: {error}")
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+﻿from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import threading
+from typing import Callable
+
+import pandas as pd
+
+from shared_cache import DiskCache, get_shared_cache
+from timings import timed_stage
+from utils import ORDER_COLUMNS
+
+
+DEFAULT_MAX_ENTRIES = 64
+
+
+class PdfCache:
+    """Thread-safe bounded LRU of rendered documents keyed by content hash.
+
+    With a ``shared`` disk cache, misses are looked up there before
+    rendering, so replicas on the same host reuse each other's documents.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, shared: DiskCache | None = None) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.shared = shared
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: str, render: Callable[[], bytes], generation: str = "") -> bytes:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        # Rendering happens outside the lock so that other sessions are not blocked meanwhile.
+        if self.shared is not None:
+            document = self.shared.get_or_create("pdf", key, render, generation)
+        else:
+            document = render()
+
+        with self._lock:
+            self._entries[key] = document
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return document
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+        if self.shared is not None:
+            shared_stats = self.shared.stats()
+            stats.update({f"shared_{name}": value for name, value in shared_stats.items()})
+        return stats
+
+
+ORDER_PDF_CACHE = PdfCache(shared=get_shared_cache())
+
+
+def order_pdf_key(order_df: pd.DataFrame, client_name: str, note: str, generated_at: datetime) -> str:
+    digest = hashlib.sha256()
+    rows = order_df.reindex(columns=ORDER_COLUMNS).reset_index(drop=True)
+    digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    for part in (client_name or "", (note or "").strip(), generated_at.strftime("%Y%m%d%H%M")):
+        digest.update(b"\x1f")
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+@timed_stage("pdf_download")
+def cached_order_pdf(
+    order_df: pd.DataFrame,
+    client_name: str,
+    note: str = "",
+    cache: PdfCache | None = None,
+    catalog_version: str = "",
+) -> bytes:
+    # Imported here so that fpdf is only loaded once a document is actually requested.
+    from order_pdf import generate_order_pdf
+
+    target = cache if cache is not None else ORDER_PDF_CACHE
+    # The PDF prints the time to the minute, so the key uses the same resolution.
+    generated_at = datetime.now().replace(second=0, microsecond=0)
+    key = order_pdf_key(order_df, client_name, note, generated_at)
+    return target.get_or_render(
+        key,
+        lambda: generate_order_pdf(order_df, client_name, note, generated_at),
+        generation=catalog_version[:16],
+    )
+
+
+def pdf_cache_stats() -> dict[str, int]:
+    return ORDER_PDF_CACHE.stats()
@@ -0,0 +1,149 @@
+﻿from __future__ import annotations
+
+from collections import OrderedDict, deque
+from functools import lru_cache
+import os
+from pathlib import Path
+import re
+import threading
+from types import FunctionType
+from typing import Any
+
+from fpdf import FPDF
+import fpdf.fpdf as fpdf_module
+from fpdf.ttfonts import TTFontFile
+
+
+SUBSET_CACHE_SIZE = 32
+RENDER_HISTORY_SIZE = 50
+
+_subset_cache: OrderedDict[tuple[str, tuple[int, ...]], tuple[bytes, dict[int, int], int]] = OrderedDict()
+_subset_lock = threading.Lock()
+_subset_stats = {"hits": 0, "misses": 0}
+_render_history: deque[dict[str, Any]] = deque(maxlen=RENDER_HISTORY_SIZE)
+
+
+@lru_cache(maxsize=8)
+def _font_metrics(ttf_path: str, mtime_ns: int, size: int) -> dict[str, Any]:
+    # Same dictionary FPDF.add_font(uni=True) builds, parsed once per process
+    # instead of once per document (or per .pkl read when the font dir is writable).
+    ttf = TTFontFile()
+    ttf.getMetrics(ttf_path)
+    return {
+        "name": re.sub("[ ()]", "", ttf.fullName),
+        "type": "TTF",
+        "desc": {
+            "Ascent": int(round(ttf.ascent, 0)),
+            "Descent": int(round(ttf.descent, 0)),
+            "CapHeight": int(round(ttf.capHeight, 0)),
+            "Flags": ttf.flags,
+            "FontBBox": "[%s %s %s %s]" % tuple(int(round(value, 0)) for value in ttf.bbox[:4]),
+            "ItalicAngle": int(ttf.italicAngle),
+            "StemV": int(round(ttf.stemV, 0)),
+            "MissingWidth": int(round(ttf.defaultWidth, 0)),
+        },
+        "up": round(ttf.underlinePosition),
+        "ut": round(ttf.underlineThickness),
+        "ttffile": ttf_path,
+        "originalsize": size,
+        "cw": ttf.charWidths,
+    }
+
+
+def load_font_metrics(path: str | Path) -> dict[str, Any]:
+    font_path = os.fspath(path)
+    stat = os.stat(font_path)
+    return _font_metrics(font_path, stat.st_mtime_ns, stat.st_size)
+
+
+class _SubsetCachingTTFontFile(TTFontFile):
+    def makeSubset(self, file: str, subset: list[int]) -> bytes:  # noqa: N802 - fpdf API
+        key = (file, tuple(sorted(set(subset))))
+        with _subset_lock:
+            cached = _subset_cache.get(key)
+            if cached is not None:
+                _subset_cache.move_to_end(key)
+                _subset_stats["hits"] += 1
+        if cached is None:
+            stream = super().makeSubset(file, subset)
+            cached = (stream, dict(self.codeToGlyph), self.maxUni)
+            with _subset_lock:
+                _subset_stats["misses"] += 1
+                _subset_cache[key] = cached
+                while len(_subset_cache) > SUBSET_CACHE_SIZE:
+                    _subset_cache.popitem(last=False)
+
+        stream, code_to_glyph, max_uni = cached
+        self.codeToGlyph = dict(code_to_glyph)
+        self.maxUni = max_uni
+        return stream
+
+
+# fpdf 1.7.2's _putfonts, bound to globals where TTFontFile is the subset-caching class:
+# the fpdf module itself is never patched, so plain FPDF documents rendered meanwhile are unaffected.
+_putfonts_with_cached_subsets = FunctionType(
+    FPDF._putfonts.__code__,
+    dict(vars(fpdf_module), TTFontFile=_SubsetCachingTTFontFile),
+    "_putfonts",
+    FPDF._putfonts.__defaults__,
+    FPDF._putfonts.__closure__,
+)
+
+
+class CachedFontPDF(FPDF):
+    """FPDF that reuses parsed TrueType metrics and glyph subsets across documents."""
+
+    def add_cached_font(self, family: str, path: str | Path) -> None:
+        fontkey = family.lower()
+        if fontkey in self.fonts:
+            return
+
+        metrics = load_font_metrics(path)
+        self.fonts[fontkey] = {
+            "i": len(self.fonts) + 1,
+            "type": metrics["type"],
+            "name": metrics["name"],
+            "desc": metrics["desc"],
+            "up": metrics["up"],
+            "ut": metrics["ut"],
+            "cw": metrics["cw"],
+            "ttffile": metrics["ttffile"],
+            "fontkey": fontkey,
+            "subset": list(range(0, 57 if hasattr(self, "str_alias_nb_pages") else 32)),
+            "unifilename": None,
+        }
+        self.font_files[fontkey] = {
+            "length1": metrics["originalsize"],
+            "type": "TTF",
+            "ttffile": metrics["ttffile"],
+        }
+        self.font_files[os.fspath(path)] = {"type": "TTF"}
+
+    def _putfonts(self) -> None:
+        _putfonts_with_cached_subsets(self)
+
+
+def used_glyph_count(pdf: FPDF) -> int:
+    return sum(
+        len({code for code in font.get("subset", ()) if code >= 32})
+        for font in pdf.fonts.values()
+        if font.get("type") == "TTF"
+    )
+
+
+def record_render(size_bytes: int, seconds: float, glyphs: int) -> None:
+    _render_history.append({"bytes": size_bytes, "ms": seconds * 1000, "glyphs": glyphs})
+
+
+def render_stats() -> dict[str, Any]:
+    with _subset_lock:
+        subsets = dict(_subset_stats, entries=len(_subset_cache))
+    history = list(_render_history)
+    return {
+        "renders": len(history),
+        "last": history[-1] if history else None,
+        "avg_bytes": sum(item["bytes"] for item in history) / len(history) if history else 0.0,
+        "avg_ms": sum(item["ms"] for item in history) / len(history) if history else 0.0,
+        "subsets": subsets,
+        "metrics": _font_metrics.cache_info()._asdict(),
+    }
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any, BinaryIO
+
+from fpdf.fpdf import sprintf
+
+from pdf_fonts import CachedFontPDF
+
+
+class StreamingPDF(CachedFontPDF):
+    """FPDF that writes each page to ``sink`` as soon as it is finished.
+
+    FPDF keeps every page as a growing string and assembles the document in
+    ``self.buffer``, so memory and string copies grow with the page count.
+    Here only the current page is buffered; page objects go out in the same
+    order and with the same object numbers FPDF would give them (page ``n`` is
+    object ``1 + 2n``), and fonts, images, the page tree, the catalog and the
+    cross-reference table follow on ``close()``.
+
+    ``alias_nb_pages`` is not supported: pages are gone before the total is known.
+    """
+
+    def __init__(self, sink: BinaryIO, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.sink = sink
+        self.bytes_written = 0
+        self._page_chunks: list[str] = []
+
+    def alias_nb_pages(self, alias: str = "{nb}") -> str:
+        self.error("alias_nb_pages is not available when streaming pages")
+        return alias
+
+    def finish(self) -> int:
+        """Closes the document and returns the number of bytes written to the sink."""
+        self.close()
+        return self.bytes_written
+
+    def _write(self, data: bytes) -> None:
+        self.sink.write(data)
+        self.sink.write(b"\n")
+        self.bytes_written += len(data) + 1
+
+    def _out(self, s: Any) -> None:
+        if self.state == 2:
+            if isinstance(s, bytes):
+                s = s.decode("latin1")
+            self._page_chunks.append(s if isinstance(s, str) else str(s))
+            return
+        if isinstance(s, str):
+            s = s.encode("latin1")
+        elif not isinstance(s, bytes):
+            s = str(s).encode("latin1")
+        self._write(s)
+
+    def _newobj(self) -> None:
+        self.n += 1
+        self.offsets[self.n] = self.bytes_written
+        self._out(f"{self.n} 0 obj")
+
+    def _page_size_pt(self) -> tuple[float, float]:
+        if self.def_orientation == "P":
+            return self.fw_pt, self.fh_pt
+        return self.fh_pt, self.fw_pt
+
+    def _endpage(self) -> None:
+        super()._endpage()
+        content = "\n".join(self._page_chunks)
+        self._page_chunks = []
+        if content:
+            content += "\n"
+        if self.page == 1:
+            self._putheader()
+        self._putpage(self.page, content)
+        self.pages[self.page] = ""
+
+    def _putpage(self, n: int, content: str) -> None:
+        # Per-page half of FPDF._putpages.
+        w_pt, h_pt = self._page_size_pt()
+        self._newobj()
+        self._out("<</Type /Page")
+        self._out("/Parent 1 0 R")
+        if n in self.orientation_changes:
+            self._out(sprintf("/MediaBox [0 0 %.2f %.2f]", h_pt, w_pt))
+        self._out("/Resources 2 0 R")
+        if self.page_links and n in self.page_links:
+            annots = "/Annots ["
+            for pl in self.page_links[n]:
+                rect = sprintf("%.2f %.2f %.2f %.2f", pl[0], pl[1], pl[0] + pl[2], pl[1] - pl[3])
+                annots += "<</Type /Annot /Subtype /Link /Rect [" + rect + "] /Border [0 0 0] "
+                if isinstance(pl[4], str):
+                    annots += "/A <</S /URI /URI " + self._textstring(pl[4]) + ">>>>"
+                else:
+                    link = self.links[pl[4]]
+                    h = w_pt if link[0] in self.orientation_changes else h_pt
+                    annots += sprintf("/Dest [%d 0 R /XYZ 0 %.2f null]>>", 1 + 2 * link[0], h - link[1] * self.k)
+            self._out(annots + "]")
+        if self.pdf_version > "1.3":
+            self._out("/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>")
+        self._out("/Contents " + str(self.n + 1) + " 0 R>>")
+        self._out("endobj")
+
+        data = content.encode("latin1")
+        if self.compress:
+            data = zlib.compress(data)
+        self._newobj()
+        self._out("<<" + ("/Filter /FlateDecode " if self.compress else "") + "/Length " + str(len(data)) + ">>")
+        self._putstream(data)
+        self._out("endobj")
+
+    def _putpagesroot(self) -> None:
+        # Written at the end, once the page count is known.
+        self.offsets[1] = self.bytes_written
+        self._out("1 0 obj")
+        self._out("<</Type /Pages")
+        self._out("/Kids [" + "".join(f"{3 + 2 * i} 0 R " for i in range(self.page)) + "]")
+        self._out(sprintf("/Count %d", self.page))
+        w_pt, h_pt = self._page_size_pt()
+        self._out(sprintf("/MediaBox [0 0 %.2f %.2f]", w_pt, h_pt))
+        self._out(">>")
+        self._out("endobj")
+
+    def _putresources(self) -> None:
+        self._putfonts()
+        self._putimages()
+        self.offsets[2] = self.bytes_written
+        self._out("2 0 obj")
+        self._out("<<")
+        self._putresourcedict()
+        self._out(">>")
+        self._out("endobj")
+
+    def _enddoc(self) -> None:
+        self._putresources()
+        self._putpagesroot()
+        self._newobj()
+        self._out("<<")
+        self._putinfo()
+        self._out(">>")
+        self._out("endobj")
+        self._newobj()
+        self._out("<<")
+        self._putcatalog()
+        self._out(">>")
+        self._out("endobj")
+
+        xref = self.bytes_written
+        self._out("xref")
+        self._out(f"0 {self.n + 1}")
+        self._out("0000000000 65535 f ")
+        for i in range(1, self.n + 1):
+            self._out(sprintf("%010d 00000 n ", self.offsets[i]))
+        self._out("trailer")
+        self._out("<<")
+        self._puttrailer()
+        self._out(">>")
+        self._out("startxref")
+        self._out(xref)
+        self._out("%%EOF")
+        self.state = 3
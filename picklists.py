@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+import time
+from typing import Iterable, Iterator
+
+import pandas as pd
+
+from catalog import PROJECT_ROOT, load_catalog
+from money import format_cents, frame_cents
+from order_pdf import new_order_pdf, pdf_bytes, safe_pdf_text
+from order_store import LINE_COLUMNS, ORDER_DB_PATH, OrderStore
+from pdf_batch import BatchOrder, load_batch_orders
+from pdf_fonts import record_render, used_glyph_count
+from utils import format_quantity, make_safe_filename
+
+
+TOTAL_KEYS = ["category", "product", "units"]
+CLIENT_KEYS = ["category", "client_name", "product", "units"]
+
+
+@dataclass
+class PickLists:
+    day: str
+    totals: pd.DataFrame
+    clients: pd.DataFrame | None = None
+    orders: int = 0
+    lines: int = 0
+
+    @property
+    def categories(self) -> list[str]:
+        return self.totals["category"].drop_duplicates().tolist()
+
+
+def batch_line_chunks(
+    orders: Iterable[BatchOrder], chunk_size: int = 50_000, source: str = "batch"
+) -> Iterator[pd.DataFrame]:
+    pending: list[pd.DataFrame] = []
+    pending_rows = 0
+    for index, order in enumerate(orders):
+        if order.order_df.empty:
+            continue
+        lines = order.order_df[["category", "name", "units", "quantity"]].rename(columns={"name": "product"})
+        lines["line_cents"] = frame_cents(order.order_df, "line_cents", "line_total")
+        lines.insert(0, "client_name", order.client_name)
+        lines.insert(0, "order_uid", f"{source}-{index}")
+        pending.append(lines)
+        pending_rows += len(lines)
+        if pending_rows >= chunk_size:
+            yield pd.concat(pending, ignore_index=True)[LINE_COLUMNS]
+            pending, pending_rows = [], 0
+    if pending:
+        yield pd.concat(pending, ignore_index=True)[LINE_COLUMNS]
+
+
+def _sum_by(frame: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    return frame.groupby(keys, sort=False, observed=True, as_index=False).agg(
+        quantity=("quantity", "sum"),
+        line_cents=("line_cents", "sum"),
+    )
+
+
+def _merge(sums: list[pd.DataFrame], order_keys: list[pd.DataFrame], keys: list[str]) -> pd.DataFrame:
+    # Catalog names are not unique, so one order can hold several lines under the same keys:
+    # orders are counted as distinct order_uid over the (keys, order_uid) pairs of every chunk.
+    orders = (
+        pd.concat(order_keys, ignore_index=True)
+        .groupby(keys, sort=False, observed=True)["order_uid"]
+        .nunique()
+        .rename("orders")
+        .reset_index()
+    )
+    merged = _sum_by(pd.concat(sums, ignore_index=True), keys).merge(orders, on=keys, how="left")
+    return merged[keys + ["quantity", "orders", "line_cents"]].sort_values(keys, ignore_index=True)
+
+
+def aggregate_pick_lists(chunks: Iterable[pd.DataFrame], day: str = "", with_clients: bool = False) -> PickLists:
+    """Sums quantities per category and product, one chunk at a time.
+
+    Only the per-chunk partial sums and the distinct (product, order) pairs
+    are kept, never the lines themselves. The order book holds the last
+    version of each session order, so an order downloaded again is picked once.
+    """
+    totals: list[pd.DataFrame] = []
+    total_orders: list[pd.DataFrame] = []
+    clients: list[pd.DataFrame] = []
+    client_orders: list[pd.DataFrame] = []
+    order_ids: set[str] = set()
+    line_count = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        totals.append(_sum_by(chunk, TOTAL_KEYS))
+        total_orders.append(chunk[TOTAL_KEYS + ["order_uid"]].drop_duplicates())
+        if with_clients:
+            clients.append(_sum_by(chunk, CLIENT_KEYS))
+            client_orders.append(chunk[CLIENT_KEYS + ["order_uid"]].drop_duplicates())
+        order_ids.update(chunk["order_uid"].unique())
+        line_count += len(chunk)
+
+    if not totals:
+        sums = ["quantity", "orders", "line_cents"]
+        clients_empty = pd.DataFrame(columns=CLIENT_KEYS + sums) if with_clients else None
+        return PickLists(day=day, totals=pd.DataFrame(columns=TOTAL_KEYS + sums), clients=clients_empty)
+
+    merged_totals = _merge(totals, total_orders, TOTAL_KEYS)
+    merged_clients = _merge(clients, client_orders, CLIENT_KEYS) if with_clients else None
+    return PickLists(day=day, totals=merged_totals, clients=merged_clients, orders=len(order_ids), lines=line_count)
+
+
+def _unit_label(units: str) -> str:
+    return "kg" if "kg" in (units or "").lower() else "pièce"
+
+
+def generate_pick_list_pdf(pick_lists: PickLists, category: str, generated_at: datetime | None = None) -> bytes:
+    totals = pick_lists.totals[pick_lists.totals["category"] == category]
+    if totals.empty:
+        raise ValueError(f"No order for category {category}")
+
+    started = time.perf_counter()
+    pdf, font_family, unicode_ready = new_order_pdf()
+    pdf.add_page()
+    pdf.set_margins(12, 12, 12)
+
+    now = (generated_at or datetime.now()).strftime("%d/%m/%Y %H:%M")
+    day_label = datetime.fromisoformat(pick_lists.day).strftime("%d/%m/%Y") if pick_lists.day else ""
+
+    pdf.set_font(font_family, size=18)
+    pdf.cell(0, 10, safe_pdf_text(f"Liste de préparation - {category}", unicode_ready), ln=True, align="C")
+    pdf.set_font(font_family, size=12)
+    pdf.cell(0, 7, safe_pdf_text("GAEC Au Champ du Puits", unicode_ready), ln=True, align="C")
+    pdf.ln(6)
+    pdf.cell(0, 7, safe_pdf_text(f"Distribution: {day_label}", unicode_ready), ln=True)
+    pdf.cell(0, 7, safe_pdf_text(f"Édité le: {now}", unicode_ready), ln=True)
+    pdf.ln(5)
+
+    w_product, w_qty, w_unit, w_orders, w_total = 84, 28, 20, 24, 22
+    row_h = 8
+
+    pdf.set_fill_color(226, 232, 221)
+    pdf.set_font(font_family, size=11)
+    for width, label in (
+        (w_product, "Produit"),
+        (w_qty, "Quantité"),
+        (w_unit, "Unité"),
+        (w_orders, "Commandes"),
+        (w_total, "Montant"),
+    ):
+        pdf.cell(width, row_h, safe_pdf_text(label, unicode_ready), border=1, align="C", fill=True)
+    pdf.ln(row_h)
+
+    for product, units, quantity, orders, line_cents in totals[
+        ["product", "units", "quantity", "orders", "line_cents"]
+    ].itertuples(index=False, name=None):
+        pdf.cell(w_product, row_h, safe_pdf_text(product, unicode_ready), border=1)
+        pdf.cell(w_qty, row_h, safe_pdf_text(format_quantity(float(quantity), units), unicode_ready), border=1, align="C")
+        pdf.cell(w_unit, row_h, safe_pdf_text(_unit_label(units), unicode_ready), border=1, align="C")
+        pdf.cell(w_orders, row_h, str(int(orders)), border=1, align="C")
+        pdf.cell(w_total, row_h, safe_pdf_text(format_cents(int(line_cents)), unicode_ready), border=1, align="C")
+        pdf.ln(row_h)
+
+    if pick_lists.clients is not None:
+        clients = pick_lists.clients[pick_lists.clients["category"] == category]
+        pdf.ln(6)
+        pdf.set_font(font_family, size=13)
+        pdf.cell(0, 8, safe_pdf_text("Détail par client", unicode_ready), ln=True)
+        pdf.set_font(font_family, size=11)
+        for client_name, client_lines in clients.groupby("client_name", sort=False):
+            pdf.set_fill_color(247, 245, 238)
+            pdf.cell(w_product + w_qty + w_unit, row_h, safe_pdf_text(client_name, unicode_ready), border=1, fill=True, ln=True)
+            for product, units, quantity in client_lines[["product", "units", "quantity"]].itertuples(index=False, name=None):
+                pdf.cell(w_product, row_h, safe_pdf_text(product, unicode_ready), border=1)
+                pdf.cell(w_qty, row_h, safe_pdf_text(format_quantity(float(quantity), units), unicode_ready), border=1, align="C")
+                pdf.cell(w_unit, row_h, safe_pdf_text(_unit_label(units), unicode_ready), border=1, align="C")
+                pdf.ln(row_h)
+
+    document = pdf_bytes(pdf)
+    record_render(len(document), time.perf_counter() - started, used_glyph_count(pdf))
+    return document
+
+
+def render_pick_lists(pick_lists: PickLists, output_dir: str | Path, generated_at: datetime | None = None) -> list[Path]:
+    target_dir = Path(output_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for category in pick_lists.categories:
+        path = target_dir / f"Preparation_{pick_lists.day}_{make_safe_filename(category)}.pdf"
+        path.write_bytes(generate_pick_list_pdf(pick_lists, category, generated_at))
+        written.append(path)
+    return written
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Génère les listes de préparation par catégorie pour un jour de distribution.")
+    parser.add_argument("--date", default=date.today().isoformat(), help="Jour de distribution (AAAA-MM-JJ).")
+    parser.add_argument("--orders", action="append", default=[], help="Fichier JSON de commandes (format de pdf_batch).")
+    parser.add_argument("--db", default=str(ORDER_DB_PATH), help="Carnet de commandes SQLite.")
+    parser.add_argument("--no-db", action="store_true", help="N'utiliser que les fichiers --orders.")
+    parser.add_argument("--details", action="store_true", help="Ajouter le détail par client.")
+    parser.add_argument("--output-dir", default="preparation")
+    parser.add_argument("--catalog", default=str(PROJECT_ROOT / "products.xlsx"))
+    args = parser.parse_args(argv)
+
+    day = date.fromisoformat(args.date)
+    started = time.perf_counter()
+
+    def chunks() -> Iterator[pd.DataFrame]:
+        if not args.no_db and Path(args.db).exists():
+            store = OrderStore(args.db)
+            yield from store.iter_day_lines(day)
+            store.close()
+        if args.orders:
+            catalog, _ = load_catalog(args.catalog)
+            for orders_path in args.orders:
+                yield from batch_line_chunks(load_batch_orders(orders_path, catalog), source=orders_path)
+
+    pick_lists = aggregate_pick_lists(chunks(), day.isoformat(), with_clients=args.details)
+    if pick_lists.totals.empty:
+        print(f"Aucune commande pour le {day:%d/%m/%Y}.")
+        return 1
+
+    written = render_pick_lists(pick_lists, args.output_dir)
+    print(
+        f"{pick_lists.orders} commande(s), {pick_lists.lines} ligne(s) -> {len(written)} liste(s) "
+        f"en {time.perf_counter() - started:.2f} s dans {args.output_dir}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import argparse
+import base64
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import io
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import BinaryIO
+
+import pandas as pd
+
+from catalog import PROJECT_ROOT, load_catalog
+from order_pdf import new_order_pdf, safe_pdf_text
+from pdf_cache import PdfCache
+from pdf_fonts import record_render, used_glyph_count
+from pdf_stream import StreamingPDF
+from shared_cache import CACHE_ROOT, atomic_write_bytes, file_lock
+from thumbnails import THUMBNAIL_DIR, THUMBNAIL_URL
+from timings import timed_stage
+from utils import prepare_products
+
+
+PRICE_LIST_DIR = CACHE_ROOT / "price_list"
+PRICE_LIST_IMAGE_DIR = PRICE_LIST_DIR / "images"
+# One subdirectory per catalog version, holding its documents and their locks.
+PRICE_LIST_VERSION_DIR = PRICE_LIST_DIR / "versions"
+PRICE_LIST_COLUMNS = ["image_path", "name", "price_label", "category"]
+DEFAULT_COLUMNS = 3
+
+MARGIN = 12
+GUTTER = 4
+CARD_H = 24
+IMAGE_BOX = 20
+HEADER_H = 9
+
+# Rendered documents, keyed by catalog version; the files under PRICE_LIST_DIR survive restarts.
+PRICE_LIST_CACHE = PdfCache(max_entries=4)
+
+
+def catalog_version_of(products_df: pd.DataFrame) -> str:
+    version = str(products_df.attrs.get("catalog_version", ""))
+    if version:
+        return version
+    rows = products_df.reindex(columns=PRICE_LIST_COLUMNS).reset_index(drop=True)
+    return hashlib.sha256(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _reference_bytes(reference: str) -> bytes | None:
+    if reference.startswith("data:image/"):
+        return base64.b64decode(reference.split(",", 1)[1])
+    if reference.startswith(f"{THUMBNAIL_URL}/"):
+        return (THUMBNAIL_DIR / reference.rsplit("/", 1)[-1]).read_bytes()
+    if reference.startswith(("http://", "https://")) or not reference:
+        return None
+    path = Path(reference)
+    return (path if path.is_absolute() else PROJECT_ROOT / path).read_bytes()
+
+
+@lru_cache(maxsize=4096)
+def _pdf_image(reference: str) -> tuple[str, int, int] | None:
+    # fpdf only embeds JPEG, PNG and GIF; thumbnails are WebP, so each one is
+    # converted once to a JPEG named after its content.
+    try:
+        payload = _reference_bytes(reference)
+        if payload is None:
+            return None
+
+        from PIL import Image
+
+        target = PRICE_LIST_IMAGE_DIR / f"{hashlib.sha256(payload).hexdigest()[:24]}.jpg"
+        if target.exists():
+            with Image.open(target) as image:
+                return target.as_posix(), image.width, image.height
+
+        with Image.open(io.BytesIO(payload)) as image:
+            image = image.convert("RGBA")
+            flat = Image.new("RGB", image.size, (255, 255, 255))
+            flat.paste(image, mask=image.getchannel("A"))
+        encoded = io.BytesIO()
+        flat.save(encoded, format="JPEG", quality=85)
+        atomic_write_bytes(target, encoded.getvalue())
+        return target.as_posix(), flat.width, flat.height
+    except (OSError, ValueError):
+        return None
+
+
+def _fit_text(pdf: StreamingPDF, text: str, width: float) -> str:
+    if pdf.get_string_width(text) <= width:
+        return text
+    while text and pdf.get_string_width(text + "...") > width:
+        text = text[:-1]
+    return text.rstrip() + "..."
+
+
+def _two_lines(pdf: StreamingPDF, text: str, width: float) -> tuple[str, str]:
+    words = text.split()
+    first = ""
+    while words and pdf.get_string_width(f"{first} {words[0]}".strip()) <= width:
+        first = f"{first} {words.pop(0)}".strip()
+    if not first:
+        return _fit_text(pdf, text, width), ""
+    return first, _fit_text(pdf, " ".join(words), width)
+
+
+def _start_page(pdf: StreamingPDF, font_family: str, unicode_ready: bool, subtitle: str) -> None:
+    pdf.add_page()
+    pdf.set_text_color(110, 110, 110)
+    pdf.set_font(font_family, size=8)
+    pdf.cell(pdf.w - 2 * MARGIN - 20, 5, safe_pdf_text(subtitle, unicode_ready))
+    pdf.cell(20, 5, f"{pdf.page_no()}", align="R", ln=True)
+    pdf.set_text_color(0, 0, 0)
+    pdf.ln(2)
+
+
+def _category_header(pdf: StreamingPDF, font_family: str, unicode_ready: bool, label: str) -> None:
+    pdf.set_fill_color(226, 232, 221)
+    pdf.set_font(font_family, size=12)
+    pdf.cell(0, HEADER_H - 1, safe_pdf_text(label, unicode_ready), fill=True, ln=True)
+    pdf.ln(1)
+
+
+def _card(
+    pdf: StreamingPDF,
+    font_family: str,
+    unicode_ready: bool,
+    x: float,
+    y: float,
+    width: float,
+    name: str,
+    price_label: str,
+    image: tuple[str, int, int] | None,
+) -> None:
+    pdf.set_draw_color(216, 217, 207)
+    pdf.rect(x, y, width, CARD_H - 2)
+
+    box_x, box_y = x + 1, y + 1
+    if image is not None:
+        path, image_w, image_h = image
+        scale = IMAGE_BOX / max(image_w, image_h)
+        w, h = image_w * scale, image_h * scale
+        pdf.image(path, box_x + (IMAGE_BOX - w) / 2, box_y + (IMAGE_BOX - h) / 2, w, h)
+    else:
+        pdf.set_fill_color(247, 245, 238)
+        pdf.rect(box_x, box_y, IMAGE_BOX, IMAGE_BOX, style="F")
+
+    text_x = box_x + IMAGE_BOX + 2
+    text_w = x + width - text_x - 1
+    pdf.set_font(font_family, size=9)
+    first, second = _two_lines(pdf, safe_pdf_text(name, unicode_ready), text_w)
+    pdf.set_xy(text_x, y + 2)
+    pdf.cell(text_w, 4.5, first)
+    pdf.set_xy(text_x, y + 6.5)
+    pdf.cell(text_w, 4.5, second)
+
+    pdf.set_font(font_family, size=11)
+    pdf.set_text_color(47, 93, 59)
+    pdf.set_xy(text_x, y + 13)
+    pdf.cell(text_w, 6, _fit_text(pdf, safe_pdf_text(price_label, unicode_ready), text_w))
+    pdf.set_text_color(0, 0, 0)
+
+
+@timed_stage("price_list_render")
+def write_price_list_pdf(
+    products_df: pd.DataFrame,
+    sink: BinaryIO,
+    columns: int = DEFAULT_COLUMNS,
+    with_images: bool = True,
+    generated_at: datetime | None = None,
+) -> int:
+    """Writes the catalog as a grid of product cards grouped by category; returns the bytes written."""
+    if products_df.empty:
+        raise ValueError("Catalog is empty")
+
+    started = time.perf_counter()
+    pdf, font_family, unicode_ready = new_order_pdf(sink)
+    # Pages are broken by hand so that a card is never split.
+    pdf.set_auto_page_break(auto=False)
+    pdf.set_margins(MARGIN, MARGIN, MARGIN)
+
+    today = (generated_at or datetime.now()).strftime("%d/%m/%Y")
+    subtitle = f"GAEC Au Champ du Puits - Catalogue au {today}"
+    _start_page(pdf, font_family, unicode_ready, subtitle)
+    pdf.set_font(font_family, size=18)
+    pdf.cell(0, 10, safe_pdf_text("Catalogue des produits", unicode_ready), ln=True, align="C")
+    pdf.set_font(font_family, size=10)
+    pdf.cell(0, 6, safe_pdf_text(f"Prix indicatifs au {today}, selon les stocks disponibles.", unicode_ready), ln=True, align="C")
+    pdf.ln(4)
+
+    columns = max(1, int(columns))
+    card_w = (pdf.w - 2 * MARGIN - GUTTER * (columns - 1)) / columns
+    bottom = pdf.h - MARGIN
+    names, price_labels, images = (products_df[column].to_numpy() for column in ["name", "price_label", "image_path"])
+
+    for category, positions in products_df.groupby("category", sort=False).indices.items():
+        if pdf.get_y() + HEADER_H + CARD_H > bottom:
+            _start_page(pdf, font_family, unicode_ready, subtitle)
+        _category_header(pdf, font_family, unicode_ready, str(category))
+
+        for start in range(0, len(positions), columns):
+            if pdf.get_y() + CARD_H > bottom:
+                _start_page(pdf, font_family, unicode_ready, subtitle)
+                _category_header(pdf, font_family, unicode_ready, f"{category} (suite)")
+            y = pdf.get_y()
+            for slot, row in enumerate(positions[start : start + columns]):
+                image = _pdf_image(str(images[row] or "")) if with_images else None
+                x = MARGIN + slot * (card_w + GUTTER)
+                _card(pdf, font_family, unicode_ready, x, y, card_w, str(names[row]), str(price_labels[row]), image)
+            pdf.set_xy(MARGIN, y + CARD_H)
+        pdf.ln(2)
+
+    size = pdf.finish()
+    record_render(size, time.perf_counter() - started, used_glyph_count(pdf))
+    return size
+
+
+def price_list_path(catalog_version: str, columns: int = DEFAULT_COLUMNS, with_images: bool = True) -> Path:
+    suffix = "" if with_images else "_texte"
+    return PRICE_LIST_VERSION_DIR / catalog_version[:16] / f"Catalogue_{columns}col{suffix}.pdf"
+
+
+def _remove_other_versions(current: Path) -> None:
+    # A document whose lock is held is being rendered by another replica still on that version: leave it.
+    for version_dir in PRICE_LIST_VERSION_DIR.iterdir():
+        if version_dir == current or not version_dir.is_dir():
+            continue
+        documents = {path.with_suffix("") if path.suffix == ".lock" else path for path in version_dir.glob("Catalogue_*")}
+        for document in documents:
+            lock = document.with_name(f"{document.name}.lock")
+            with file_lock(lock, blocking=False) as locked:
+                if locked:
+                    document.unlink(missing_ok=True)
+                    lock.unlink(missing_ok=True)
+        try:
+            version_dir.rmdir()
+        except OSError:
+            pass
+
+
+def _render_to_disk(products_df: pd.DataFrame, target: Path, columns: int, with_images: bool) -> bytes:
+    # Replicas sharing the cache directory wait for whichever one is already rendering.
+    with file_lock(target.with_name(f"{target.name}.lock")):
+        if target.exists():
+            return target.read_bytes()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{target.name}.", dir=target.parent)
+        try:
+            with os.fdopen(fd, "wb") as sink:
+                write_price_list_pdf(products_df, sink, columns, with_images)
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, target)
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+
+    _remove_other_versions(target.parent)
+    return target.read_bytes()
+
+
+def _load_price_list(products_df: pd.DataFrame, catalog_version: str, columns: int, with_images: bool) -> bytes:
+    target = price_list_path(catalog_version, columns, with_images)
+    try:
+        return target.read_bytes()
+    except OSError:
+        pass
+    try:
+        return _render_to_disk(products_df, target, columns, with_images)
+    except OSError:
+        # Read-only cache directory: render in memory on every process start instead.
+        sink = io.BytesIO()
+        write_price_list_pdf(products_df, sink, columns, with_images)
+        return sink.getvalue()
+
+
+def cached_price_list(products_df: pd.DataFrame, columns: int = DEFAULT_COLUMNS, with_images: bool = True) -> bytes:
+    catalog_version = catalog_version_of(products_df)
+    return PRICE_LIST_CACHE.get_or_render(
+        f"{catalog_version}:{columns}:{int(with_images)}",
+        lambda: _load_price_list(products_df, catalog_version, columns, with_images),
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Génère le catalogue imprimable (PDF) à partir de products.xlsx.")
+    parser.add_argument("--catalog", default=str(PROJECT_ROOT / "products.xlsx"))
+    parser.add_argument("--output", default="Catalogue.pdf")
+    parser.add_argument("--columns", type=int, default=DEFAULT_COLUMNS)
+    parser.add_argument("--no-images", action="store_true", help="Ne pas inclure les photos.")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    catalog, _ = load_catalog(args.catalog)
+    products_df = prepare_products(catalog)
+    products_df.attrs.update(catalog.attrs)
+    document = cached_price_list(products_df, args.columns, not args.no_images)
+    Path(args.output).write_bytes(document)
+    print(
+        f"{len(products_df)} produit(s) -> {args.output} ({len(document) / 1024:.0f} Ko) "
+        f"en {time.perf_counter() - started:.2f} s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from catalog_index import fold
+from money import frame_cents, line_cents as _line_cents, parse_cents
+
+
+PRICING_SHEET = "pricing"
+RULE_COLUMNS = ["name", "rule", "min_quantity", "price", "size"]
+TIER, MEMBER, BUNDLE = "palier", "adherent", "lot"
+
+# Quantities are handled in tenths: kilograms are ordered to 0.1 kg, other units by whole items.
+WHOLE_UNITS = 10
+TENTHS = 1
+_NO_PRICE = np.iinfo(np.int64).max
+_POSITION_SHIFT = 32
+# Larger quantities would spill into the position bits of the tier keys.
+_MAX_TENTHS = (1 << _POSITION_SHIFT) - 1
+
+
+class PricingTables(NamedTuple):
+    """Pricing rules compiled into arrays indexed by catalog position.
+
+    Built once per catalog version. Tiers are stored as sorted
+    ``position << 32 | min_quantity_tenths`` keys, so the tier that applies
+    to every line of an order is found with one ``searchsorted``.
+    """
+
+    catalog_version: str
+    base_cents: np.ndarray
+    step_tenths: np.ndarray
+    member_cents: np.ndarray
+    tier_keys: np.ndarray
+    tier_cents: np.ndarray
+    bundle_tenths: np.ndarray
+    bundle_cents: np.ndarray
+    warnings: list[str]
+
+    @property
+    def has_member_prices(self) -> bool:
+        return bool((self.member_cents != _NO_PRICE).any())
+
+
+class PricedLines(NamedTuple):
+    quantity_tenths: np.ndarray
+    unit_cents: np.ndarray
+    line_cents: np.ndarray
+    bundles: np.ndarray
+
+
+def read_pricing_sheet(path: str | Path) -> pd.DataFrame:
+    """The optional ``pricing`` sheet of the workbook; empty when there is none.
+
+    One rule per row: ``name`` is the catalog product and ``rule`` one of
+    "palier" (``price`` from ``min_quantity`` up), "adhérent" (``price`` for
+    members) or "lot" (``size`` items for ``price``).
+    """
+    try:
+        rules = pd.read_excel(path, sheet_name=PRICING_SHEET)
+    except ValueError:
+        return pd.DataFrame(columns=RULE_COLUMNS)
+    return rules.reindex(columns=RULE_COLUMNS)
+
+
+def _to_tenths(values: pd.Series) -> pd.Series:
+    # Quantities read exactly like prices ("2,5" or 2.5), then hundredths rounded to tenths; <NA> when unreadable.
+    return (parse_cents(values) + 5) // 10
+
+
+def compile_pricing(catalog: pd.DataFrame, rules: pd.DataFrame | None = None) -> PricingTables:
+    size = len(catalog)
+    base_cents = frame_cents(catalog, "unit_cents", "unit_price")
+    per_item = catalog["units"].fillna("").astype(str).str.strip().str.lower().eq("€").to_numpy()
+    step_tenths = np.where(per_item, WHOLE_UNITS, TENTHS).astype(np.int64)
+    member_cents = np.full(size, _NO_PRICE, dtype=np.int64)
+    bundle_tenths = np.zeros(size, dtype=np.int64)
+    bundle_cents = np.zeros(size, dtype=np.int64)
+    tier_keys = np.empty(0, dtype=np.int64)
+    tier_cents = np.empty(0, dtype=np.int64)
+    warnings: list[str] = []
+
+    rules = (rules if rules is not None else pd.DataFrame(columns=RULE_COLUMNS)).reindex(columns=RULE_COLUMNS)
+    rules = rules[rules["name"].notna() | rules["rule"].notna()]
+    if not rules.empty:
+        names = rules["name"].fillna("").astype(str).str.strip()
+        raw_kinds = rules["rule"].fillna("").astype(str)
+        kinds = raw_kinds.map({kind: fold(kind).strip() for kind in raw_kinds.unique()})
+        prices = parse_cents(rules["price"])
+        min_quantity = _to_tenths(rules["min_quantity"])
+        sizes = _to_tenths(rules["size"])
+
+        catalog_names = catalog["name"].astype(str).str.strip().to_numpy()
+        known = names.isin(catalog_names)
+        valid_kind = kinds.isin([TIER, MEMBER, BUNDLE])
+        complete = (
+            prices.ge(0).fillna(False).astype(bool)
+            & (kinds.ne(TIER) | min_quantity.gt(0).fillna(False).astype(bool))
+            & (kinds.ne(BUNDLE) | sizes.gt(0).fillna(False).astype(bool))
+        )
+        if (~known).any():
+            warnings.append(f"{int((~known).sum())} règle(s) de prix ignorée(s): produit inconnu.")
+        if (known & ~valid_kind).any():
+            warnings.append(
+                f"{int((known & ~valid_kind).sum())} règle(s) de prix ignorée(s): "
+                f"type inconnu (attendu: {TIER}, {MEMBER} ou {BUNDLE})."
+            )
+        if (known & valid_kind & ~complete).any():
+            warnings.append(f"{int((known & valid_kind & ~complete).sum())} règle(s) de prix ignorée(s): prix, seuil ou taille invalide.")
+
+        keep = (known & valid_kind & complete).to_numpy()
+        # One row per (rule, catalog position): a name may appear more than once in the catalog.
+        pairs = pd.DataFrame({"name": names.to_numpy()[keep], "rule": np.flatnonzero(keep)}).merge(
+            pd.DataFrame({"name": catalog_names, "position": np.arange(size)}), on="name", sort=False
+        )
+        positions = pairs["position"].to_numpy(dtype=np.int64)
+        expanded = pairs["rule"].to_numpy()
+        kind = kinds.to_numpy()[expanded]
+        cents = prices.iloc[expanded].to_numpy(dtype=np.int64)
+
+        is_member = kind == MEMBER
+        # Several member prices for one product: the lowest wins.
+        np.minimum.at(member_cents, positions[is_member], cents[is_member])
+
+        is_bundle = kind == BUNDLE
+        bundle_positions = positions[is_bundle]
+        if len(np.unique(bundle_positions)) < len(bundle_positions):
+            warnings.append("Plusieurs lots pour un même produit: seul le dernier est appliqué.")
+        bundle_tenths[bundle_positions] = sizes.iloc[expanded[is_bundle]].to_numpy(dtype=np.int64)
+        bundle_cents[bundle_positions] = cents[is_bundle]
+
+        is_tier = kind == TIER
+        keys = (positions[is_tier] << _POSITION_SHIFT) | min_quantity.iloc[expanded[is_tier]].to_numpy(dtype=np.int64).clip(max=_MAX_TENTHS)
+        order = np.argsort(keys, kind="stable")
+        tier_keys, tier_cents = keys[order], cents[is_tier][order]
+
+    return PricingTables(
+        catalog_version=str(catalog.attrs.get("catalog_version", "")),
+        base_cents=base_cents,
+        step_tenths=step_tenths,
+        member_cents=member_cents,
+        tier_keys=tier_keys,
+        tier_cents=tier_cents,
+        bundle_tenths=bundle_tenths,
+        bundle_cents=bundle_cents,
+        warnings=warnings,
+    )
+
+
+def price_lines(
+    tables: PricingTables,
+    positions: np.ndarray,
+    quantities: np.ndarray,
+    member: bool = False,
+) -> PricedLines:
+    """Prices every line of an order at once.
+
+    Quantities are rounded down to whole items, or to the nearest 0.1 kg,
+    and capped at 2**32 - 1 tenths so they cannot reach another product's tiers.
+    A line gets the lowest of its catalog, tier and (for members) member
+    unit price; full bundles are then charged at the bundle price when that
+    is cheaper, and the rest at the unit price. Line totals are whole cents,
+    half a cent rounded up.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    quantities = np.nan_to_num(np.asarray(quantities, dtype=np.float64), nan=0.0).clip(min=0.0)
+    step = tables.step_tenths[positions]
+    quantity_tenths = np.where(step == WHOLE_UNITS, np.floor(quantities) * 10, np.rint(quantities * 10))
+    quantity_tenths = quantity_tenths.clip(max=_MAX_TENTHS).astype(np.int64)
+
+    unit_cents = tables.base_cents[positions]
+    if member:
+        unit_cents = np.minimum(unit_cents, tables.member_cents[positions])
+    if len(tables.tier_keys):
+        keys = (positions << _POSITION_SHIFT) | quantity_tenths
+        tier = np.searchsorted(tables.tier_keys, keys, side="right") - 1
+        found = tier >= 0
+        found[found] = (tables.tier_keys[tier[found]] >> _POSITION_SHIFT) == positions[found]
+        unit_cents = np.where(found, np.minimum(unit_cents, tables.tier_cents[np.maximum(tier, 0)]), unit_cents)
+
+    line_cents = _line_cents(unit_cents, quantity_tenths)
+    bundle_size = tables.bundle_tenths[positions]
+    bundles = np.zeros(len(positions), dtype=np.int64)
+    has_bundle = bundle_size > 0
+    if has_bundle.any():
+        bundles[has_bundle] = quantity_tenths[has_bundle] // bundle_size[has_bundle]
+        rest = quantity_tenths - bundles * bundle_size
+        with_bundles = bundles * tables.bundle_cents[positions] + _line_cents(unit_cents, rest)
+        cheaper = has_bundle & (with_bundles < line_cents)
+        line_cents = np.where(cheaper, with_bundles, line_cents)
+        bundles = np.where(cheaper, bundles, 0)
+
+    return PricedLines(quantity_tenths, unit_cents, line_cents, bundles)
@@ -0,0 +1,224 @@
+﻿from __future__ import annotations
+
+from contextlib import contextmanager
+from functools import lru_cache
+import hashlib
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Callable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks degrade to per-process only.
+    fcntl = None
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+# Point every replica on a host at the same directory to share catalog snapshots and PDFs.
+CACHE_ROOT = Path(os.environ.get("CDP_CACHE_DIR") or PROJECT_ROOT / ".cache")
+SHARED_CACHE_ENV = "CDP_SHARED_CACHE"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Directory walks (eviction, stats) run at most this often unless a write pushes the size over budget.
+SCAN_INTERVAL = 30.0
+LOCKS_DIRNAME = ".locks"
+# Eviction trims to this share of max_bytes, so a full cache is not walked again on the very next write.
+EVICT_TO = 0.9
+
+_thread_locks: dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def shared_cache_enabled() -> bool:
+    return os.environ.get(SHARED_CACHE_ENV, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+@contextmanager
+def file_lock(path: str | Path, blocking: bool = True) -> Iterator[bool]:
+    """Holds an exclusive lock on ``path`` across threads and processes.
+
+    Yields whether the lock is held: with ``blocking=False`` it is False
+    when another thread or process already holds it.
+    """
+    lock_path = Path(path)
+    try:
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        pass
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(lock_path.as_posix(), threading.Lock())
+
+    if not thread_lock.acquire(blocking):
+        yield False
+        return
+    try:
+        try:
+            handle = lock_path.open("a+b")
+        except OSError:
+            # Read-only cache directory: nothing to coordinate on, just run.
+            yield True
+            return
+        with handle:
+            locked = True
+            if fcntl is not None:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    locked = False
+            try:
+                yield locked
+            finally:
+                if locked and fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+
+def atomic_write_bytes(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(payload)
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, path)
+    finally:
+        Path(tmp_name).unlink(missing_ok=True)
+
+
+class DiskCache:
+    """Byte cache in a directory shared by processes, bounded by total size.
+
+    Entries live under ``<namespace>/<generation>/`` (e.g. per catalog
+    version); replicas on different generations share the directory, so
+    older generations are left to age out through eviction. Reads refresh
+    the entry mtime so eviction removes the least recently used.
+    The directory is only walked when the running size estimate goes over
+    ``max_bytes`` or the last walk is older than ``scan_interval``; other
+    processes' writes are picked up at that point.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES, scan_interval: float = SCAN_INTERVAL) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self.hits = 0
+        self.misses = 0
+        self._guard = threading.Lock()
+        self._bytes = 0
+        self._count = 0
+        self._scanned_at = float("-inf")
+
+    def _entry_path(self, namespace: str, generation: str, key: str) -> Path:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / namespace / (generation or "default") / name[:2] / name
+
+    def _lock_path(self, key: str) -> Path:
+        # At most 256 lock files for the whole cache, reused across namespaces and generations.
+        return self.directory / LOCKS_DIRNAME / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:2]}.lock"
+
+    def get(self, namespace: str, key: str, generation: str = "") -> bytes | None:
+        path = self._entry_path(namespace, generation, key)
+        try:
+            payload = path.read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return payload
+
+    def set(self, namespace: str, key: str, payload: bytes, generation: str = "") -> None:
+        atomic_write_bytes(self._entry_path(namespace, generation, key), payload)
+        with self._guard:
+            self._bytes += len(payload)
+            self._count += 1
+            due = self._bytes > self.max_bytes or time.monotonic() - self._scanned_at > self.scan_interval
+        if due:
+            self.evict()
+
+    def get_or_create(
+        self,
+        namespace: str,
+        key: str,
+        factory: Callable[[], bytes],
+        generation: str = "",
+    ) -> bytes:
+        cached = self.get(namespace, key, generation)
+        if cached is not None:
+            return cached
+
+        # Only one process renders a given entry; the others wait and read it.
+        with file_lock(self._lock_path(key)):
+            cached = self.get(namespace, key, generation)
+            if cached is None:
+                cached = factory()
+                self.set(namespace, key, cached, generation)
+        return cached
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            if LOCKS_DIRNAME in dirs:
+                dirs.remove(LOCKS_DIRNAME)
+            for name in files:
+                if name.startswith(".") or name.endswith(".lock"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._guard:
+            self._bytes = total
+            self._count = len(entries) - removed
+            self._scanned_at = time.monotonic()
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        if time.monotonic() - self._scanned_at > self.scan_interval:
+            self.evict()
+        with self._guard:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": self._count,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_shared_cache() -> DiskCache | None:
+    if not shared_cache_enabled():
+        return None
+    try:
+        max_bytes = int(os.environ.get("CDP_SHARED_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+    except ValueError:
+        max_bytes = DEFAULT_MAX_BYTES
+    return DiskCache(CACHE_ROOT / "shared", max_bytes)
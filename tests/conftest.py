@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from catalog import _format_unit_cents  # noqa: E402
+from order_store import OrderStore  # noqa: E402
+from utils import prepare_products  # noqa: E402
+
+
+@pytest.fixture
+def products() -> pd.DataFrame:
+    catalog = pd.DataFrame(
+        {
+            "image_path": ["", "", "", ""],
+            "name": ["Miel de lavande 500 g", "Tomme de chèvre", "Pain de campagne", "Oeufs x6"],
+            "category": ["Apiculture", "Fromagerie", "Boulangerie", "Volaille"],
+            "unit_cents": [950, 2480, 420, 330],
+            "units": ["€", "€/Kg", "€", "€"],
+        }
+    )
+    catalog["unit_price"] = catalog["unit_cents"] / 100
+    catalog["price_label"] = _format_unit_cents(catalog["unit_cents"], catalog["units"])
+    prepared = prepare_products(catalog)
+    prepared.attrs["catalog_version"] = "tests"
+    return prepared
+
+
+@pytest.fixture
+def store(tmp_path: Path):
+    order_store = OrderStore(tmp_path / "orders.sqlite3", flush_interval=0.0)
+    yield order_store
+    order_store.close()
@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from import_budget import BUDGET_FILE, check_budget, profile  # noqa: E402
+
+
+def test_home_page_imports_stay_within_budget():
+    report = profile(PROJECT_ROOT / "Accueil.py", runs=5)
+    budget = json.loads(BUDGET_FILE.read_text(encoding="utf-8"))
+    assert check_budget(report, budget["Accueil.py"]) == []
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from email.message import EmailMessage
+import socketserver
+import threading
+
+from mailer import STATUS_SENT, MailDispatcher, SmtpConnection
+
+
+class _FlakySmtpHandler(socketserver.StreamRequestHandler):
+    def _reply(self, text: str) -> None:
+        self.wfile.write(f"{text}\r\n".encode("ascii"))
+
+    def handle(self) -> None:
+        server: FlakySmtpServer = self.server  # type: ignore[assignment]
+        server.connections += 1
+        if server.connections <= server.refused:
+            self._reply("421 busy, try again later")
+            return
+        self._reply("220 local ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self._reply("250-local\r\n250-AUTH PLAIN LOGIN\r\n250 SIZE 52428800")
+            elif command == b"AUTH":
+                self._reply("235 Authentication successful")
+            elif command == b"DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b""):
+                    body.append(data)
+                server.messages.append(b"".join(body))
+                self._reply("250 OK")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class FlakySmtpServer(socketserver.ThreadingTCPServer):
+    """SMTP sink on localhost that turns away its first ``refused`` connections."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refused: int = 0) -> None:
+        super().__init__(("127.0.0.1", 0), _FlakySmtpHandler)
+        self.refused = refused
+        self.connections = 0
+        self.messages: list[bytes] = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+def _message(receiver: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "ferme@example.org"
+    message["To"] = receiver
+    message["Subject"] = "Commande"
+    message.set_content("Bonjour")
+    message.add_attachment(b"%PDF-1.3 test", maintype="application", subtype="pdf", filename="commande.pdf")
+    return message
+
+
+def test_dispatcher_retries_after_a_refused_connection_and_delivers():
+    server = FlakySmtpServer(refused=1)
+    connection = SmtpConnection("127.0.0.1", server.server_address[1], None, use_ssl=False, timeout=5)
+    dispatcher = MailDispatcher(connection, backoff=0.05)
+    try:
+        job_id = dispatcher.submit(_message("client@example.org"))
+        job = dispatcher.wait(job_id, timeout=10)
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+        server.server_close()
+
+    assert job is not None
+    assert job.status == STATUS_SENT
+    assert job.attempts == 2
+    assert server.connections == 2
+    assert len(server.messages) == 1
+    assert b"commande.pdf" in server.messages[0]
+
+
+def test_finished_jobs_keep_no_message():
+    server = FlakySmtpServer()
+    connection = SmtpConnection("127.0.0.1", server.server_address[1], None, use_ssl=False, timeout=5)
+    dispatcher = MailDispatcher(connection, backoff=0.05)
+    try:
+        job_ids = [dispatcher.submit(_message(f"client{index}@example.org")) for index in range(3)]
+        jobs = [dispatcher.wait(job_id, timeout=10) for job_id in job_ids]
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+        server.server_close()
+
+    assert [job.status for job in jobs] == [STATUS_SENT] * 3
+    assert all(job.message is None and job.receiver for job in jobs)
+    assert len(server.messages) == 3
+
+
+def test_send_email_reads_the_smtp_settings_from_secrets(monkeypatch):
+    from streamlit.runtime.secrets import AttrDict
+
+    import order_mail
+    import utils
+
+    server = FlakySmtpServer()
+    secrets = {
+        "email": AttrDict(
+            {
+                "address": "ferme@example.org",
+                "passkey": "secret",
+                "smtp_host": "127.0.0.1",
+                "smtp_port": server.server_address[1],
+                "smtp_ssl": False,
+            }
+        )
+    }
+    monkeypatch.setattr(utils.st, "secrets", secrets)
+    try:
+        sent, message = order_mail.send_email("client@example.org", "Commande", "Bonjour", b"%PDF-1.3 test")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert sent, message
+    assert len(server.messages) == 1
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from money import PRICE_PATTERN, format_cents, format_cents_array, line_cents, parse_cents
+
+
+def _float_cents(values: pd.Series) -> pd.Series:
+    # The former catalog parser: the first number read as a float, then rounded to cents.
+    number = values.astype(str).str.replace(",", ".", regex=False).str.extract(PRICE_PATTERN)[0]
+    return (pd.to_numeric(number, errors="coerce") * 100).round()
+
+
+def _random_prices(count: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    whole = rng.integers(0, 100_000, size=count).tolist()
+    places = rng.integers(0, 4, size=count).tolist()
+    separators = rng.choice([".", ","], size=count).tolist()
+    suffixes = rng.choice(["", " €", "€", " € / kg", " EUR"], size=count).tolist()
+    texts = []
+    for number, decimals, separator, suffix in zip(whole, places, separators, suffixes):
+        fraction = f"{int(rng.integers(0, 10**decimals)):0{decimals}d}" if decimals else ""
+        texts.append(f"{number}{separator if fraction else ''}{fraction}{suffix}")
+    return pd.Series(texts, dtype=object)
+
+
+@pytest.mark.parametrize(
+    "value, cents",
+    [
+        ("2,50 €", 250),
+        ("15.15", 1515),
+        (15.15, 1515),
+        ("24.8 €/Kg", 2480),
+        ("0,125", 13),
+        ("0,124", 12),
+        ("-0,125", -13),
+        ("+3", 300),
+        (".5", 50),
+        ("12 EUR", 1200),
+    ],
+)
+def test_parse_cents(value, cents):
+    assert parse_cents(pd.Series([value], dtype=object)).tolist() == [cents]
+
+
+def test_parse_cents_without_a_number_is_missing():
+    parsed = parse_cents(pd.Series(["gratuit", None, "4,20 €"], dtype=object))
+    assert parsed.isna().tolist() == [True, True, False]
+    assert parsed.dtype == "Int64"
+
+
+def test_parse_cents_matches_the_float_parser_except_on_half_cents():
+    values = _random_prices(20_000)
+    cents = parse_cents(values).to_numpy(dtype=np.int64)
+    floats = _float_cents(values).to_numpy(dtype=np.int64)
+    fraction = values.str.replace(",", ".", regex=False).str.extract(PRICE_PATTERN)[0].str.partition(".")[2]
+    # "0.125" is 12.5 cents: cents round it up, the float (0.12499...) often goes down.
+    half_cent = (fraction.str[2:].str.rstrip("0") == "5").to_numpy()
+    assert (cents[~half_cent] == floats[~half_cent]).all()
+    assert (np.abs(cents[half_cent] - floats[half_cent]) <= 1).all()
+
+
+def test_line_cents_matches_the_float_rounding_except_on_half_cents():
+    rng = np.random.default_rng(1)
+    unit = rng.integers(0, 1_000_000, size=100_000)
+    tenths = rng.integers(0, 10_000, size=100_000)
+    exact = line_cents(unit, tenths)
+    rounded = np.array([round(u / 100 * q / 10, 2) for u, q in zip(unit.tolist(), tenths.tolist())])
+    floats = np.rint(rounded * 100).astype(np.int64)
+    # Half a cent is now always rounded up; round(x, 2) on the float went either way.
+    tie = unit * tenths % 10 == 5
+    assert tie.any()
+    assert (exact[~tie] == floats[~tie]).all()
+    assert (exact[tie] * 10 == unit[tie] * tenths[tie] + 5).all()
+    assert (exact[tie] - floats[tie] <= 1).all() and (exact[tie] >= floats[tie]).all()
+
+
+@pytest.mark.parametrize("cents", [0, 5, 99, 100, 250, 2480, 123_456_789, -5, -250])
+def test_format_cents_matches_the_euro_format(cents):
+    assert format_cents(cents) == "{:.2f} €".format(cents / 100)
+
+
+def test_format_cents_array_matches_format_cents():
+    cents = np.random.default_rng(2).integers(-1_000_000, 10_000_000, size=10_000)
+    assert format_cents_array(cents).tolist() == [format_cents(value) for value in cents.tolist()]
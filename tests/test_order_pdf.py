@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import datetime
+import io
+
+import pandas as pd
+import pytest
+
+from order_pdf import generate_order_pdf, write_order_pdf
+from order_state import get_order_state
+from pricing import compile_pricing
+
+pypdf = pytest.importorskip("pypdf")
+
+GENERATED_AT = datetime(2026, 10, 19, 9, 0)
+
+
+def _pages_text(document: bytes) -> list[str]:
+    return [page.extract_text() for page in pypdf.PdfReader(io.BytesIO(document)).pages]
+
+
+@pytest.fixture
+def long_order(products) -> pd.DataFrame:
+    state = get_order_state({}, "order_0", products)
+    edits = {row: {"select": True, "quantity": 2.0} for row in range(4)}
+    order_df, _ = state.apply(products, compile_pricing(products), edits, "editor_0", products.index.to_numpy()[:4])
+    # Enough lines for several pages.
+    copies = [order_df.assign(name=order_df["name"] + f" #{copy}") for copy in range(30)]
+    return pd.concat(copies, ignore_index=True)
+
+
+def test_streamed_pdf_matches_the_in_memory_pdf(tmp_path, long_order):
+    document = generate_order_pdf(long_order, "Marie Dupont", "Retrait vendredi", GENERATED_AT)
+    path = tmp_path / "order.pdf"
+    with path.open("wb") as sink:
+        size = write_order_pdf(long_order, "Marie Dupont", sink, "Retrait vendredi", GENERATED_AT)
+
+    streamed = path.read_bytes()
+    assert size == len(streamed)
+    pages, streamed_pages = _pages_text(document), _pages_text(streamed)
+    assert len(pages) > 1
+    assert streamed_pages == pages
+
+    text = "\n".join(pages)
+    assert "Marie Dupont" in text
+    assert "Miel de lavande 500 g #29" in text
+    assert "Retrait vendredi" in text
+    assert f"{30 * (2 * 950 + 2 * 2480 + 2 * 420 + 2 * 330) / 100:.2f}" in text
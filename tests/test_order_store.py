@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from order_state import get_order_state
+from pricing import compile_pricing
+
+DAY = date(2026, 10, 20)
+
+
+def _download(store, session_state, products, edits, created_at):
+    # What the PDF button does: price the session order, then record it under its id.
+    pricing = compile_pricing(products)
+    state = get_order_state(session_state, "order_0", products)
+    order_df, _ = state.apply(products, pricing, edits, "editor_0", products.index.to_numpy()[:4])
+    store.record(state.order_uid, order_df, "Marie Dupont", created_at=created_at, distribution_day=DAY)
+    assert store.flush()
+    return state.order_uid
+
+
+def test_same_session_order_downloaded_twice_is_counted_once(store, products):
+    session_state = {}
+    first = _download(
+        store,
+        session_state,
+        products,
+        {0: {"select": True, "quantity": 2.0}, 2: {"select": True, "quantity": 1.0}},
+        datetime(2026, 10, 19, 9, 0),
+    )
+    # A minute later the client fixes one quantity and downloads again.
+    second = _download(
+        store,
+        session_state,
+        products,
+        {0: {"select": True, "quantity": 3.0}, 2: {"select": True, "quantity": 1.0}},
+        datetime(2026, 10, 19, 9, 1),
+    )
+
+    assert first == second
+    orders = store.recent_orders()
+    assert len(orders) == 1
+    assert orders["total"].iat[0] == 32.70
+
+    totals = store.quantity_by_product_day().set_index("product")
+    assert totals.loc["Miel de lavande 500 g", "quantity"] == 3.0
+    assert totals.loc["Miel de lavande 500 g", "orders"] == 1
+    assert totals.loc["Pain de campagne", "quantity"] == 1.0
+    assert totals["amount"].sum() == 32.70
+
+
+def test_new_session_order_is_a_new_order(store, products):
+    _download(store, {}, products, {0: {"select": True, "quantity": 1.0}}, datetime(2026, 10, 19, 9, 0))
+    _download(store, {}, products, {0: {"select": True, "quantity": 1.0}}, datetime(2026, 10, 19, 9, 0))
+
+    assert len(store.recent_orders()) == 2
+    assert store.quantity_by_product_day()["quantity"].sum() == 2.0
+
+
+def test_next_distribution_day_follows_the_configured_weekdays(monkeypatch):
+    import utils
+
+    tuesday = date(2026, 10, 20)
+    monkeypatch.setattr(utils, "get_secret", lambda path, default=None: [1, 4])
+    assert utils.next_distribution_day(tuesday) == tuesday
+    assert utils.next_distribution_day(date(2026, 10, 21)) == date(2026, 10, 23)
+    assert utils.next_distribution_day(date(2026, 10, 24)) == date(2026, 10, 27)
+
+    monkeypatch.setattr(utils, "get_secret", lambda path, default=None: default)
+    assert utils.next_distribution_day(tuesday) == tuesday
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pandas as pd
+
+from order_state import get_order_state
+from order_store import LINE_COLUMNS
+from picklists import aggregate_pick_lists
+from pricing import compile_pricing
+
+DAY = date(2026, 10, 20)
+
+
+def _download(store, session_state, products, edits, client_name, created_at):
+    state = get_order_state(session_state, "order_0", products)
+    order_df, _ = state.apply(products, compile_pricing(products), edits, "editor_0", products.index.to_numpy()[:4])
+    store.record(state.order_uid, order_df, client_name, created_at=created_at, distribution_day=DAY)
+    assert store.flush()
+
+
+def test_reorder_on_the_same_day_is_picked_once(store, products):
+    marie = {}
+    _download(store, marie, products, {0: {"select": True, "quantity": 2.0}}, "Marie Dupont", datetime(2026, 10, 19, 9, 0))
+    _download(store, {}, products, {0: {"select": True, "quantity": 1.0}}, "Paul Martin", datetime(2026, 10, 19, 9, 5))
+    # Marie comes back later that day, adds a loaf and downloads her order again.
+    _download(
+        store,
+        marie,
+        products,
+        {0: {"select": True, "quantity": 2.0}, 2: {"select": True, "quantity": 1.0}},
+        "Marie Dupont",
+        datetime(2026, 10, 19, 17, 30),
+    )
+
+    pick_lists = aggregate_pick_lists(store.iter_day_lines(DAY), DAY.isoformat(), with_clients=True)
+    totals = pick_lists.totals.set_index("product")
+    assert pick_lists.orders == 2
+    assert totals.loc["Miel de lavande 500 g", "quantity"] == 3.0
+    assert totals.loc["Miel de lavande 500 g", "orders"] == 2
+    assert totals.loc["Pain de campagne", "quantity"] == 1.0
+    assert totals["line_cents"].sum() == 3 * 950 + 420
+
+    marie_lines = pick_lists.clients[pick_lists.clients["client_name"] == "Marie Dupont"].set_index("product")
+    assert marie_lines.loc["Miel de lavande 500 g", "quantity"] == 2.0
+
+
+def test_duplicate_catalog_names_count_each_order_once():
+    # The catalog lists "Oeufs x6" twice (two farms, two prices); one order holding both
+    # is still one order, even when its lines land in different chunks.
+    def lines(order_uid, client_name, unit_cents):
+        return pd.DataFrame(
+            [[order_uid, client_name, "Volaille", "Oeufs x6", "€", 1.0, unit_cents]],
+            columns=LINE_COLUMNS,
+        )
+
+    chunks = [
+        pd.concat([lines("a", "Marie Dupont", 330), lines("a", "Marie Dupont", 360)], ignore_index=True),
+        lines("b", "Paul Martin", 330),
+        lines("b", "Paul Martin", 360),
+    ]
+    pick_lists = aggregate_pick_lists(chunks, DAY.isoformat(), with_clients=True)
+    eggs = pick_lists.totals.set_index("product").loc["Oeufs x6"]
+    assert pick_lists.orders == 2
+    assert eggs["orders"] == 2
+    assert eggs["quantity"] == 4.0
+    assert eggs["line_cents"] == 2 * (330 + 360)
+    assert pick_lists.clients.set_index("client_name")["orders"].to_dict() == {"Marie Dupont": 1, "Paul Martin": 1}
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import price_list
+from shared_cache import file_lock
+
+
+def test_other_versions_are_removed_unless_their_lock_is_held(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_list, "PRICE_LIST_VERSION_DIR", tmp_path)
+    current, idle, busy = (tmp_path / version for version in ("v3", "v1", "v2"))
+    for version_dir in (current, idle, busy):
+        version_dir.mkdir()
+        (version_dir / "Catalogue_3col.pdf").write_bytes(b"%PDF")
+        (version_dir / "Catalogue_3col.pdf.lock").touch()
+
+    # Another replica still on v2 is rendering its document.
+    with file_lock(busy / "Catalogue_3col.pdf.lock"):
+        price_list._remove_other_versions(current)
+
+    assert not idle.exists()
+    assert (busy / "Catalogue_3col.pdf").exists()
+    assert (current / "Catalogue_3col.pdf").exists()
+
+
+def test_price_list_is_rendered_under_its_catalog_version(tmp_path, monkeypatch, products):
+    monkeypatch.setattr(price_list, "PRICE_LIST_VERSION_DIR", tmp_path)
+    (tmp_path / "old").mkdir()
+    (tmp_path / "old" / "Catalogue_3col.pdf").write_bytes(b"%PDF")
+
+    document = price_list._load_price_list(products, "tests", 3, False)
+
+    assert document.startswith(b"%PDF")
+    assert price_list.price_list_path("tests", 3, False) == tmp_path / "tests" / "Catalogue_3col_texte.pdf"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["tests"]
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from pricing import BUNDLE, TIER, compile_pricing, price_lines
+
+
+def _rules(*rows: dict) -> pd.DataFrame:
+    return pd.DataFrame(list(rows))
+
+
+def test_huge_quantity_does_not_reach_the_next_products_tiers(products):
+    # Without a cap, 2**32 + 1 tenths of cheese would read as the bread's 0.1 tier.
+    tables = compile_pricing(products, _rules({"name": "Pain de campagne", "rule": TIER, "min_quantity": "0,1", "price": 1}))
+    priced = price_lines(tables, np.array([1]), np.array([((1 << 32) + 1) / 10]))
+
+    assert priced.unit_cents.tolist() == [2480]
+    assert priced.quantity_tenths.tolist() == [(1 << 32) - 1]
+
+
+def test_rule_quantities_are_read_like_prices(products):
+    tables = compile_pricing(
+        products,
+        _rules(
+            {"name": "Tomme de chèvre", "rule": TIER, "min_quantity": "1,5 kg", "price": "22,00 €"},
+            {"name": "Oeufs x6", "rule": "Lot", "size": 2.0, "price": 6},
+            {"name": "Pain de campagne", "rule": BUNDLE, "size": "beaucoup", "price": 6},
+        ),
+    )
+    priced = price_lines(tables, np.array([1, 1, 3]), np.array([1.4, 1.5, 5.0]))
+
+    assert priced.unit_cents.tolist() == [2480, 2200, 330]
+    assert priced.line_cents.tolist() == [3472, 3300, 2 * 600 + 330]
+    assert tables.warnings == ["1 règle(s) de prix ignorée(s): prix, seuil ou taille invalide."]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+from pathlib import Path
+
+from shared_cache import DiskCache, file_lock
+
+KEYS = 40
+PAYLOAD_BYTES = 256 * 1024
+
+
+def _payload(generation: str, key: str) -> bytes:
+    # Large enough that a torn or interleaved write would show as a different digest.
+    seed = hashlib.sha256(f"{generation}/{key}".encode()).digest()
+    return seed * (PAYLOAD_BYTES // len(seed))
+
+
+def _worker(directory: str, generation: str, renders_path: str) -> int:
+    cache = DiskCache(directory, max_bytes=1 << 30)
+    mismatches = 0
+
+    def render(key: str) -> bytes:
+        with file_lock(renders_path + ".lock"):
+            with open(renders_path, "a", encoding="utf-8") as renders:
+                renders.write(f"{generation}/{key}\n")
+        return _payload(generation, key)
+
+    for index in range(KEYS):
+        key = f"order-{index}"
+        mismatches += cache.get_or_create("pdf", key, lambda key=key: render(key), generation) != _payload(generation, key)
+        mismatches += cache.get("pdf", key, generation) != _payload(generation, key)
+    return mismatches
+
+
+def test_processes_share_entries_without_losing_or_tearing_them(tmp_path: Path):
+    directory = tmp_path / "shared"
+    renders = tmp_path / "renders.txt"
+    # Two replicas per catalog version, two catalog versions at once.
+    generations = ["v1", "v2", "v1", "v2"]
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(len(generations)) as pool:
+        mismatches = pool.starmap(_worker, [(str(directory), generation, str(renders)) for generation in generations])
+
+    assert mismatches == [0] * len(generations)
+    rendered = renders.read_text(encoding="utf-8").splitlines()
+    # Each entry is rendered by exactly one process; the others read it.
+    assert sorted(rendered) == sorted({f"{generation}/order-{index}" for generation in ("v1", "v2") for index in range(KEYS)})
+
+    cache = DiskCache(directory)
+    for generation in ("v1", "v2"):
+        for index in range(KEYS):
+            assert cache.get("pdf", f"order-{index}", generation) == _payload(generation, f"order-{index}")
+    assert cache.stats()["entries"] == 2 * KEYS
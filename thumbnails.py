@@ -0,0 +1,76 @@
+﻿from __future__ import annotations
+
+import base64
+from functools import lru_cache
+import hashlib
+import os
+from pathlib import Path
+import tempfile
+
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+# Served by Streamlit's static file server (server.enableStaticServing).
+THUMBNAIL_DIR = PROJECT_ROOT / "static" / "thumbnails"
+THUMBNAIL_URL = "/app/static/thumbnails"
+# Twice the data editor row height so thumbnails stay sharp on high-DPI screens.
+THUMBNAIL_BOX = (184, 184)
+THUMBNAIL_QUALITY = 80
+INLINE_MAX_BYTES = 3 * 1024
+
+
+@lru_cache(maxsize=1024)
+def _content_digest(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def thumbnail_path(source: str | Path) -> Path:
+    source_path = os.fspath(source)
+    stat = os.stat(source_path)
+    # Keyed by content: identical images in different folders share one file.
+    digest = _content_digest(source_path, stat.st_mtime_ns, stat.st_size)
+    target = THUMBNAIL_DIR / f"{digest[:24]}.webp"
+    if target.exists():
+        return target
+
+    # Pillow is only needed when a thumbnail is missing, not on every page start.
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        thumbnail = ImageOps.exif_transpose(image)
+        thumbnail.thumbnail(THUMBNAIL_BOX)
+        if thumbnail.mode not in ("RGB", "RGBA"):
+            thumbnail = thumbnail.convert("RGBA" if "transparency" in thumbnail.info else "RGB")
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{target.stem}.", suffix=".webp", dir=target.parent)
+        os.close(fd)
+        try:
+            thumbnail.save(tmp_name, format="WEBP", quality=THUMBNAIL_QUALITY, method=6)
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, target)
+        finally:
+            Path(tmp_name).unlink(missing_ok=True)
+    return target
+
+
+def thumbnail_reference(source: str | Path, inline_max_bytes: int = INLINE_MAX_BYTES) -> str:
+    target = thumbnail_path(source)
+    if target.stat().st_size <= inline_max_bytes:
+        encoded = base64.b64encode(target.read_bytes()).decode("ascii")
+        return f"data:image/webp;base64,{encoded}"
+    return f"{THUMBNAIL_URL}/{target.name}"
+
+
+def missing_thumbnails(references: list[str]) -> bool:
+    names = {reference.rsplit("/", 1)[-1] for reference in references if reference.startswith(THUMBNAIL_URL)}
+    if not names:
+        return False
+    try:
+        present = set(os.listdir(THUMBNAIL_DIR))
+    except OSError:
+        return True
+    return not names <= present
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import json
+import math
+import threading
+import time
+from typing import Any, Callable, Iterator, TypeVar
+
+
+DEFAULT_CAPACITY = 512
+QUANTILES = (0.5, 0.95, 0.99)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _quantile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class StageTimings:
+    """Per-stage ring buffers of call durations, shared by every session of the process.
+
+    Only the last ``capacity`` calls of each stage feed the percentiles;
+    call counts, error counts and total time cover the process lifetime.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.capacity = capacity
+        self._samples: dict[str, deque[float]] = {}
+        self._totals: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.capacity)
+                self._totals[stage] = [0, 0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[stage]
+            totals[0] += 1
+            totals[1] += int(failed)
+            totals[2] += seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            copies = {stage: (sorted(samples), samples[-1], list(self._totals[stage])) for stage, samples in self._samples.items()}
+
+        stages = {}
+        for stage, (ordered, last, (count, errors, total)) in sorted(copies.items()):
+            stages[stage] = {
+                "count": count,
+                "errors": errors,
+                "sum_s": total,
+                "window": len(ordered),
+                "last_ms": last * 1000,
+                "max_ms": ordered[-1] * 1000,
+                **{f"p{round(q * 100)}_ms": _quantile(ordered, q) * 1000 for q in QUANTILES},
+            }
+        return stages
+
+
+TIMINGS = StageTimings()
+
+
+@contextmanager
+def timed(stage: str, registry: StageTimings | None = None) -> Iterator[None]:
+    target = registry if registry is not None else TIMINGS
+    started = time.perf_counter()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        target.record(stage, time.perf_counter() - started, failed)
+
+
+def timed_stage(stage: str) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with timed(stage):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def hit_rate(hits: int, misses: int) -> float | None:
+    lookups = hits + misses
+    return hits / lookups if lookups else None
+
+
+def export_json(stages: dict[str, dict[str, float]], caches: dict[str, dict[str, int]] | None = None) -> str:
+    return json.dumps({"generated_at": time.time(), "stages": stages, "caches": caches or {}}, indent=2)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def export_prometheus(stages: dict[str, dict[str, float]], caches: dict[str, dict[str, int]] | None = None) -> str:
+    lines = [
+        "# HELP cdp_stage_duration_seconds Durée des étapes du parcours de commande.",
+        "# TYPE cdp_stage_duration_seconds summary",
+    ]
+    for stage, values in stages.items():
+        label = _label(stage)
+        for q in QUANTILES:
+            quantile_ms = values[f"p{round(q * 100)}_ms"]
+            lines.append(f'cdp_stage_duration_seconds{{stage="{label}",quantile="{q}"}} {quantile_ms / 1000:.6f}')
+        lines.append(f'cdp_stage_duration_seconds_sum{{stage="{label}"}} {values["sum_s"]:.6f}')
+        lines.append(f'cdp_stage_duration_seconds_count{{stage="{label}"}} {int(values["count"])}')
+
+    lines += ["# HELP cdp_stage_errors_total Appels terminés par une exception.", "# TYPE cdp_stage_errors_total counter"]
+    for stage, values in stages.items():
+        lines.append(f'cdp_stage_errors_total{{stage="{_label(stage)}"}} {int(values["errors"])}')
+
+    if caches:
+        lines += ["# HELP cdp_cache_hits_total Succès de cache.", "# TYPE cdp_cache_hits_total counter"]
+        lines += [f'cdp_cache_hits_total{{cache="{_label(name)}"}} {int(stats["hits"])}' for name, stats in caches.items()]
+        lines += ["# HELP cdp_cache_misses_total Échecs de cache.", "# TYPE cdp_cache_misses_total counter"]
+        lines += [f'cdp_cache_misses_total{{cache="{_label(name)}"}} {int(stats["misses"])}' for name, stats in caches.items()]
+    return "\n".join(lines) + "\n"
@@ -1,25 +1,41 @@
 ﻿from __future__ import annotations
 
-from datetime import datetime
-from email.message import EmailMessage
+from datetime import date, datetime, timedelta
 import hmac
+import importlib
+import logging
 from pathlib import Path
 import re
-import smtplib
-import ssl
-from typing import Any, Sequence
+import sqlite3
+from typing import Any, Mapping, Sequence
 
-from fpdf import FPDF
 import numpy as np
 import pandas as pd
 import streamlit as st
 
+from catalog_index import CatalogIndex
+from catalog_watcher import CatalogSwap, CatalogWatcher
+from money import cents_text, format_cents, format_cents_array, to_cents
+from order_store import OrderStore
+from pricing import PricingTables, compile_pricing, price_lines, read_pricing_sheet
+from timings import timed_stage
+
+
+logger = logging.getLogger(__name__)
+
+# The PDF and mail helpers pull in fpdf, ssl and smtplib; they live in their own
+# modules and are only imported when first used, so the order page starts without them.
+_LAZY_ATTRIBUTES = {
+    "generate_order_pdf": "order_pdf",
+    "generate_orders_pdf": "order_pdf",
+    "send_email": "order_mail",
+    "queue_email": "order_mail",
+    "get_mail_job": "order_mail",
+}
 
 PROJECT_ROOT = Path(__file__).resolve().parent
-FALLBACK_IMAGE = PROJECT_ROOT / "data" / "images" / "coming_soon.png"
 FONT_PATH = PROJECT_ROOT / "data" / "fonts" / "Arial Unicode MS Regular.ttf"
 
-REQUIRED_COLUMNS = {"name", "price", "units", "category", "image_path"}
 ORDER_COLUMNS = [
     "name",
     "category",
@@ -30,6 +46,8 @@ ORDER_COLUMNS = [
     "price_label",
     "quantity_label",
     "line_total_label",
+    "unit_cents",
+    "line_cents",
 ]
 
 
@@ -60,7 +78,7 @@ def validate_client_name(name: str) -> tuple[bool, str]:
     return True, ""
 
 
-def _get_secret(path: Sequence[str], default: Any = None) -> Any:
+def get_secret(path: Sequence[str], default: Any = None) -> Any:
     current: Any = st.secrets
     try:
         for key in path:
@@ -71,20 +89,20 @@ def _get_secret(path: Sequence[str], default: Any = None) -> Any:
 
 
 def get_contact_email() -> str | None:
-    email_config = _get_secret(("email",), default={})
-    address = str(email_config.get("address", "")).strip() if isinstance(email_config, dict) else ""
+    email_config = get_secret(("email",), default={})
+    address = str(email_config.get("address", "")).strip() if isinstance(email_config, Mapping) else ""
     return address or None
 
 
 def get_default_receiver() -> str | None:
-    email_config = _get_secret(("email",), default={})
-    receiver = str(email_config.get("receiver", "")).strip() if isinstance(email_config, dict) else ""
+    email_config = get_secret(("email",), default={})
+    receiver = str(email_config.get("receiver", "")).strip() if isinstance(email_config, Mapping) else ""
     return receiver or None
 
 
-def _get_email_credentials() -> tuple[str, str] | None:
-    email_config = _get_secret(("email",), default={})
-    if not isinstance(email_config, dict):
+def get_email_credentials() -> tuple[str, str] | None:
+    email_config = get_secret(("email",), default={})
+    if not isinstance(email_config, Mapping):
         return None
 
     address = str(email_config.get("address", "")).strip()
@@ -96,52 +114,42 @@ def _get_email_credentials() -> tuple[str, str] | None:
 
 
 def has_admin_password() -> bool:
-    expected = str(_get_secret(("admin", "password"), default="")).strip()
+    expected = str(get_secret(("admin", "password"), default="")).strip()
     return bool(expected)
 
 
 def is_valid_admin_password(candidate: str) -> bool:
-    expected = str(_get_secret(("admin", "password"), default="")).strip()
+    expected = str(get_secret(("admin", "password"), default="")).strip()
     if not expected:
         return False
     return hmac.compare_digest(str(candidate or ""), expected)
 
 
-def _normalize_image_path(raw_path: Any) -> str:
-    if pd.isna(raw_path):
-        return FALLBACK_IMAGE.as_posix() if FALLBACK_IMAGE.exists() else ""
-
-    value = str(raw_path).strip()
-    if not value:
-        return FALLBACK_IMAGE.as_posix() if FALLBACK_IMAGE.exists() else ""
-
-    if value.startswith(("http://", "https://", "data:image/")):
-        return value
-
-    candidate = Path(value)
-    if not candidate.is_absolute():
-        candidate = (PROJECT_ROOT / candidate).resolve()
+def has_member_code() -> bool:
+    return bool(str(get_secret(("members", "code"), default="")).strip())
 
-    if candidate.exists() and candidate.is_file():
-        return candidate.as_posix()
 
-    return FALLBACK_IMAGE.as_posix() if FALLBACK_IMAGE.exists() else ""
-
-
-def _parse_price_column(price_series: pd.Series) -> pd.Series:
-    as_text = price_series.astype(str).str.replace(",", ".", regex=False)
-    extracted = as_text.str.extract(r"([-+]?\d*\.?\d+)")[0]
-    return pd.to_numeric(extracted, errors="coerce")
+def is_valid_member_code(candidate: str) -> bool:
+    expected = str(get_secret(("members", "code"), default="")).strip()
+    if not expected:
+        return False
+    return hmac.compare_digest(str(candidate or "").strip(), expected)
 
 
-def _format_unit_price(unit_price: float, unit: str) -> str:
-    safe_unit = (unit or "").strip()
-    if safe_unit:
-        return f"{unit_price:.2f} {safe_unit}"
-    return f"{unit_price:.2f}"
+def next_distribution_day(today: date | None = None) -> date:
+    """The next distribution weekday from ``[distribution] weekdays`` (0 is Monday), or today when none is set."""
+    today = today or date.today()
+    weekdays = get_secret(("distribution", "weekdays"), default=[])
+    try:
+        days = {int(day) % 7 for day in weekdays}
+    except (TypeError, ValueError):
+        days = set()
+    if not days:
+        return today
+    return min(today + timedelta(days=(day - today.weekday()) % 7) for day in days)
 
 
-def _format_quantity(quantity: float, unit: str) -> str:
+def format_quantity(quantity: float, unit: str) -> str:
     safe_unit = (unit or "").strip().lower()
     if safe_unit == "€":
         return str(int(quantity))
@@ -152,220 +160,204 @@ def _format_quantity(quantity: float, unit: str) -> str:
     return f"{quantity:.1f}"
 
 
-@st.cache_data(show_spinner=False)
+DISPLAY_COLUMNS = [
+    "select",
+    "image_path",
+    "name",
+    "price_label",
+    "quantity",
+    "category",
+    "unit_price",
+    "units",
+    "unit_cents",
+]
+
+
+def prepare_products(catalog: pd.DataFrame) -> pd.DataFrame:
+    data = catalog.copy()
+    data["select"] = False
+    data["quantity"] = 0.0
+    if "unit_cents" not in data.columns:
+        data["unit_cents"] = to_cents(data["unit_price"])
+    return data[DISPLAY_COLUMNS]
+
+
+@st.cache_resource(show_spinner=False)
+def _get_catalog_watcher(products_path: str) -> CatalogWatcher:
+    return CatalogWatcher(products_path, prepare=prepare_products)
+
+
+@timed_stage("load_products")
 def load_products(products_path: str | Path) -> tuple[pd.DataFrame, list[str]]:
-    path = Path(products_path)
+    path = Path(products_path).resolve()
     if not path.exists():
         raise FileNotFoundError(path)
 
-    df = pd.read_excel(path, sheet_name="products")
-    missing = REQUIRED_COLUMNS - set(df.columns)
-    if missing:
-        raise ValueError(f"Colonnes manquantes: {', '.join(sorted(missing))}")
-
-    warnings: list[str] = []
-    data = df.copy()
-
-    data["name"] = data["name"].fillna("").astype(str).str.strip()
-    data["category"] = data["category"].fillna("Autres").astype(str).str.strip()
-    data["units"] = data["units"].fillna("").astype(str).str.strip()
-    data["image_path"] = data["image_path"].apply(_normalize_image_path)
-
-    data["unit_price"] = _parse_price_column(data["price"])
-    invalid_price_mask = data["unit_price"].isna()
-    if invalid_price_mask.any():
-        count = int(invalid_price_mask.sum())
-        warnings.append(
-            f"{count} produit(s) ont un prix invalide et ont été fixés à 0,00 € pour éviter les erreurs."
-        )
-        data.loc[invalid_price_mask, "unit_price"] = 0.0
+    # Shared by every session and swapped by the watcher when the workbook changes;
+    # callers must not mutate it in place.
+    return _get_catalog_watcher(path.as_posix()).current()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_catalog_index(catalog_version: str, _products: pd.DataFrame) -> CatalogIndex:
+    return CatalogIndex(_products)
 
-    data["unit_price"] = data["unit_price"].astype(float).round(2)
-    data["price_label"] = data.apply(
-        lambda row: _format_unit_price(float(row["unit_price"]), str(row["units"])),
-        axis=1,
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _compile_pricing(catalog_version: str, products_path: str, _products: pd.DataFrame) -> PricingTables:
+    return compile_pricing(_products, read_pricing_sheet(products_path))
+
+
+def get_pricing(products: pd.DataFrame, products_path: str | Path) -> PricingTables:
+    # Rules from the workbook's "pricing" sheet, compiled once per catalog version.
+    return _compile_pricing(
+        str(products.attrs.get("catalog_version", len(products))),
+        Path(products_path).resolve().as_posix(),
+        products,
     )
 
-    data["select"] = False
-    data["quantity"] = 0.0
 
-    display_columns = [
-        "select",
-        "image_path",
-        "name",
-        "price_label",
-        "quantity",
-        "category",
-        "unit_price",
-        "units",
-    ]
+def get_catalog_index(products: pd.DataFrame) -> CatalogIndex:
+    # One index per catalog version, shared by every session.
+    return _build_catalog_index(str(products.attrs.get("catalog_version", len(products))), products)
 
-    return data[display_columns], warnings
+
+def catalog_reloads(products_path: str | Path) -> list[CatalogSwap]:
+    path = Path(products_path).resolve()
+    return list(_get_catalog_watcher(path.as_posix()).swaps)
 
 
 def _empty_order() -> pd.DataFrame:
     return pd.DataFrame(columns=ORDER_COLUMNS)
 
 
-def build_order(edited_df: pd.DataFrame) -> tuple[pd.DataFrame, float]:
+def _price_labels(
+    catalog_labels: np.ndarray,
+    repriced: np.ndarray,
+    unit_cents: np.ndarray,
+    units: np.ndarray,
+    bundle_tenths: np.ndarray,
+    bundle_cents: np.ndarray,
+) -> list[str]:
+    # Most lines pay the catalog price, whose label is already formatted.
+    labels = catalog_labels.tolist()
+    for line in np.flatnonzero(repriced | (bundle_tenths > 0)).tolist():
+        unit = str(units[line])
+        labels[line] = f"{cents_text(int(unit_cents[line]))} {unit}".rstrip()
+        if bundle_tenths[line]:
+            size = format_quantity(int(bundle_tenths[line]) / 10, unit)
+            labels[line] += f" (lot de {size}: {format_cents(int(bundle_cents[line]))})"
+    return labels
+
+
+def _quantity_labels(quantity_tenths: np.ndarray) -> np.ndarray:
+    # Same output as format_quantity: whole quantities without decimals, kilograms to 0.1.
+    return np.where(quantity_tenths % 10 == 0, (quantity_tenths // 10).astype(str), (quantity_tenths / 10).astype(str))
+
+
+def priced_order(
+    catalog: pd.DataFrame,
+    pricing: PricingTables,
+    positions: np.ndarray,
+    quantities: np.ndarray,
+    member: bool = False,
+) -> tuple[pd.DataFrame, int]:
+    """Priced lines for ``positions`` (in catalog order), sorted by category then name, and the total in cents."""
+    positions = np.asarray(positions, dtype=np.int64)
+    priced = price_lines(pricing, positions, quantities, member)
+    names = np.array([str(name) for name in catalog["name"].to_numpy()[positions]], dtype=object)
+    keep = (priced.quantity_tenths > 0) & np.array([bool(name.strip()) for name in names], dtype=bool)
+    if not keep.any():
+        return _empty_order(), 0
+
+    kept = np.flatnonzero(keep)
+    categories = catalog["category"].to_numpy()[positions[kept]]
+    ordered = kept[np.lexsort((names[kept], categories))]
+
+    positions = positions[ordered]
+    units = catalog["units"].to_numpy()[positions]
+    quantity_tenths = priced.quantity_tenths[ordered]
+    unit_cents = priced.unit_cents[ordered]
+    line_cents = priced.line_cents[ordered]
+    bundle_tenths = np.where(priced.bundles[ordered] > 0, pricing.bundle_tenths[positions], 0)
+    order = pd.DataFrame(
+        {
+            "name": names[ordered],
+            "category": catalog["category"].to_numpy()[positions],
+            "units": units,
+            "unit_price": unit_cents / 100,
+            "quantity": quantity_tenths / 10,
+            "line_total": line_cents / 100,
+            "price_label": _price_labels(
+                catalog["price_label"].to_numpy()[positions],
+                unit_cents != pricing.base_cents[positions],
+                unit_cents,
+                units,
+                bundle_tenths,
+                pricing.bundle_cents[positions],
+            ),
+            "quantity_label": _quantity_labels(quantity_tenths).astype(object),
+            "line_total_label": format_cents_array(line_cents),
+            "unit_cents": unit_cents,
+            "line_cents": line_cents,
+        },
+        columns=ORDER_COLUMNS,
+    )
+    return order, int(line_cents.sum())
+
+
+@timed_stage("build_order")
+def build_order(
+    edited_df: pd.DataFrame,
+    pricing: PricingTables | None = None,
+    member: bool = False,
+) -> tuple[pd.DataFrame, int]:
     if edited_df.empty or "select" not in edited_df.columns:
-        return _empty_order(), 0.0
+        return _empty_order(), 0
 
-    order = edited_df.loc[edited_df["select"] == True].copy()  # noqa: E712
-    if order.empty:
-        return _empty_order(), 0.0
+    positions = np.flatnonzero(edited_df["select"].to_numpy() == True)  # noqa: E712
+    if not len(positions):
+        return _empty_order(), 0
 
-    order["quantity"] = pd.to_numeric(order["quantity"], errors="coerce").fillna(0.0)
-    order["quantity"] = order["quantity"].clip(lower=0.0)
+    quantities = pd.to_numeric(edited_df["quantity"].iloc[positions], errors="coerce").to_numpy(dtype=float)
+    if pricing is None:
+        pricing = compile_pricing(edited_df)
+    return priced_order(edited_df, pricing, positions, quantities, member)
 
-    euro_units = order["units"].astype(str).str.strip().str.lower().eq("€")
-    order.loc[euro_units, "quantity"] = np.floor(order.loc[euro_units, "quantity"])
-    order.loc[~euro_units, "quantity"] = order.loc[~euro_units, "quantity"].round(1)
 
-    order = order[order["name"].astype(str).str.strip() != ""]
-    order = order[order["quantity"] > 0]
-    if order.empty:
-        return _empty_order(), 0.0
+@st.cache_resource(show_spinner=False)
+def get_order_store() -> OrderStore:
+    return OrderStore()
 
-    order["line_total"] = (order["unit_price"].astype(float) * order["quantity"].astype(float)).round(2)
-    order["price_label"] = order.apply(
-        lambda row: _format_unit_price(float(row["unit_price"]), str(row["units"])),
-        axis=1,
-    )
-    order["quantity_label"] = order.apply(
-        lambda row: _format_quantity(float(row["quantity"]), str(row["units"])),
-        axis=1,
-    )
-    order["line_total_label"] = order["line_total"].apply(lambda value: format_euro(float(value)))
-
-    order = order.sort_values(by=["category", "name"], kind="stable")
-    result = order[ORDER_COLUMNS].reset_index(drop=True)
-
-    total = float(result["line_total"].sum())
-    return result, total
-
-
-def _safe_pdf_text(value: Any, unicode_ready: bool) -> str:
-    text = str(value if value is not None else "")
-    if unicode_ready:
-        return text
-    return text.encode("latin-1", errors="ignore").decode("latin-1")
-
-
-def generate_order_pdf(order_df: pd.DataFrame, client_name: str, note: str = "") -> bytes:
-    if order_df.empty:
-        raise ValueError("Order is empty")
-
-    pdf = FPDF(format="A4")
-    pdf.set_auto_page_break(auto=True, margin=14)
-    pdf.add_page()
-    pdf.set_margins(12, 12, 12)
-
-    unicode_ready = FONT_PATH.exists()
-    font_family = "Helvetica"
-    if unicode_ready:
-        pdf.add_font("FarmUnicode", "", FONT_PATH.as_posix(), uni=True)
-        font_family = "FarmUnicode"
-
-    now = datetime.now().strftime("%d/%m/%Y %H:%M")
-
-    pdf.set_font(font_family, size=18)
-    pdf.cell(0, 10, _safe_pdf_text("Bon de commande", unicode_ready), ln=True, align="C")
-    pdf.set_font(font_family, size=12)
-    pdf.cell(0, 7, _safe_pdf_text("GAEC Au Champ du Puits", unicode_ready), ln=True, align="C")
-    pdf.ln(6)
-    pdf.cell(0, 7, _safe_pdf_text(f"Client: {client_name}", unicode_ready), ln=True)
-    pdf.cell(0, 7, _safe_pdf_text(f"Date: {now}", unicode_ready), ln=True)
-    pdf.ln(5)
-
-    w_product, w_price, w_qty, w_total = 84, 32, 28, 34
-    row_h = 8
-
-    pdf.set_fill_color(226, 232, 221)
-    pdf.set_font(font_family, size=11)
-    pdf.cell(w_product, row_h, _safe_pdf_text("Produit", unicode_ready), border=1, align="C", fill=True)
-    pdf.cell(w_price, row_h, _safe_pdf_text("Prix unitaire", unicode_ready), border=1, align="C", fill=True)
-    pdf.cell(w_qty, row_h, _safe_pdf_text("Quantité", unicode_ready), border=1, align="C", fill=True)
-    pdf.cell(w_total, row_h, _safe_pdf_text("Total", unicode_ready), border=1, align="C", fill=True)
-    pdf.ln(row_h)
-
-    for category in order_df["category"].dropna().astype(str).unique():
-        pdf.set_fill_color(247, 245, 238)
-        pdf.cell(
-            w_product + w_price + w_qty + w_total,
-            row_h,
-            _safe_pdf_text(category, unicode_ready),
-            border=1,
-            align="L",
-            fill=True,
-            ln=True,
-        )
 
-        subset = order_df[order_df["category"].astype(str) == category]
-        for _, row in subset.iterrows():
-            pdf.set_fill_color(255, 255, 255)
-            pdf.cell(w_product, row_h, _safe_pdf_text(row["name"], unicode_ready), border=1)
-            pdf.cell(w_price, row_h, _safe_pdf_text(row["price_label"], unicode_ready), border=1, align="C")
-            pdf.cell(w_qty, row_h, _safe_pdf_text(row["quantity_label"], unicode_ready), border=1, align="C")
-            pdf.cell(w_total, row_h, _safe_pdf_text(row["line_total_label"], unicode_ready), border=1, align="C")
-            pdf.ln(row_h)
-
-    grand_total = float(order_df["line_total"].sum())
-    pdf.set_font(font_family, size=12)
-    pdf.cell(w_product + w_price + w_qty, row_h, _safe_pdf_text("Total commande", unicode_ready), border=1)
-    pdf.cell(w_total, row_h, _safe_pdf_text(format_euro(grand_total), unicode_ready), border=1, align="C", ln=True)
-
-    clean_note = (note or "").strip()
-    if clean_note:
-        pdf.ln(4)
-        pdf.set_font(font_family, size=11)
-        pdf.cell(0, 6, _safe_pdf_text("Remarque:", unicode_ready), ln=True)
-        pdf.multi_cell(0, 6, _safe_pdf_text(clean_note, unicode_ready))
-
-    output = pdf.output(dest="S")
-    if isinstance(output, bytes):
-        return output
-    return output.encode("latin-1")
-
-
-def send_email(
-    receiver: str,
-    subject: str,
-    body: str,
-    attachment_bytes: bytes | None = None,
-    attachment_name: str = "commande.pdf",
-) -> tuple[bool, str]:
-    credentials = _get_email_credentials()
-    if credentials is None:
-        return False, "Configuration e-mail absente: vérifiez `email.address` et `email.passkey` dans les secrets."
-
-    sender_address, sender_passkey = credentials
-    receiver_clean = (receiver or "").strip()
-    if not receiver_clean:
-        return False, "Adresse destinataire manquante."
-
-    msg = EmailMessage()
-    msg["Subject"] = (subject or "Commande Champ du Puits").strip()
-    msg["From"] = sender_address
-    msg["To"] = receiver_clean
-    msg.set_content((body or "Commande générée depuis l'application.").strip())
-
-    if attachment_bytes:
-        msg.add_attachment(
-            attachment_bytes,
-            maintype="application",
-            subtype="pdf",
-            filename=attachment_name,
+def record_order(
+    order_uid: str,
+    order_df: pd.DataFrame,
+    client_name: str,
+    distribution_day: date,
+    note: str = "",
+    created_at: datetime | None = None,
+    catalog_version: str = "",
+) -> bool:
+    try:
+        get_order_store().record(
+            order_uid,
+            order_df,
+            client_name,
+            distribution_day,
+            note,
+            created_at=created_at,
+            catalog_version=catalog_version,
         )
+    except (sqlite3.Error, OSError):
+        # The order book is a convenience for the farm; never block the client's download on it.
+        logger.exception("Commande de %s non enregistrée", client_name)
+        return False
+    return True
 
-    try:
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context, timeout=20) as server:
-            server.login(sender_address, sender_passkey)
-            server.send_message(msg)
-    except smtplib.SMTPAuthenticationError:
-        return False, "Échec d'authentification SMTP. Vérifiez l'adresse et la passkey de l'expéditeur."
-    except (smtplib.SMTPException, OSError):
-        return False, "Échec d'envoi de l'e-mail. Vérifiez la connectivité réseau et la configuration SMTP."
-
-    return True, f"E-mail envoyé à {receiver_clean}."
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)